@@ -0,0 +1,162 @@
+"""Brand logo manifest.
+
+The list of brand logos shown in the "Marcas Oficiales" banner is resolved at
+deploy time by ``manage.py build_brand_logos_manifest`` and written to a JSON
+file with final URLs (Cloudinary or hashed static names) and image dimensions.
+Templates read it through :func:`get_brand_logos`, which keeps the parsed
+manifest in memory and only reloads it when the file's mtime changes.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".svg", ".gif", ".avif"}
+
+MANIFEST_VERSION = 1
+
+_lock = threading.Lock()
+_loaded: dict = {"mtime": None, "logos": None}
+
+
+def manifest_path() -> Path:
+    return Path(getattr(settings, "BRAND_LOGOS_MANIFEST", settings.BASE_DIR / "brand_logos.json"))
+
+
+def logos_dir() -> Path | None:
+    """Return the first existing img/marcas folder (STATICFILES_DIRS, then STATIC_ROOT)."""
+    candidates = [Path(d) / "img" / "marcas" for d in getattr(settings, "STATICFILES_DIRS", [])]
+    static_root = getattr(settings, "STATIC_ROOT", "") or ""
+    if static_root:
+        candidates.append(Path(static_root) / "img" / "marcas")
+
+    for candidate in candidates:
+        if candidate.is_dir():
+            return candidate
+    return None
+
+
+def _dimensions(path: Path) -> tuple[int | None, int | None]:
+    """Intrinsic size of a raster image (None for SVG or unreadable files)."""
+    if path.suffix.lower() == ".svg":
+        return None, None
+    try:
+        from PIL import Image
+
+        with Image.open(path) as image:
+            return image.width, image.height
+    except Exception:
+        return None, None
+
+
+def _static_url(name: str) -> tuple[str, str]:
+    """URL and storage name of a logo, using the hashed name when the manifest storage knows it."""
+    from django.contrib.staticfiles.storage import staticfiles_storage
+
+    relative = f"img/marcas/{name}"
+    try:
+        hashed = getattr(staticfiles_storage, "stored_name", None)
+        stored = hashed(relative) if hashed else relative
+        # The manifest storage returns unquoted names; logo files contain spaces
+        return quote(staticfiles_storage.url(relative), safe="/:%"), stored
+    except ValueError:
+        # Not collected yet (or missing from staticfiles.json)
+        return f"{settings.STATIC_URL}{quote(relative)}", relative
+
+
+def _cloudinary_url(stem: str) -> str | None:
+    use_cloudinary = bool(getattr(settings, "BRAND_LOGOS_USE_CLOUDINARY", False)) and bool(
+        getattr(settings, "CLOUDINARY_ENABLED", False)
+    )
+    if not use_cloudinary:
+        return None
+    try:
+        from cloudinary.utils import cloudinary_url
+
+        folder = getattr(settings, "BRAND_LOGOS_CLOUDINARY_FOLDER", "marcas")
+        url, _ = cloudinary_url(f"{folder}/{stem}", secure=True, fetch_format="auto", quality="auto")
+        return url
+    except Exception:
+        # Fallback to static if Cloudinary isn't available/misconfigured.
+        return None
+
+
+def build_logos() -> list[dict]:
+    """Scan the marcas folder and resolve every logo. Only used at build time."""
+    directory = logos_dir()
+    if directory is None:
+        return []
+
+    logos: list[dict] = []
+    for entry in sorted(directory.iterdir()):
+        if not entry.is_file() or entry.suffix.lower() not in IMAGE_EXTENSIONS:
+            continue
+
+        url, stored_name = _static_url(entry.name)
+        url = _cloudinary_url(entry.stem) or url
+        width, height = _dimensions(entry)
+        logos.append(
+            {
+                "url": url,
+                "alt": f"Logo {entry.stem}".replace("_", " ").replace("-", " "),
+                "static_name": stored_name,
+                "width": width,
+                "height": height,
+            }
+        )
+    return logos
+
+
+def write_manifest(path: Path | None = None) -> tuple[Path, list[dict]]:
+    """Build the manifest and replace the file atomically."""
+    path = Path(path or manifest_path())
+    logos = build_logos()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({"version": MANIFEST_VERSION, "logos": logos}, ensure_ascii=False, indent=2))
+    os.replace(tmp, path)
+    return path, logos
+
+
+def _read_manifest(path: Path) -> list[dict]:
+    try:
+        data = json.loads(path.read_text())
+        return list(data.get("logos", []))
+    except (OSError, ValueError, AttributeError):
+        logger.warning("Brand logo manifest %s could not be read", path)
+        return []
+
+
+def get_brand_logos() -> list[dict]:
+    """Logos from the manifest, cached per process and reloaded when its mtime changes.
+
+    Without a manifest (e.g. local development before running the command) the
+    folder is scanned once per process and the result kept in memory.
+    """
+    path = manifest_path()
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        mtime = None
+
+    if _loaded["logos"] is not None and _loaded["mtime"] == mtime:
+        return _loaded["logos"]
+
+    with _lock:
+        if _loaded["logos"] is None or _loaded["mtime"] != mtime:
+            if mtime is None:
+                logger.warning("Brand logo manifest %s not found; scanning static/img/marcas once", path)
+                logos = build_logos()
+            else:
+                logos = _read_manifest(path)
+            _loaded.update(mtime=mtime, logos=logos)
+        return _loaded["logos"]
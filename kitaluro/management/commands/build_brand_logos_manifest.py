@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from kitaluro.brand_logos import manifest_path, write_manifest
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes the brand logo manifest (final URLs, hashed static names and dimensions) "
+        "read by the brand_logos context processor. Run after collectstatic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=None,
+            help="Manifest path (default: settings.BRAND_LOGOS_MANIFEST)",
+        )
+
+    def handle(self, *args, **options):
+        path, logos = write_manifest(options["output"] or manifest_path())
+        self.stdout.write(self.style.SUCCESS(f"Brand logo manifest written to {path} ({len(logos)} logos)"))
@@ -0,0 +1,262 @@
+"""Middleware que sirve el catálogo público sin ejecutar sus vistas.
+
+``PublishedCatalogMiddleware`` sirve las páginas que ``productos.publicacion``
+escribe en disco, y ``FeedFilesMiddleware`` los sitemaps y feeds de
+Merchant Center que genera ``productos.feeds``.
+
+``AnonymousPageCacheMiddleware`` es una caché de página completa para los
+visitantes anónimos. Las páginas públicas (inicio, catálogo, detalle de
+producto, contacto) generan el mismo HTML para cualquier visitante anónimo,
+así que se cachea la respuesta entera con una clave formada por el nombre
+de la URL, sus argumentos y los parámetros de la querystring que la página
+realmente lee. Cada entrada recuerda la generación del catálogo con la que
+se renderizó; un cambio de producto o de taxonomía la deja obsoleta sin
+borrar nada.
+
+La regeneración es single-flight: solo renderiza la petición que tiene el
+candado; el resto la espera o, con stale-while-revalidate activo, recibe
+mientras tanto la versión anterior.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from whitenoise.base import WhiteNoise
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.responders import MissingFileError
+
+from productos.cache_utils import ESPERA_SINGLE_FLIGHT, INTERVALO_SINGLE_FLIGHT, obtener_version_catalogo
+
+# Cabeceras de la respuesta que se reproducen desde la caché
+_STORED_HEADERS = ("Content-Type", "Content-Language", "ETag", "Last-Modified", "Vary")
+
+
+def anonymous_page_request(request):
+    """True para GET anónimos, no AJAX, cuya página no depende del visitante."""
+    if request.method not in ("GET", "HEAD"):
+        return False
+    if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+        # Las variantes AJAX de las vistas públicas tienen su propia caché de respuestas
+        return False
+    if request.user.is_authenticated:
+        return False
+    # Los mensajes flash pendientes se renderizan en la página
+    if "messages" in request.COOKIES:
+        return False
+    return settings.SESSION_COOKIE_NAME not in request.COOKIES or "_messages" not in request.session
+
+
+class _RuntimeFilesMiddleware(WhiteNoiseMiddleware):
+    """Sirve los archivos que se generan en tiempo de ejecución bajo ``self.root``.
+
+    Reutiliza el servicio de archivos de WhiteNoise (ETag/Last-Modified,
+    variantes gzip/brotli), pero busca los archivos en cada petición porque
+    se reescriben en el mismo sitio.
+    """
+
+    def __init__(self, get_response, root, max_age):
+        self.get_response = get_response
+        self.root = Path(root)
+        # Sin WhiteNoiseMiddleware.__init__: aquí no hay raíces estáticas que indexar
+        WhiteNoise.__init__(
+            self,
+            application=None,
+            max_age=max_age,
+            charset=getattr(settings, "WHITENOISE_CHARSET", "utf-8"),
+        )
+
+    def immutable_file_test(self, path, url):
+        # Los archivos generados se reescriben en el mismo sitio con la misma URL
+        return False
+
+    def serve_generated(self, request, relative):
+        """Respuesta para ``root / relative``, o None si el archivo no existe."""
+        try:
+            static_file = self.get_static_file(str(self.root / relative), request.path_info)
+        except MissingFileError:
+            return None
+        if static_file is None:
+            return None
+        return self.serve(static_file, request)
+
+
+class PublishedCatalogMiddleware(_RuntimeFilesMiddleware):
+    """Sirve a los visitantes anónimos los archivos que escribe ``productos.publicacion``.
+
+    Debe ir después de AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response=None):
+        self.enabled = getattr(settings, "PUBLICACION_ENABLED", False)
+        super().__init__(
+            get_response,
+            root=getattr(settings, "PUBLICACION_ROOT", settings.BASE_DIR / "publicado"),
+            max_age=getattr(settings, "PUBLICACION_MAX_AGE", 0),
+        )
+
+    def __call__(self, request):
+        if self.enabled and anonymous_page_request(request):
+            from productos.publicacion import archivo_publicado
+
+            relative = archivo_publicado(request)
+            if relative is not None:
+                response = self.serve_generated(request, relative)
+                if response is not None:
+                    response["X-Published"] = "1"
+                    return response
+        return self.get_response(request)
+
+
+class FeedFilesMiddleware(_RuntimeFilesMiddleware):
+    """Sirve los sitemaps y feeds de Merchant Center que escribe ``manage.py generar_feeds``."""
+
+    def __init__(self, get_response=None):
+        super().__init__(
+            get_response,
+            root=getattr(settings, "FEEDS_ROOT", settings.BASE_DIR / "feeds"),
+            max_age=getattr(settings, "FEEDS_MAX_AGE", 3600),
+        )
+
+    def __call__(self, request):
+        from productos.feeds import RUTAS_PUBLICAS
+
+        if request.method in ("GET", "HEAD"):
+            relative = request.path_info.lstrip("/")
+            if RUTAS_PUBLICAS.fullmatch(relative):
+                response = self.serve_generated(request, relative)
+                if response is not None:
+                    return response
+        return self.get_response(request)
+
+
+class AnonymousPageCacheMiddleware:
+    """Sirve páginas cacheadas a los GET anónimos de las vistas de ``PAGE_CACHE_VIEWS``.
+
+    Debe ir después de AuthenticationMiddleware (consulta ``request.user``).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "PAGE_CACHE_ENABLED", True)
+        self.views = getattr(settings, "PAGE_CACHE_VIEWS", {})
+        self.timeout = getattr(settings, "PAGE_CACHE_TIMEOUT", 300)
+        self.stale_timeout = getattr(settings, "PAGE_CACHE_STALE_TIMEOUT", 0)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        key = getattr(request, "_page_cache_key", None)
+        if key is None:
+            return response
+
+        try:
+            if self._cacheable_response(response):
+                self._store(key, request._page_cache_version, response)
+                response["X-Page-Cache"] = "MISS"
+        finally:
+            if getattr(request, "_page_cache_lock", False):
+                cache.delete(f"{key}:lock")
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.enabled or not self._cacheable_request(request):
+            return None
+
+        params = self.views.get(request.resolver_match.view_name)
+        if params is None:
+            return None
+
+        key = self._key(request, params)
+        version = obtener_version_catalogo()
+        entry = cache.get(key)
+        if self._is_fresh(entry, version):
+            return self._replay(request, entry, "HIT")
+
+        if cache.add(f"{key}:lock", 1, timeout=int(ESPERA_SINGLE_FLIGHT * 5)):
+            # Esta petición renderiza; la respuesta se guarda a la salida
+            request._page_cache_key = key
+            request._page_cache_version = version
+            request._page_cache_lock = True
+            return None
+
+        if entry is not None and self._within_stale_window(entry):
+            return self._replay(request, entry, "STALE")
+
+        # Otra petición está renderizando: esperar brevemente su resultado
+        deadline = time.monotonic() + ESPERA_SINGLE_FLIGHT
+        while time.monotonic() < deadline:
+            time.sleep(INTERVALO_SINGLE_FLIGHT)
+            entry = cache.get(key)
+            if self._is_fresh(entry, version):
+                return self._replay(request, entry, "HIT")
+        return None
+
+    # ==================== AUXILIARES ====================
+
+    @staticmethod
+    def _cacheable_request(request):
+        return anonymous_page_request(request)
+
+    @staticmethod
+    def _key(request, params):
+        match = request.resolver_match
+        partes = [
+            match.view_name,
+            *match.args,
+            *sorted(match.kwargs.items()),
+            *sorted((nombre, valor) for nombre in params for valor in request.GET.getlist(nombre) if valor),
+        ]
+        digest = hashlib.md5("|".join(str(p) for p in partes).encode("utf-8")).hexdigest()
+        return f"pagina:{digest}"
+
+    def _is_fresh(self, entry, version):
+        return (
+            entry is not None
+            and entry["version"] == version
+            and time.time() - entry["created"] < self.timeout
+        )
+
+    def _within_stale_window(self, entry):
+        return bool(self.stale_timeout) and time.time() - entry["created"] < self.timeout + self.stale_timeout
+
+    @staticmethod
+    def _cacheable_response(response):
+        if response.status_code != 200 or getattr(response, "streaming", False):
+            return False
+        if response.cookies:
+            # p. ej. una cookie CSRF: la página está ligada a este visitante
+            return False
+        cache_control = response.get("Cache-Control", "")
+        return "private" not in cache_control and "no-store" not in cache_control
+
+    def _store(self, key, version, response):
+        entry = {
+            "version": version,
+            "created": time.time(),
+            "content": response.content,
+            "headers": {name: response[name] for name in _STORED_HEADERS if response.has_header(name)},
+        }
+        # Se conserva más allá de su vigencia para servirla mientras se revalida
+        cache.set(key, entry, self.timeout + self.stale_timeout)
+
+    @staticmethod
+    def _replay(request, entry, status):
+        headers = entry["headers"]
+        response = HttpResponse(entry["content"])
+        for name, value in headers.items():
+            response[name] = value
+        response = get_conditional_response(
+            request,
+            etag=headers.get("ETag"),
+            last_modified=parse_http_date_safe(headers.get("Last-Modified", "")),
+            response=response,
+        )
+        response["X-Page-Cache"] = status
+        return response
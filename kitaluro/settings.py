@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -60,12 +61,15 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'kitaluro.middleware.FeedFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'kitaluro.middleware.PublishedCatalogMiddleware',
+    'kitaluro.middleware.AnonymousPageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'kitaluro.urls'
@@ -101,6 +105,86 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# CACHE_BACKEND: 'file' (por defecto, compartida entre los workers de gunicorn
+# del mismo servidor), 'locmem' (un solo proceso) o 'redis' (CACHE_URL, cualquier
+# servidor compatible con el protocolo de Redis).
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'file').lower()
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_URL', 'redis://127.0.0.1:6379/1'),
+        }
+    }
+elif CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'kitaluro',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'kitaluro-cache')),
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+# Fragmentos de plantilla (tarjetas de producto). Memoria local de cada worker:
+# la clave incluye la marca `actualizado` de la tarjeta, así que un producto
+# modificado genera una clave nueva y las antiguas se descartan por antigüedad.
+CACHES['plantillas'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'kitaluro-plantillas',
+    'OPTIONS': {'MAX_ENTRIES': 5000},
+}
+
+# Respuestas de las APIs públicas del catálogo (segundos)
+CATALOGO_CACHE_TIMEOUT = int(os.getenv('CATALOGO_CACHE_TIMEOUT', '900'))
+
+# Caché de página completa para visitantes anónimos (kitaluro.middleware).
+# Cada vista listada se cachea variando solo por los parámetros indicados;
+# las entradas caducan al cambiar la generación del catálogo. Con
+# PAGE_CACHE_STALE_TIMEOUT > 0 se sirve la versión anterior mientras una
+# única petición regenera la página.
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', 'True').lower() in ('1', 'true', 'yes', 'on')
+PAGE_CACHE_VIEWS = {
+    'home': (),
+    'contacto': (),
+    # Los mismos parámetros que productos.filtros.PARAMETROS_FILTRO
+    'productos:index': ('categoria', 'subcategoria', 'marca', 'proveedor', 'estatus',
+                        'destacado', 'en_oferta', 'q', 'orden'),
+    'productos:detalle': (),
+}
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', '300'))
+PAGE_CACHE_STALE_TIMEOUT = int(os.getenv('PAGE_CACHE_STALE_TIMEOUT', '3600'))
+
+# Publicación estática del catálogo (productos/publicacion.py). Las páginas
+# se regeneran al guardar productos y se sirven con WhiteNoise desde
+# PUBLICACION_ROOT; `manage.py publicar_catalogo` las reconstruye todas.
+PUBLICACION_ENABLED = os.getenv('PUBLICACION_ENABLED', '').lower() in ('1', 'true', 'yes', 'on')
+PUBLICACION_ROOT = os.getenv('PUBLICACION_ROOT', str(BASE_DIR / 'publicado'))
+# Los archivos cambian con cada publicación: el navegador revalida con ETag
+PUBLICACION_MAX_AGE = int(os.getenv('PUBLICACION_MAX_AGE', '0'))
+
+# Sitemaps y feed de Merchant Center (productos/feeds.py), generados con
+# `manage.py generar_feeds` y servidos desde FEEDS_ROOT. SITE_URL es la
+# base de las URLs absolutas que contienen.
+SITE_URL = os.getenv('SITE_URL', 'https://kitaluro-pruebas.up.railway.app')
+FEEDS_ROOT = os.getenv('FEEDS_ROOT', str(BASE_DIR / 'feeds'))
+FEEDS_MAX_AGE = int(os.getenv('FEEDS_MAX_AGE', '3600'))
+
+# Token de socios para la exportación del catálogo por API
+# (`Authorization: Bearer <token>`); vacío = solo superusuarios
+EXPORTACION_TOKEN = os.getenv('EXPORTACION_TOKEN', '')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -177,6 +261,9 @@ BRAND_LOGOS_USE_CLOUDINARY = os.getenv('BRAND_LOGOS_USE_CLOUDINARY', '').lower()
 )
 BRAND_LOGOS_CLOUDINARY_FOLDER = os.getenv('BRAND_LOGOS_CLOUDINARY_FOLDER', 'marcas')
 
+# Manifest written by `manage.py build_brand_logos_manifest` (after collectstatic).
+BRAND_LOGOS_MANIFEST = os.getenv('BRAND_LOGOS_MANIFEST', str(BASE_DIR / 'brand_logos.json'))
+
 if CLOUDINARY_ENABLED:
     # django-cloudinary-storage
     INSTALLED_APPS += [
@@ -205,6 +292,12 @@ THUMBNAIL_SIZE = (300, 300)
 # Allowed image formats
 ALLOWED_IMAGE_FORMATS = ['JPEG', 'JPG', 'PNG', 'WEBP']
 
+# Snapshot columnar del catálogo (uno por worker) para filtrar, ordenar y
+# paginar la API de productos en memoria. Requiere numpy; si el catálogo
+# supera el límite de productos se usa SQL.
+CATALOGO_SNAPSHOT_ENABLED = os.getenv('CATALOGO_SNAPSHOT_ENABLED', 'True').lower() in ('1', 'true', 'yes', 'on')
+CATALOGO_SNAPSHOT_MAX_PRODUCTOS = int(os.getenv('CATALOGO_SNAPSHOT_MAX_PRODUCTOS', '200000'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
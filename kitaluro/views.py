@@ -1,13 +1,10 @@
 from django.shortcuts import render
-from productos.models import Producto
+from productos.models import ProductoCard
 
 def home(request):
     """Vista para la página de inicio"""
     # Obtener productos destacados o en oferta
-    productos_destacados = Producto.objects.filter(
-        activo=True,
-        disponible=True
-    ).select_related('categoria', 'marca').prefetch_related('imagenes_galeria')[:6]
+    productos_destacados = ProductoCard.objects.filter(disponible=True)[:6]
     
     context = {
         'productos': productos_destacados
@@ -1,7 +1,17 @@
+from django import forms
 from django.contrib import admin
-from django.utils.html import format_html
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
 from .models import (Categoria, Subcategoria, Marca, Proveedor, Estatus, 
-                     Producto, ProductImage, ProductVideo, Valoracion)
+                     Producto, ProductImage, ProductVideo, Valoracion,
+                     MovimientoStock, TareaImagen)
+from .imagenes import con_estado, estado_imagen_principal
+from .normalizacion import normalizar_texto
+from .search import condicion_busqueda, condicion_prefijo, fts_disponible
+
+# Movimientos de stock que se muestran en la ficha del producto
+MOVIMIENTOS_RECIENTES = 10
 
 # Register your models here.
 
@@ -51,10 +61,35 @@ class MarcaAdmin(admin.ModelAdmin):
     list_editable = ['activo']
 
 
+# Colores de los estados de optimización de imágenes
+_COLORES_ESTADO = {
+    TareaImagen.PENDIENTE: '#6c757d',
+    TareaImagen.PROCESANDO: '#0d6efd',
+    TareaImagen.COMPLETADA: '#28a745',
+    TareaImagen.DESCARTADA: '#6c757d',
+    TareaImagen.ERROR: '#dc3545',
+}
+
+
+def _estado_display(estado):
+    if not estado:
+        return '-'
+    return format_html('<strong style="color: {};">{}</strong>',
+                       _COLORES_ESTADO[estado], dict(TareaImagen.ESTADOS)[estado])
+
+
 class ProductImageInline(admin.TabularInline):
     model = ProductImage
     extra = 1
-    fields = ['image', 'alt_text', 'order', 'is_main']
+    fields = ['image', 'alt_text', 'order', 'is_main', 'estado_procesado']
+    readonly_fields = ['estado_procesado']
+    
+    def get_queryset(self, request):
+        return con_estado(super().get_queryset(request))
+    
+    def estado_procesado(self, obj):
+        return _estado_display(getattr(obj, 'estado_procesado', None))
+    estado_procesado.short_description = 'Optimización'
 
 
 class ProductVideoInline(admin.TabularInline):
@@ -70,14 +105,86 @@ class ValoracionInline(admin.TabularInline):
     readonly_fields = ['fecha_creacion']
 
 
+def _stock_visto(form):
+    """Stock que mostraba el formulario (campo oculto de show_hidden_initial)"""
+    campo = form.fields['stock']
+    valor = campo.hidden_widget().value_from_datadict(form.data, form.files, form['stock'].html_initial_name)
+    try:
+        return campo.to_python(valor)
+    except ValidationError:
+        return None
+
+
+class ProductoAdminForm(forms.ModelForm):
+    """
+    Rechaza un cambio de stock que, aplicado como diferencia sobre el stock
+    actual (que pudo moverse desde que se abrió el formulario), lo dejaría
+    negativo.
+    """
+    
+    class Meta:
+        model = Producto
+        fields = '__all__'
+    
+    def clean_stock(self):
+        stock = self.cleaned_data.get('stock')
+        if self.instance.pk is None or stock is None or 'stock' not in self.changed_data:
+            return stock
+        visto = _stock_visto(self)
+        if visto is None:
+            visto = self.instance.stock
+        actual = Producto.objects.filter(pk=self.instance.pk).values_list('stock', flat=True).first()
+        if actual is not None and actual + stock - visto < 0:
+            raise ValidationError(
+                f'Stock insuficiente: {actual} disponible(s), movimiento de {stock - visto}'
+            )
+        return stock
+
+
 @admin.register(Producto)
 class ProductoAdmin(admin.ModelAdmin):
     list_display = ['nombre', 'sku', 'categoria', 'subcategoria', 'marca', 'proveedor', 'precio_display', 'stock', 'disponible', 'destacado', 'en_oferta', 'fecha_creacion']
     list_filter = ['categoria', 'subcategoria', 'marca', 'proveedor', 'estatus', 'disponible', 'destacado', 'en_oferta', 'activo', 'fecha_creacion']
-    search_fields = ['nombre', 'descripcion', 'descripcion_corta', 'sku', 'origen']
+    # Ver get_search_results: se busca solo en columnas normalizadas e indexadas
+    search_fields = ['nombre_normalizado', 'sku']
     prepopulated_fields = {'slug': ('nombre',)}
     list_editable = ['disponible', 'destacado', 'en_oferta', 'stock']
-    readonly_fields = ['sku', 'fecha_creacion', 'fecha_actualizacion']
+    readonly_fields = ['sku', 'version', 'movimientos_recientes', 'estado_imagen', 'fecha_creacion', 'fecha_actualizacion']
+    form = ProductoAdminForm
+    
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', ProductoAdminForm)
+        return super().get_changelist_form(request, **kwargs)
+    
+    def formfield_for_dbfield(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_dbfield(db_field, request, **kwargs)
+        if db_field.name == 'stock':
+            # Envía también el stock mostrado para guardar solo la diferencia
+            formfield.show_hidden_initial = True
+        return formfield
+    
+    def save_model(self, request, obj, form, change):
+        # Sirve también para list_editable: el stock editado se aplica como
+        # movimiento (valor nuevo - valor mostrado), sin pisar los concurrentes.
+        # ProductoAdminForm ya rechazó el stock negativo; si otro movimiento
+        # lo agota entre la validación y el guardado, StockInsuficiente se
+        # propaga y la transacción de la petición se revierte
+        if change and 'stock' in form.changed_data:
+            obj.editar_stock(obj.stock, visto=_stock_visto(form))
+        super().save_model(request, obj, form, change)
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Solo búsquedas indexadas y sin tildes ni mayúsculas ("electronica"
+        # encuentra "Electrónica"): prefijo del nombre normalizado o del SKU
+        # (también productos inactivos) y el índice FTS de los activos
+        termino = search_term.strip()
+        if not termino:
+            return queryset, False
+        condicion = (condicion_prefijo('nombre_normalizado', normalizar_texto(termino))
+                     | condicion_prefijo('sku', termino.upper()))
+        if fts_disponible():
+            condicion |= condicion_busqueda(termino, campo='pk')
+        return queryset.filter(condicion), False
     
     fieldsets = (
         ('Información Básica', {
@@ -87,10 +194,10 @@ class ProductoAdmin(admin.ModelAdmin):
             'fields': ('categoria', 'subcategoria', 'marca', 'proveedor', 'estatus')
         }),
         ('Precios e Inventario', {
-            'fields': ('precio', 'precio_oferta', 'stock')
+            'fields': ('precio', 'precio_oferta', 'stock', 'version', 'movimientos_recientes')
         }),
         ('Multimedia y Documentación', {
-            'fields': ('imagen', 'video', 'ficha_tecnica'),
+            'fields': ('imagen', 'estado_imagen', 'video', 'ficha_tecnica'),
             'classes': ('collapse',)
         }),
         ('Características', {
@@ -118,6 +225,29 @@ class ProductoAdmin(admin.ModelAdmin):
             return f'${obj.precio}'
         return '-'
     precio_display.short_description = 'Precio'
+    
+    def estado_imagen(self, obj):
+        return _estado_display(estado_imagen_principal(obj.pk) if obj.pk else None)
+    estado_imagen.short_description = 'Optimización de imagen'
+    
+    def movimientos_recientes(self, obj):
+        # Solo los últimos movimientos: el libro completo crece sin límite y
+        # se consulta en su listado, filtrado por el producto
+        if not obj.pk:
+            return '-'
+        recientes = obj.movimientos_stock.select_related('usuario')[:MOVIMIENTOS_RECIENTES]
+        filas = format_html_join(
+            '', '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>',
+            ((m.fecha.strftime('%Y-%m-%d %H:%M'), m.get_motivo_display(), f'{m.cantidad:+d}',
+              m.stock_resultante, m.referencia, m.usuario or '') for m in recientes),
+        )
+        url = reverse('admin:productos_movimientostock_changelist') + f'?producto={obj.pk}'
+        return format_html(
+            '<table><tr><th>Fecha</th><th>Motivo</th><th>Cantidad</th><th>Stock</th>'
+            '<th>Referencia</th><th>Usuario</th></tr>{}</table><a href="{}">Ver todos los movimientos</a>',
+            filas, url,
+        )
+    movimientos_recientes.short_description = 'Últimos movimientos de stock'
 
 
 @admin.register(Valoracion)
@@ -128,3 +258,46 @@ class ValoracionAdmin(admin.ModelAdmin):
     list_editable = ['verificado']
     readonly_fields = ['fecha_creacion']
 
+
+@admin.register(MovimientoStock)
+class MovimientoStockAdmin(admin.ModelAdmin):
+    """Libro de solo lectura: los movimientos se registran al cambiar el stock"""
+    list_display = ['fecha', 'producto', 'motivo', 'cantidad', 'stock_resultante', 'referencia', 'usuario']
+    list_filter = ['motivo', 'fecha']
+    search_fields = ['producto__nombre', 'producto__sku', 'referencia']
+    list_select_related = ['producto', 'usuario']
+    date_hierarchy = 'fecha'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(TareaImagen)
+class TareaImagenAdmin(admin.ModelAdmin):
+    """Cola de optimización (la procesa `manage.py procesar_imagenes`)"""
+    list_display = ['archivo', 'producto', 'estado_display', 'intentos', 'trabajador', 'fecha_creacion', 'fecha_fin']
+    list_filter = ['estado', 'fecha_creacion']
+    search_fields = ['archivo', 'producto__nombre']
+    list_select_related = ['producto']
+    readonly_fields = ['producto', 'imagen', 'archivo', 'estado', 'intentos', 'error', 'trabajador',
+                       'fecha_creacion', 'fecha_inicio', 'fecha_fin']
+    actions = ['reintentar']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def estado_display(self, obj):
+        return _estado_display(obj.estado)
+    estado_display.short_description = 'Estado'
+    estado_display.admin_order_field = 'estado'
+    
+    @admin.action(description='Reintentar las tareas con error')
+    def reintentar(self, request, queryset):
+        total = queryset.filter(estado=TareaImagen.ERROR).update(estado=TareaImagen.PENDIENTE, intentos=0, error='')
+        self.message_user(request, f'{total} tarea(s) vuelven a la cola')
@@ -0,0 +1,166 @@
+"""
+Utilidades de caché del catálogo.
+
+La versión (generación) del catálogo es un contador guardado en la caché
+por defecto que se incrementa cada vez que cambia un producto, su galería,
+sus videos, sus valoraciones o una taxonomía. Las claves de caché del catálogo la
+incluyen, de modo que un cambio invalida todas las entradas a la vez sin
+tener que borrarlas una por una.
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+
+CLAVE_VERSION_CATALOGO = 'catalogo:version'
+CLAVE_MODIFICACION_CATALOGO = 'catalogo:modificado'
+
+
+def _semilla_version():
+    """
+    Valor inicial de un contador de generación que no existe en la caché
+    (vacía, o con la clave expulsada al superar MAX_ENTRIES). Se parte del
+    reloj en nanosegundos y no de 1: así una generación ya usada nunca
+    vuelve a aparecer y las entradas, ETags y estados en memoria de esa
+    generación no pasan por vigentes.
+    """
+    return time.time_ns()
+
+
+def _obtener_version(clave):
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, _semilla_version(), timeout=None)
+        version = cache.get(clave)
+    return version
+
+
+def _incrementar_version(clave):
+    try:
+        return cache.incr(clave)
+    except ValueError:
+        # La clave no existe (caché vacía o expulsada)
+        cache.add(clave, _semilla_version(), timeout=None)
+        return cache.incr(clave)
+
+
+def obtener_version_catalogo():
+    """Retorna la generación actual del catálogo"""
+    return _obtener_version(CLAVE_VERSION_CATALOGO)
+
+
+def incrementar_version_catalogo():
+    """Invalida todas las entradas de caché del catálogo"""
+    cache.set(CLAVE_MODIFICACION_CATALOGO, timezone.now(), timeout=None)
+    return _incrementar_version(CLAVE_VERSION_CATALOGO)
+
+
+def obtener_modificacion_catalogo():
+    """Momento del último cambio del catálogo (None si no se conoce)"""
+    return cache.get(CLAVE_MODIFICACION_CATALOGO)
+
+
+# ==================== GENERACIÓN DE TAXONOMÍAS ====================
+
+CLAVE_VERSION_TAXONOMIAS = 'taxonomias:version'
+
+
+def obtener_version_taxonomias():
+    """Retorna la generación actual de las taxonomías"""
+    return _obtener_version(CLAVE_VERSION_TAXONOMIAS)
+
+
+def incrementar_version_taxonomias():
+    """Invalida el registro de taxonomías de todos los workers"""
+    return _incrementar_version(CLAVE_VERSION_TAXONOMIAS)
+
+
+def clave_catalogo(prefijo, *partes):
+    """Construye una clave de caché versionada con la generación del catálogo"""
+    digest = hashlib.md5('|'.join(str(p) for p in partes).encode('utf-8')).hexdigest()
+    return f'catalogo:{prefijo}:v{obtener_version_catalogo()}:{digest}'
+
+
+# ==================== CACHÉ DE RESPUESTAS ====================
+
+# Tiempo máximo que una petición espera a que otra calcule la misma respuesta
+ESPERA_SINGLE_FLIGHT = 2.0
+INTERVALO_SINGLE_FLIGHT = 0.05
+
+
+def clave_peticion(request, *partes):
+    """Partes canónicas de una petición: ruta, argumentos y querystring ordenada"""
+    parametros = sorted((k, v) for k, valores in request.GET.lists() for v in valores)
+    return (request.path, *partes, parametros)
+
+
+def obtener_o_calcular(clave, calcular, timeout):
+    """
+    Lee `clave` de la caché o la calcula con `calcular()`.
+    Solo un proceso calcula cada clave a la vez (candado con cache.add);
+    el resto espera brevemente a que aparezca el valor antes de calcularlo
+    por su cuenta. Retorna (valor, acierto).
+    """
+    valor = cache.get(clave)
+    if valor is not None:
+        return valor, True
+
+    candado = f'{clave}:calculando'
+    if not cache.add(candado, 1, timeout=int(ESPERA_SINGLE_FLIGHT * 5)):
+        limite = time.monotonic() + ESPERA_SINGLE_FLIGHT
+        while time.monotonic() < limite:
+            time.sleep(INTERVALO_SINGLE_FLIGHT)
+            valor = cache.get(clave)
+            if valor is not None:
+                return valor, True
+        return calcular(), False
+
+    try:
+        valor = calcular()
+        if valor is not None:
+            cache.set(clave, valor, timeout)
+        return valor, False
+    finally:
+        cache.delete(candado)
+
+
+def respuesta_cacheada(prefijo, timeout=None):
+    """
+    Decorador para vistas GET públicas del catálogo: cachea el cuerpo de las
+    respuestas 200 con una clave versionada por la generación del catálogo y
+    los parámetros canónicos de la petición.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return vista(request, *args, **kwargs)
+
+            respuestas = {}
+
+            def calcular():
+                respuesta = vista(request, *args, **kwargs)
+                respuestas['original'] = respuesta
+                if respuesta.status_code != 200 or getattr(respuesta, 'streaming', False):
+                    return None
+                return {'contenido': respuesta.content, 'tipo': respuesta['Content-Type']}
+
+            partes = clave_peticion(request, *args, *sorted(kwargs.items()))
+            clave = clave_catalogo(prefijo, *partes)
+            datos, acierto = obtener_o_calcular(
+                clave, calcular, timeout or getattr(settings, 'CATALOGO_CACHE_TIMEOUT', 900)
+            )
+            if datos is None:
+                # Respuesta no cacheable (error, redirección...)
+                return respuestas.get('original') or vista(request, *args, **kwargs)
+
+            respuesta = respuestas.get('original') or HttpResponse(datos['contenido'], content_type=datos['tipo'])
+            respuesta['X-Cache'] = 'HIT' if acierto else 'MISS'
+            return respuesta
+        return wrapper
+    return decorador
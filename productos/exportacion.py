@@ -0,0 +1,164 @@
+"""
+Exportación completa del catálogo en JSON Lines o CSV.
+
+Las filas salen de `ProductoCard` con una proyección de columnas
+(`values_list`) leída con `iterator(chunk_size=...)`, de modo que la memoria
+usada no depende del tamaño del catálogo. Los textos largos del producto
+(`descripcion`, `garantia`...) solo se leen si se piden expresamente.
+
+La vista `exportar_catalogo` y el comando del mismo nombre comparten los
+generadores de este módulo.
+"""
+
+import csv
+import datetime
+import io
+import json
+
+from django.db import models
+from django.urls import reverse
+
+from .filtros import filtrar_cards
+from .models import ProductoCard
+
+FORMATOS = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+# Columna exportada -> campo de ProductoCard
+COLUMNAS = {
+    'id': 'producto_id',
+    'sku': 'sku',
+    'nombre': 'nombre',
+    'slug': 'slug',
+    'descripcion_corta': 'descripcion_corta',
+    'categoria': 'categoria_nombre',
+    'categoria_slug': 'categoria_slug',
+    'subcategoria': 'subcategoria_nombre',
+    'subcategoria_slug': 'subcategoria_slug',
+    'marca': 'marca_nombre',
+    'proveedor': 'proveedor_nombre',
+    'estatus': 'estatus_nombre',
+    'origen': 'origen',
+    'precio': 'precio',
+    'precio_oferta': 'precio_oferta',
+    'precio_final': 'precio_final',
+    'tiene_descuento': 'tiene_descuento',
+    'porcentaje_descuento': 'porcentaje_descuento',
+    'stock': 'stock',
+    'destacado': 'destacado',
+    'en_oferta': 'en_oferta',
+    'imagen_principal': 'imagen_url',
+    'rating': 'rating_promedio',
+    'total_valoraciones': 'total_valoraciones',
+    'fecha_actualizacion': 'fecha_actualizacion',
+}
+
+# Columnas opcionales que requieren unir con Producto
+COLUMNAS_OPCIONALES = {
+    'descripcion': 'producto__descripcion',
+    'garantia': 'producto__garantia',
+    'dimensiones': 'producto__dimensiones',
+    'peso': 'producto__peso',
+}
+
+CHUNK_SIZE = 2000
+# Filas por bloque escrito en la respuesta
+FILAS_POR_BLOQUE = 500
+
+
+class ExportacionInvalida(ValueError):
+    """Formato o columnas opcionales no reconocidos"""
+
+
+def columnas_exportacion(incluir=()):
+    """Lista de columnas (base + opcionales pedidas, en orden estable)"""
+    desconocidas = set(incluir) - set(COLUMNAS_OPCIONALES)
+    if desconocidas:
+        raise ExportacionInvalida(f"Columnas no disponibles: {', '.join(sorted(desconocidas))}")
+    return [*COLUMNAS, *(c for c in COLUMNAS_OPCIONALES if c in incluir), 'url']
+
+
+def _campo_modelo(ruta):
+    modelo, campo = ProductoCard, None
+    for parte in ruta.split('__'):
+        campo = modelo._meta.get_field(parte)
+        modelo = campo.related_model
+    return campo
+
+
+def _conversiones(campos):
+    """Posiciones y conversión de las columnas que no son serializables tal cual"""
+    conversiones = []
+    for posicion, ruta in enumerate(campos):
+        campo = _campo_modelo(ruta)
+        if isinstance(campo, models.DecimalField):
+            conversiones.append((posicion, str))
+        elif isinstance(campo, models.DateTimeField):
+            conversiones.append((posicion, datetime.datetime.isoformat))
+    return conversiones
+
+
+def filas(params=None, incluir=(), chunk_size=CHUNK_SIZE):
+    """Genera una lista por tarjeta disponible, en el orden de `columnas_exportacion`"""
+    campos = [COLUMNAS[c] for c in COLUMNAS]
+    campos += [COLUMNAS_OPCIONALES[c] for c in COLUMNAS_OPCIONALES if c in incluir]
+    conversiones = _conversiones(campos)
+    posicion_slug = campos.index('slug')
+    base_url = reverse('productos:index')
+
+    queryset = filtrar_cards(params or {}).order_by('producto_id').values_list(*campos)
+    for fila in queryset.iterator(chunk_size=chunk_size):
+        fila = list(fila)
+        for posicion, convertir in conversiones:
+            if fila[posicion] is not None:
+                fila[posicion] = convertir(fila[posicion])
+        fila.append(f'{base_url}{fila[posicion_slug]}/')
+        yield fila
+
+
+def _por_bloques(lineas):
+    bloque = []
+    for linea in lineas:
+        bloque.append(linea)
+        if len(bloque) >= FILAS_POR_BLOQUE:
+            yield ''.join(bloque).encode('utf-8')
+            bloque = []
+    if bloque:
+        yield ''.join(bloque).encode('utf-8')
+
+
+def exportar_jsonl(params=None, incluir=(), chunk_size=CHUNK_SIZE):
+    """Bloques de bytes en JSON Lines (un objeto por producto)"""
+    columnas = columnas_exportacion(incluir)
+    return _por_bloques(
+        json.dumps(dict(zip(columnas, fila)), ensure_ascii=False) + '\n'
+        for fila in filas(params, incluir, chunk_size)
+    )
+
+
+def exportar_csv(params=None, incluir=(), chunk_size=CHUNK_SIZE):
+    """Bloques de bytes en CSV con cabecera"""
+    columnas = columnas_exportacion(incluir)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def lineas():
+        writer.writerow(columnas)
+        for fila in filas(params, incluir, chunk_size):
+            writer.writerow(fila)
+            linea = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            yield linea
+
+    return _por_bloques(lineas())
+
+
+def exportar(formato, params=None, incluir=(), chunk_size=CHUNK_SIZE):
+    if formato == 'jsonl':
+        return exportar_jsonl(params, incluir, chunk_size)
+    if formato == 'csv':
+        return exportar_csv(params, incluir, chunk_size)
+    raise ExportacionInvalida(f"Formato no soportado: {formato}")
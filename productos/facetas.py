@@ -0,0 +1,216 @@
+"""
+Conteos materializados de facetas del catálogo.
+
+Cada tarjeta disponible aporta uno a la combinación (faceta, valor) de cada
+uno de sus atributos filtrables, tanto de forma global como condicionada a
+cada uno de sus otros atributos (combinaciones de un solo filtro). Los
+conteos se ajustan con deltas cuando cambian las tarjetas, así que las
+consultas de facetas no agregan nada en tiempo de petición.
+"""
+
+import copy
+import logging
+from collections import Counter
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, F, Q
+
+from .models import (Categoria, Estatus, FacetaConteo, Marca, ProductoCard,
+                     Proveedor, Subcategoria)
+from .taxonomias import registro_taxonomias
+
+logger = logging.getLogger(__name__)
+
+# Facetas filtrables (mismos nombres que los parámetros de la API)
+FACETAS = ('categoria', 'subcategoria', 'marca', 'proveedor', 'estatus', 'destacado', 'en_oferta')
+FACETAS_TAXONOMIA = {
+    'categoria': Categoria,
+    'subcategoria': Subcategoria,
+    'marca': Marca,
+    'proveedor': Proveedor,
+    'estatus': Estatus,
+}
+FACETA_TOTAL = 'total'
+VALOR_TOTAL = '*'
+
+# Campos de ProductoCard necesarios para calcular facetas
+CAMPOS_FACETAS = [
+    'disponible', 'destacado', 'en_oferta',
+    'categoria_id', 'subcategoria_id', 'marca_id', 'proveedor_id', 'estatus_id',
+]
+
+
+def valores_faceta(card):
+    """Pares (faceta, valor) que aporta una tarjeta (vacío si no está disponible)"""
+    if not card.disponible:
+        return []
+    pares = []
+    for faceta in FACETAS_TAXONOMIA:
+        valor = getattr(card, f'{faceta}_id')
+        if valor is not None:
+            pares.append((faceta, str(valor)))
+    if card.destacado:
+        pares.append(('destacado', 'true'))
+    if card.en_oferta:
+        pares.append(('en_oferta', 'true'))
+    return pares
+
+
+def claves_faceta(card):
+    """Claves (filtro, filtro_valor, faceta, valor) a las que contribuye la tarjeta"""
+    if not card.disponible:
+        return []
+    pares = valores_faceta(card)
+    claves = [('', '', FACETA_TOTAL, VALOR_TOTAL)]
+    claves += [('', '', faceta, valor) for faceta, valor in pares]
+    for filtro, filtro_valor in pares:
+        claves.append((filtro, filtro_valor, FACETA_TOTAL, VALOR_TOTAL))
+        claves += [
+            (filtro, filtro_valor, faceta, valor)
+            for faceta, valor in pares if faceta != filtro
+        ]
+    return claves
+
+
+def _q_clave(clave):
+    filtro, filtro_valor, faceta, valor = clave
+    return Q(filtro=filtro, filtro_valor=filtro_valor, faceta=faceta, valor=valor)
+
+
+def aplicar_deltas(deltas):
+    """Aplica un Counter {clave: delta} sobre la tabla de conteos"""
+    deltas = {clave: delta for clave, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    # Asegurar que existen las filas que van a incrementarse
+    FacetaConteo.objects.bulk_create(
+        [FacetaConteo(filtro=c[0], filtro_valor=c[1], faceta=c[2], valor=c[3])
+         for c, delta in deltas.items() if delta > 0],
+        ignore_conflicts=True,
+    )
+
+    # Un UPDATE por valor de delta (normalmente solo +1 y -1)
+    por_delta = {}
+    for clave, delta in deltas.items():
+        por_delta.setdefault(delta, []).append(clave)
+    for delta, claves in por_delta.items():
+        FacetaConteo.objects.filter(
+            reduce(or_, (_q_clave(clave) for clave in claves))
+        ).update(total=F('total') + delta)
+
+
+def registrar_cambio(anteriores, nuevas):
+    """Ajusta los conteos al reemplazar las tarjetas `anteriores` por `nuevas`"""
+    deltas = Counter()
+    for card in anteriores:
+        for clave in claves_faceta(card):
+            deltas[clave] -= 1
+    for card in nuevas:
+        for clave in claves_faceta(card):
+            deltas[clave] += 1
+    aplicar_deltas(deltas)
+
+
+def reconstruir_facetas(chunk_size=2000):
+    """Recalcula toda la tabla de conteos desde las tarjetas. Retorna las filas creadas"""
+    conteos = Counter()
+    for card in ProductoCard.objects.filter(disponible=True).only(*CAMPOS_FACETAS).iterator(chunk_size=chunk_size):
+        conteos.update(claves_faceta(card))
+
+    FacetaConteo.objects.all().delete()
+    FacetaConteo.objects.bulk_create(
+        [FacetaConteo(filtro=c[0], filtro_valor=c[1], faceta=c[2], valor=c[3], total=total)
+         for c, total in conteos.items()],
+        batch_size=1000,
+    )
+    logger.info(f"Conteos de facetas reconstruidos: {len(conteos)} filas")
+    return len(conteos)
+
+
+# ==================== CONSULTA ====================
+
+def seleccion_faceta(params):
+    """
+    Convierte los filtros de la querystring en pares (faceta, valor) con
+    los ids que usan los conteos. Retorna None si algún valor no existe.
+    """
+    seleccion = []
+    for faceta in FACETAS:
+        valor = params.get(faceta)
+        if not valor:
+            continue
+        if faceta in ('categoria', 'subcategoria'):
+            # La API filtra categorías y subcategorías por slug
+            objeto = registro_taxonomias().obtener_por_slug(faceta, valor)
+            if objeto is None:
+                return None
+            valor = objeto.pk
+        elif faceta in ('destacado', 'en_oferta'):
+            if valor != 'true':
+                continue
+        seleccion.append((faceta, str(valor)))
+    return seleccion
+
+
+def conteos_precalculados(filtro='', filtro_valor=''):
+    """
+    Conteos materializados {faceta: {valor: total}} para cero o un filtro.
+    La faceta del propio filtro se devuelve sin condicionar, para que el
+    resto de sus opciones sigan mostrando cuántos productos tienen.
+    """
+    condicion = Q(filtro=filtro, filtro_valor=filtro_valor)
+    if filtro:
+        condicion |= Q(filtro='', filtro_valor='', faceta=filtro)
+    conteos = {}
+    filas = FacetaConteo.objects.filter(condicion, total__gt=0).values_list('faceta', 'valor', 'total')
+    for faceta, valor, total in filas:
+        conteos.setdefault(faceta, {})[valor] = total
+    return conteos
+
+
+def conteos_en_vivo(queryset):
+    """Conteos agregados al vuelo para combinaciones de varios filtros"""
+    conteos = {FACETA_TOTAL: {VALOR_TOTAL: queryset.count()}}
+    for faceta in FACETAS_TAXONOMIA:
+        campo = f'{faceta}_id'
+        filas = queryset.exclude(**{f'{campo}__isnull': True}).values(campo).annotate(n=Count('pk')).order_by()
+        conteos[faceta] = {str(fila[campo]): fila['n'] for fila in filas}
+    for faceta in ('destacado', 'en_oferta'):
+        total = queryset.filter(**{faceta: True}).count()
+        conteos[faceta] = {'true': total} if total else {}
+    return conteos
+
+
+def anotar_conteos(objetos, faceta, conteos=None):
+    """
+    Asigna `num_productos` a cada taxonomía según los conteos globales.
+    Retorna la lista de objetos para poder usarla directamente en templates.
+    """
+    if conteos is None:
+        conteos = conteos_precalculados().get(faceta, {})
+    anotados = []
+    for objeto in objetos:
+        # Copia: los objetos pueden venir del registro de taxonomías compartido
+        objeto = copy.copy(objeto)
+        objeto.num_productos = conteos.get(str(objeto.pk), 0)
+        anotados.append(objeto)
+    return anotados
+
+
+def categorias_con_conteos(conteos=None):
+    """
+    Categorías activas del registro con `num_productos` y sus subcategorías
+    anotadas en `subcategorias_anotadas` (menú de navegación y catálogo).
+    """
+    if conteos is None:
+        conteos = conteos_precalculados()
+    categorias = anotar_conteos(
+        registro_taxonomias().activos('categoria'), 'categoria', conteos.get('categoria', {})
+    )
+    for categoria in categorias:
+        categoria.subcategorias_anotadas = anotar_conteos(
+            categoria.subcategorias.all(), 'subcategoria', conteos.get('subcategoria', {})
+        )
+    return categorias
@@ -0,0 +1,278 @@
+"""
+Sitemaps y feed de productos para buscadores y Merchant Center.
+
+Los archivos se generan fuera de las peticiones (`manage.py generar_feeds`)
+en `FEEDS_ROOT`, con sus variantes .gz/.br, y los sirve
+`kitaluro.middleware.FeedFilesMiddleware` con WhiteNoise:
+
+    sitemap.xml                     índice de sitemaps
+    sitemaps/paginas.xml            páginas fijas (inicio, catálogo, contacto)
+    sitemaps/productos-<n>.xml      URLs de productos del bloque n
+    feeds/productos-<n>.xml         feed de Merchant Center (RSS 2.0 + g:)
+    feeds/productos-<n>.csv         el mismo feed en CSV
+
+Los productos se reparten en bloques por rango de id (`POR_BLOQUE` ids por
+bloque), de modo que ningún archivo supera las 50.000 URLs y un producto
+siempre cae en el mismo bloque. Cada ejecución solo regenera los bloques
+con tarjetas actualizadas desde la anterior (marca de agua) o cuyo número
+de tarjetas cambió (productos eliminados); el estado de cada bloque se
+guarda en `estado.json`.
+"""
+
+import csv
+import json
+import logging
+import os
+import re
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, IntegerField, Max, Q
+from django.db.models.functions import Cast
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import MarcaDeAgua, ProductoCard
+
+logger = logging.getLogger(__name__)
+
+CLAVE_MARCA_AGUA = 'productos.feeds'
+
+# Límite de URLs por sitemap del protocolo
+POR_BLOQUE = 50000
+MONEDA = 'USD'
+
+ARCHIVO_INDICE = 'sitemap.xml'
+ARCHIVO_ESTADO = 'estado.json'
+# Rutas servidas por FeedFilesMiddleware (relativas a la raíz)
+RUTAS_PUBLICAS = re.compile(r'(sitemap\.xml|sitemaps/[-\w]+\.xml|feeds/[-\w]+\.(xml|csv))')
+
+COLUMNAS_FEED = [
+    'id', 'title', 'description', 'link', 'image_link', 'availability', 'price',
+    'sale_price', 'brand', 'mpn', 'product_type', 'condition', 'identifier_exists',
+]
+
+CAMPOS = [
+    'producto_id', 'slug', 'nombre', 'descripcion_corta', 'sku', 'imagen_url',
+    'stock', 'precio', 'precio_final', 'tiene_descuento', 'marca_nombre',
+    'categoria_nombre', 'subcategoria_nombre', 'fecha_actualizacion',
+]
+
+
+def raiz_feeds():
+    return Path(settings.FEEDS_ROOT)
+
+
+def url_absoluta(ruta):
+    if ruta.startswith(('http://', 'https://')):
+        return ruta
+    return settings.SITE_URL.rstrip('/') + ruta
+
+
+# ==================== ESCRITURA ====================
+
+@contextmanager
+def _archivo(raiz, relativa):
+    """Abre un temporal para escribir; al cerrar lo reemplaza y genera .gz/.br"""
+    from whitenoise.compress import Compressor
+
+    archivo = raiz / relativa
+    archivo.parent.mkdir(parents=True, exist_ok=True)
+    temporal = archivo.with_name(f'.{archivo.name}.{uuid.uuid4().hex}.tmp')
+    try:
+        with open(temporal, 'w', encoding='utf-8', newline='') as salida:
+            yield salida
+        _eliminar(archivo)
+        os.replace(temporal, archivo)
+    finally:
+        temporal.unlink(missing_ok=True)
+    list(Compressor(quiet=True).compress(str(archivo)))
+
+
+def _eliminar(archivo):
+    for ruta in (archivo, archivo.with_name(archivo.name + '.gz'), archivo.with_name(archivo.name + '.br')):
+        ruta.unlink(missing_ok=True)
+
+
+def _fecha(valor):
+    return valor.isoformat(timespec='seconds')
+
+
+# ==================== BLOQUES ====================
+
+def _bloque_de():
+    return Cast(F('producto_id') / POR_BLOQUE, IntegerField())
+
+
+def resumen_bloques():
+    """{bloque: {'tarjetas', 'urls', 'modificado', 'lastmod'}} en una sola consulta agregada"""
+    filas = ProductoCard.objects.order_by().annotate(bloque=_bloque_de()).values('bloque').annotate(
+        tarjetas=Count('pk'),
+        urls=Count('pk', filter=Q(disponible=True)),
+        modificado=Max('actualizado'),
+        lastmod=Max('fecha_actualizacion', filter=Q(disponible=True)),
+    )
+    return {fila.pop('bloque'): fila for fila in filas}
+
+
+def _productos(bloque):
+    return ProductoCard.objects.filter(
+        disponible=True,
+        producto_id__gte=bloque * POR_BLOQUE,
+        producto_id__lt=(bloque + 1) * POR_BLOQUE,
+    ).order_by('producto_id').values_list(*CAMPOS).iterator(chunk_size=2000)
+
+
+def _item_feed(fila, base_url):
+    datos = dict(zip(CAMPOS, fila))
+    precio = datos['precio'] if datos['precio'] is not None else datos['precio_final']
+    tipo = ' > '.join(n for n in (datos['categoria_nombre'], datos['subcategoria_nombre']) if n)
+    return {
+        'id': datos['sku'] or str(datos['producto_id']),
+        'title': datos['nombre'],
+        'description': datos['descripcion_corta'] or datos['nombre'],
+        'link': url_absoluta(f"{base_url}{datos['slug']}/"),
+        'image_link': url_absoluta(datos['imagen_url']) if datos['imagen_url'] else '',
+        'availability': 'in_stock' if datos['stock'] > 0 else 'out_of_stock',
+        'price': f'{precio} {MONEDA}' if precio is not None else '',
+        'sale_price': f"{datos['precio_final']} {MONEDA}" if datos['tiene_descuento'] else '',
+        'brand': datos['marca_nombre'],
+        'mpn': datos['sku'],
+        'product_type': tipo,
+        'condition': 'new',
+        'identifier_exists': 'yes' if datos['sku'] and datos['marca_nombre'] else 'no',
+    }
+
+
+def generar_bloque(bloque, raiz=None):
+    """Escribe el sitemap y los feeds (XML y CSV) de un bloque. Retorna el número de productos"""
+    raiz = raiz or raiz_feeds()
+    base_url = reverse('productos:index')
+    total = 0
+    with _archivo(raiz, f'sitemaps/productos-{bloque}.xml') as sitemap, \
+            _archivo(raiz, f'feeds/productos-{bloque}.xml') as feed_xml, \
+            _archivo(raiz, f'feeds/productos-{bloque}.csv') as feed_csv:
+        sitemap.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                      '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        feed_xml.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                       '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n<channel>\n'
+                       f'<title>Kitaluro</title>\n<link>{escape(url_absoluta("/"))}</link>\n'
+                       '<description>Catálogo de productos</description>\n')
+        writer = csv.writer(feed_csv)
+        writer.writerow(COLUMNAS_FEED)
+
+        for fila in _productos(bloque):
+            item = _item_feed(fila, base_url)
+            lastmod = _fecha(fila[-1])
+            sitemap.write(f"<url><loc>{escape(item['link'])}</loc><lastmod>{lastmod}</lastmod></url>\n")
+            feed_xml.write('<item>' + ''.join(
+                f'<g:{columna}>{escape(valor)}</g:{columna}>' for columna, valor in item.items() if valor
+            ) + '</item>\n')
+            writer.writerow(item.values())
+            total += 1
+
+        sitemap.write('</urlset>\n')
+        feed_xml.write('</channel>\n</rss>\n')
+    return total
+
+
+def eliminar_bloque(bloque, raiz=None):
+    raiz = raiz or raiz_feeds()
+    for relativa in (f'sitemaps/productos-{bloque}.xml', f'feeds/productos-{bloque}.xml',
+                     f'feeds/productos-{bloque}.csv'):
+        _eliminar(raiz / relativa)
+
+
+def generar_paginas(raiz=None):
+    """Sitemap de las páginas fijas del sitio"""
+    raiz = raiz or raiz_feeds()
+    with _archivo(raiz, 'sitemaps/paginas.xml') as sitemap:
+        sitemap.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                      '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        for nombre in ('home', 'productos:index', 'contacto'):
+            sitemap.write(f'<url><loc>{escape(url_absoluta(reverse(nombre)))}</loc></url>\n')
+        sitemap.write('</urlset>\n')
+
+
+def generar_indice(bloques, raiz=None):
+    """Índice de sitemaps con la fecha de la última modificación de cada bloque"""
+    raiz = raiz or raiz_feeds()
+    with _archivo(raiz, ARCHIVO_INDICE) as indice:
+        indice.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                     '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        indice.write(f'<sitemap><loc>{escape(url_absoluta("/sitemaps/paginas.xml"))}</loc></sitemap>\n')
+        for bloque, datos in sorted(bloques.items()):
+            if not datos['urls']:
+                continue
+            loc = escape(url_absoluta(f'/sitemaps/productos-{bloque}.xml'))
+            indice.write(f"<sitemap><loc>{loc}</loc><lastmod>{datos['lastmod']}</lastmod></sitemap>\n")
+        indice.write('</sitemapindex>\n')
+
+
+# ==================== GENERACIÓN INCREMENTAL ====================
+
+def _leer_estado(raiz):
+    try:
+        return {int(k): v for k, v in json.loads((raiz / ARCHIVO_ESTADO).read_text()).items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def _guardar_estado(raiz, estado):
+    temporal = raiz / f'.{ARCHIVO_ESTADO}.{uuid.uuid4().hex}.tmp'
+    temporal.write_text(json.dumps({str(k): v for k, v in sorted(estado.items())}, indent=2))
+    os.replace(temporal, raiz / ARCHIVO_ESTADO)
+
+
+def generar_feeds(completo=False, progreso=None):
+    """
+    Regenera los bloques modificados desde la última ejecución (o todos con
+    `completo`) y el índice. Retorna (bloques regenerados, bloques totales).
+    """
+    raiz = raiz_feeds()
+    inicio = timezone.now()
+    marca_agua = None if completo else MarcaDeAgua.obtener(CLAVE_MARCA_AGUA)
+    anterior = {} if completo else _leer_estado(raiz)
+    resumen = resumen_bloques()
+
+    estado = {}
+    regenerados = 0
+    for bloque, datos in sorted(resumen.items()):
+        previo = anterior.get(bloque)
+        vigente = (
+            marca_agua is not None
+            and previo is not None
+            and previo['tarjetas'] == datos['tarjetas']
+            and datos['modificado'] <= marca_agua
+            and (raiz / f'sitemaps/productos-{bloque}.xml').exists()
+        )
+        if vigente:
+            estado[bloque] = previo
+            continue
+
+        urls = generar_bloque(bloque, raiz)
+        estado[bloque] = {
+            'tarjetas': datos['tarjetas'],
+            'urls': urls,
+            'lastmod': _fecha(datos['lastmod'] or datos['modificado']),
+        }
+        regenerados += 1
+        if progreso:
+            progreso(bloque, urls)
+
+    # Bloques que se quedaron sin tarjetas
+    for bloque in set(anterior) - set(estado):
+        eliminar_bloque(bloque, raiz)
+        regenerados += 1
+
+    if regenerados or not (raiz / ARCHIVO_INDICE).exists():
+        generar_paginas(raiz)
+        generar_indice(estado, raiz)
+    _guardar_estado(raiz, estado)
+    MarcaDeAgua.guardar(CLAVE_MARCA_AGUA, inicio)
+    logger.info(f"Feeds generados: {regenerados} de {len(estado)} bloque(s)")
+    return regenerados, len(estado)
+
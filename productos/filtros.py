@@ -0,0 +1,70 @@
+"""
+Filtros públicos del catálogo compartidos por la API JSON, la página de
+catálogo y los fragmentos HTML paginados.
+"""
+
+from urllib.parse import urlencode
+
+from .models import ProductoCard
+from .search import condicion_busqueda
+
+# Parámetros de la querystring que afectan al resultado de un listado
+PARAMETROS_FILTRO = (
+    'categoria',
+    'subcategoria',
+    'marca',
+    'proveedor',
+    'estatus',
+    'destacado',
+    'en_oferta',
+    'q',
+    'orden',
+)
+
+
+def parametros_filtro(querydict):
+    """Extrae los parámetros de filtrado no vacíos de la querystring"""
+    params = {}
+    for nombre in PARAMETROS_FILTRO:
+        valor = (querydict.get(nombre) or '').strip()
+        if valor:
+            params[nombre] = valor
+    return params
+
+
+def clave_filtros(params):
+    """Representación canónica (ordenada) de los filtros, apta para claves de caché"""
+    return urlencode(sorted(params.items()))
+
+
+def filtrar_cards(params):
+    """Retorna las tarjetas disponibles que cumplen los filtros (sin ordenar)"""
+    productos = ProductoCard.objects.filter(disponible=True)
+
+    if params.get('categoria'):
+        productos = productos.filter(categoria_slug=params['categoria'])
+
+    if params.get('subcategoria'):
+        productos = productos.filter(subcategoria_slug=params['subcategoria'])
+
+    if params.get('marca'):
+        productos = productos.filter(marca_id=params['marca'])
+
+    if params.get('proveedor'):
+        productos = productos.filter(proveedor_id=params['proveedor'])
+
+    if params.get('estatus'):
+        productos = productos.filter(estatus_id=params['estatus'])
+
+    if params.get('destacado') == 'true':
+        productos = productos.filter(destacado=True)
+
+    if params.get('en_oferta') == 'true':
+        productos = productos.filter(en_oferta=True)
+
+    busqueda = params.get('q')
+    if busqueda:
+        # Índice FTS5 si está disponible; si no, prefijo indexado del nombre normalizado
+        productos = productos.filter(condicion_busqueda(busqueda))
+
+    return productos
@@ -0,0 +1,253 @@
+"""
+Asignación de identificadores únicos de producto (slug y SKU).
+
+Los valores repetidos se desambiguan con un sufijo: `slug`, `slug-1`,
+`slug-2`... y `SKU`, `SKU-01`, `SKU-02`...
+
+- Un producto (`asignar_slug`, `asignar_sku`): una sola consulta trae todos
+  los valores que colisionan con la base y se elige el primer sufijo libre.
+- Un lote (`ReservaIdentificadores`, `crear_productos`): se generan
+  candidatos para todas las filas y se comprueban con una consulta por ronda.
+
+Ninguna comprobación previa evita la carrera entre dos guardados
+simultáneos: la garantía la dan las restricciones UNIQUE, y quien pierde
+la carrera recibe un IntegrityError y reintenta con un valor nuevo
+(`Producto.save`, `crear_productos`).
+"""
+
+from datetime import datetime
+import uuid
+
+from django.db import IntegrityError, transaction
+from django.utils.text import slugify
+
+# Reintentos ante IntegrityError por un identificador tomado entre la consulta y el INSERT
+INTENTOS = 5
+
+LONGITUD_SLUG = 250
+# Margen para el sufijo numérico de los slugs repetidos
+LONGITUD_BASE_SLUG = LONGITUD_SLUG - 10
+# Valores por consulta IN (por debajo del límite de parámetros de SQLite)
+VALORES_POR_CONSULTA = 2000
+
+
+def slug_base(nombre):
+    """Slug del nombre sin desambiguar"""
+    return slugify(nombre)[:LONGITUD_BASE_SLUG].strip('-') or 'producto'
+
+
+def prefijo_sku(proveedor=None, categoria=None, ahora=None):
+    """Parte fija del SKU generado: PROV-CAT-YYMMDD-HHMM"""
+    if proveedor:
+        # Primeras 3 letras del proveedor
+        proveedor_code = ''.join(c for c in proveedor.nombre if c.isalnum())[:3].upper()
+    else:
+        proveedor_code = 'GEN'  # General si no hay proveedor
+
+    if categoria:
+        # Primeras 2 letras de la categoría
+        categoria_code = ''.join(c for c in categoria.nombre if c.isalnum())[:2].upper()
+    else:
+        categoria_code = 'XX'  # Default si no hay categoría
+
+    ahora = ahora or datetime.now()
+    return f"{proveedor_code}-{categoria_code}-{ahora:%y%m%d}-{ahora:%H%M}"
+
+
+def sku_base(prefijo):
+    """SKU candidato: prefijo y los últimos 4 dígitos de un UUID4"""
+    return f"{prefijo}-{uuid.uuid4().hex[-4:].upper()}"
+
+
+def _sufijo_slug(base, n):
+    return f"{base}-{n}"
+
+
+def _sufijo_sku(base, n):
+    return f"{base}-{n:02d}"
+
+
+def colisiones(campo, base, excluir_pk=None):
+    """
+    Valores de `campo` iguales a `base` o de la forma `base-...`, en una
+    consulta. Se usa un rango (base- <= valor < base.) en lugar de
+    `startswith`: aprovecha el índice UNIQUE y no depende de LIKE.
+    """
+    from django.db.models import Q
+
+    from .models import Producto
+
+    queryset = Producto.objects.filter(
+        Q(**{campo: base}) | Q(**{f'{campo}__gte': f'{base}-', f'{campo}__lt': f'{base}.'})
+    )
+    if excluir_pk is not None:
+        queryset = queryset.exclude(pk=excluir_pk)
+    return set(queryset.values_list(campo, flat=True))
+
+
+def _primero_libre(base, en_uso, sufijo):
+    if base not in en_uso:
+        return base
+    n = 1
+    while sufijo(base, n) in en_uso:
+        n += 1
+    return sufijo(base, n)
+
+
+def asignar_slug(nombre, excluir_pk=None):
+    """Primer slug libre para el nombre (una consulta)"""
+    base = slug_base(nombre)
+    return _primero_libre(base, colisiones('slug', base, excluir_pk), _sufijo_slug)
+
+
+def asignar_sku(prefijo, excluir_pk=None):
+    """SKU libre con el formato PREFIJO-XXXX (una consulta)"""
+    base = sku_base(prefijo)
+    return _primero_libre(base, colisiones('sku', base, excluir_pk), _sufijo_sku)
+
+
+def ocupados(campo, valores, excluir_pk=None):
+    """Valores de `campo` que ya usa algún producto (consultas por bloques)"""
+    from .models import Producto
+
+    valores = list(valores)
+    queryset = Producto.objects.all()
+    if excluir_pk is not None:
+        queryset = queryset.exclude(pk=excluir_pk)
+    encontrados = set()
+    for inicio in range(0, len(valores), VALORES_POR_CONSULTA):
+        bloque = valores[inicio:inicio + VALORES_POR_CONSULTA]
+        encontrados.update(queryset.filter(**{f'{campo}__in': bloque}).values_list(campo, flat=True))
+    return encontrados
+
+
+def _reservar(campo, bases, sufijo, reservados, siguiente):
+    """
+    Asigna a cada base un valor único probando `base`, `sufijo(base, 1)`,
+    `sufijo(base, 2)`... Las filas con la misma base reciben valores
+    distintos. En cada ronda se prueban más candidatos por base pendiente,
+    de modo que las bases muy repetidas no requieren una consulta por fila.
+    `siguiente` recuerda, por base, el primer sufijo aún no probado.
+    """
+    asignados = [None] * len(bases)
+    pendientes = {}
+    for posicion, base in enumerate(bases):
+        pendientes.setdefault(base, []).append(posicion)
+
+    ronda = 0
+    while pendientes:
+        candidatos = {}
+        for base, posiciones in pendientes.items():
+            lista = []
+            n = siguiente.get(base, 0)
+            while len(lista) < len(posiciones) * 2 ** ronda:
+                candidato = base if n == 0 else sufijo(base, n)
+                n += 1
+                if candidato not in reservados:
+                    lista.append(candidato)
+            candidatos[base] = lista
+            siguiente[base] = n
+
+        en_uso = ocupados(campo, (c for lista in candidatos.values() for c in lista))
+        for base, lista in candidatos.items():
+            libres = [c for c in lista if c not in en_uso]
+            posiciones = pendientes[base]
+            for posicion, candidato in zip(posiciones, libres):
+                asignados[posicion] = candidato
+                reservados.add(candidato)
+            pendientes[base] = posiciones[len(libres):]
+        pendientes = {base: posiciones for base, posiciones in pendientes.items() if posiciones}
+        ronda += 1
+    return asignados
+
+
+class ReservaIdentificadores:
+    """
+    Reserva slugs y SKUs para varios lotes consecutivos. Recuerda los
+    valores ya asignados y, por cada base, hasta qué sufijo se probó: un
+    nombre repetido en todo el archivo no vuelve a comprobar desde cero los
+    sufijos que ocuparon los lotes anteriores.
+    """
+
+    def __init__(self):
+        self.reservados = {'slug': set(), 'sku': set()}
+        self.siguiente = {'slug': {}, 'sku': {}}
+
+    def reservar_skus(self, skus):
+        """Marca como ocupados SKUs elegidos fuera de la reserva (p. ej. los del archivo)"""
+        self.reservados['sku'].update(skus)
+
+    def slugs(self, nombres):
+        """Slugs únicos para los nombres dados, en el mismo orden"""
+        return _reservar('slug', [slug_base(nombre) for nombre in nombres], _sufijo_slug,
+                         self.reservados['slug'], self.siguiente['slug'])
+
+    def skus(self, prefijos):
+        """SKUs únicos con el formato PREFIJO-XXXX (y -NN si el sufijo aleatorio ya existe)"""
+        return _reservar('sku', [sku_base(prefijo) for prefijo in prefijos], _sufijo_sku,
+                         self.reservados['sku'], self.siguiente['sku'])
+
+    def completar(self, productos, ahora=None):
+        """
+        Asigna slug y SKU a los productos sin guardar que no los tengan.
+        Retorna {id(producto): campos asignados} para poder reasignarlos.
+        """
+        ahora = ahora or datetime.now()
+        asignados = {}
+        self.reservar_skus(p.sku for p in productos if p.sku)
+
+        sin_sku = [p for p in productos if not p.sku]
+        for producto, sku in zip(sin_sku, self.skus([prefijo_sku(p.proveedor, p.categoria, ahora) for p in sin_sku])):
+            producto.sku = sku
+            asignados.setdefault(id(producto), set()).add('sku')
+
+        sin_slug = [p for p in productos if not p.slug]
+        for producto, slug in zip(sin_slug, self.slugs([p.nombre for p in sin_slug])):
+            producto.slug = slug
+            asignados.setdefault(id(producto), set()).add('slug')
+        return asignados
+
+    def reasignar(self, productos, asignados):
+        """
+        Tras un IntegrityError, vuelve a asignar los identificadores generados
+        que otro proceso ocupó mientras tanto. Retorna False si no hay ninguno
+        que cambiar (el conflicto está en un valor que no se generó aquí).
+        """
+        cambiados = False
+        for campo in ('slug', 'sku'):
+            generados = [p for p in productos if campo in asignados.get(id(p), ())]
+            tomados = ocupados(campo, (getattr(p, campo) for p in generados))
+            perdidos = [p for p in generados if getattr(p, campo) in tomados]
+            if not perdidos:
+                continue
+            if campo == 'slug':
+                nuevos = self.slugs([p.nombre for p in perdidos])
+            else:
+                nuevos = self.skus([prefijo_sku(p.proveedor, p.categoria) for p in perdidos])
+            for producto, valor in zip(perdidos, nuevos):
+                setattr(producto, campo, valor)
+            cambiados = True
+        return cambiados
+
+
+def crear_productos(productos, reserva=None, antes_de_insertar=None):
+    """
+    Inserta con bulk_create productos sin guardar, asignando slug y SKU a
+    los que no los traigan. Si otro proceso ocupa alguno de los valores
+    asignados antes del INSERT, reasigna solo esos y reintenta.
+    `antes_de_insertar(productos)` recalcula los campos que dependen de los
+    identificadores (p. ej. el texto de búsqueda, que incluye el SKU).
+    """
+    from .models import Producto
+
+    reserva = reserva or ReservaIdentificadores()
+    asignados = reserva.completar(productos)
+    for intento in range(INTENTOS):
+        if antes_de_insertar:
+            antes_de_insertar(productos)
+        try:
+            with transaction.atomic():
+                return Producto.objects.bulk_create(productos)
+        except IntegrityError:
+            if intento == INTENTOS - 1 or not reserva.reasignar(productos, asignados):
+                raise
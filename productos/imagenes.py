@@ -0,0 +1,175 @@
+"""
+Optimización de imágenes en segundo plano.
+
+Al guardar un producto o una imagen de galería, el archivo subido se
+almacena tal cual y se encola una `TareaImagen`; la petición no espera al
+decodificado, redimensionado y recodificado JPEG. El comando
+`procesar_imagenes` reparte la cola entre procesos trabajadores:
+
+1. Cada trabajador reclama la tarea pendiente más antigua con un UPDATE
+   condicionado al estado (sin bloqueos: si otro la tomó antes, prueba con
+   la siguiente). Las tareas que llevan demasiado tiempo en proceso (un
+   trabajador que murió) vuelven a reclamarse.
+2. Optimiza el archivo original y guarda el resultado como un archivo nuevo.
+3. Sustituye el archivo en la fila solo si sigue apuntando al original (si
+   entretanto se subió otra imagen, la tarea se descarta) y elimina el
+   sobrante. Después refresca la tarjeta del producto e invalida el
+   catálogo.
+"""
+
+import logging
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from . import publicacion
+from .cache_utils import incrementar_version_catalogo
+from .cloudinary_utils import optimize_image_buffer
+from .models import ProductImage, Producto, TareaImagen
+from .read_models import refrescar_tarjeta
+
+logger = logging.getLogger(__name__)
+
+MAX_INTENTOS = 3
+# Una tarea en proceso más tiempo que esto se considera abandonada
+TIEMPO_MAXIMO = timedelta(minutes=10)
+# Segundos entre consultas a la cola vacía en modo continuo
+ESPERA = 5
+
+
+# ==================== ESTADO ====================
+
+def con_estado(imagenes):
+    """Anota en cada imagen de galería el estado de su última tarea (`estado_procesado`)"""
+    ultima = TareaImagen.objects.filter(imagen=OuterRef('pk')).order_by('-id')
+    return imagenes.annotate(estado_procesado=Subquery(ultima.values('estado')[:1]))
+
+
+def estado_imagen_principal(producto_id):
+    """Estado de la última tarea de la imagen principal del producto (None si no hay)"""
+    return TareaImagen.objects.filter(
+        producto_id=producto_id, imagen__isnull=True
+    ).order_by('-id').values_list('estado', flat=True).first()
+
+
+# ==================== COLA ====================
+
+def _reclamables():
+    return Q(estado=TareaImagen.PENDIENTE) | Q(
+        estado=TareaImagen.PROCESANDO, fecha_inicio__lt=timezone.now() - TIEMPO_MAXIMO
+    )
+
+
+def reclamar(trabajador):
+    """Marca como en proceso la tarea reclamable más antigua y la retorna (None si no hay)"""
+    while True:
+        tarea_id = TareaImagen.objects.filter(_reclamables()).order_by('id').values_list('id', flat=True).first()
+        if tarea_id is None:
+            return None
+        reclamada = TareaImagen.objects.filter(_reclamables(), pk=tarea_id).update(
+            estado=TareaImagen.PROCESANDO,
+            trabajador=trabajador,
+            fecha_inicio=timezone.now(),
+            intentos=F('intentos') + 1,
+        )
+        if reclamada:
+            return TareaImagen.objects.get(pk=tarea_id)
+
+
+def _finalizar(tarea, estado, error=''):
+    TareaImagen.objects.filter(pk=tarea.pk).update(estado=estado, error=error, fecha_fin=timezone.now())
+
+
+def _refrescar(producto_id):
+    """
+    Refresca la tarjeta dentro de la transacción de la sustitución: tras el
+    UPDATE ya tiene el bloqueo de escritura, así que con varios trabajadores
+    sobre SQLite no hay que promover una lectura a escritura.
+    """
+    refrescar_tarjeta(producto_id)
+    transaction.on_commit(incrementar_version_catalogo)
+    if publicacion.publicacion_activa():
+        publicacion.programar_publicacion(producto_id)
+
+
+# ==================== PROCESADO ====================
+
+def _destino(tarea):
+    """(modelo, pk, campo) de la fila cuyo archivo procesa la tarea"""
+    if tarea.imagen_id:
+        return ProductImage, tarea.imagen_id, 'image'
+    return Producto, tarea.producto_id, 'imagen'
+
+
+def procesar(tarea):
+    """Optimiza la imagen de la tarea y la sustituye en su fila. Retorna el estado final"""
+    modelo, pk, campo = _destino(tarea)
+    storage = modelo._meta.get_field(campo).storage
+
+    if not modelo.objects.filter(pk=pk, **{campo: tarea.archivo}).exists():
+        # Se reemplazó o eliminó la imagen desde que se encoló
+        _finalizar(tarea, TareaImagen.DESCARTADA)
+        return TareaImagen.DESCARTADA
+
+    with storage.open(tarea.archivo) as original:
+        optimizada = optimize_image_buffer(original)
+    if optimizada is None:
+        estado = TareaImagen.ERROR if tarea.intentos >= MAX_INTENTOS else TareaImagen.PENDIENTE
+        _finalizar(tarea, estado, 'No se pudo optimizar la imagen')
+        return estado
+
+    nombre = storage.save(f"{os.path.splitext(tarea.archivo)[0]}.jpg", ContentFile(optimizada.getvalue()))
+    with transaction.atomic():
+        sustituida = modelo.objects.filter(pk=pk, **{campo: tarea.archivo}).update(**{campo: nombre})
+        if sustituida:
+            _refrescar(tarea.producto_id)
+        _finalizar(tarea, TareaImagen.COMPLETADA if sustituida else TareaImagen.DESCARTADA)
+
+    # El archivo que ya no referencia ninguna fila
+    storage.delete(tarea.archivo if sustituida else nombre)
+    return TareaImagen.COMPLETADA if sustituida else TareaImagen.DESCARTADA
+
+
+def trabajar(continuo=False, espera=ESPERA):
+    """
+    Bucle de un trabajador: procesa tareas hasta vaciar la cola (o, en modo
+    continuo, indefinidamente). Retorna el número de tareas procesadas.
+    """
+    trabajador = f"{socket.gethostname()}:{os.getpid()}"
+    procesadas = 0
+    while True:
+        tarea = reclamar(trabajador)
+        if tarea is None:
+            if not continuo:
+                return procesadas
+            time.sleep(espera)
+            continue
+        try:
+            estado = procesar(tarea)
+        except Exception as e:
+            # Archivo ilegible o error de almacenamiento: se reintenta hasta MAX_INTENTOS
+            logger.exception(f"Error procesando la imagen {tarea.archivo}")
+            estado = TareaImagen.ERROR if tarea.intentos >= MAX_INTENTOS else TareaImagen.PENDIENTE
+            _finalizar(tarea, estado, str(e))
+        procesadas += 1
+        logger.info(f"Imagen {tarea.archivo}: {estado}")
+
+
+def procesar_imagenes(procesos=None, continuo=False, espera=ESPERA):
+    """Reparte la cola entre `procesos` trabajadores. Retorna el número de tareas procesadas"""
+    procesos = procesos or os.cpu_count()
+    if procesos == 1:
+        return trabajar(continuo, espera)
+
+    # Los procesos hijos abren sus propias conexiones
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = [pool.submit(trabajar, continuo, espera) for _ in range(procesos)]
+        return sum(futuro.result() for futuro in futuros)
@@ -0,0 +1,387 @@
+"""
+Importación masiva del catálogo de un proveedor (CSV, XLSX o JSON Lines).
+
+A diferencia de guardar los productos uno a uno con `Producto.save()`, la
+importación trabaja por lotes:
+
+- Las taxonomías se resuelven en memoria por nombre normalizado a partir
+  del registro de taxonomías (sin consultas por fila).
+- Slugs y SKUs se reservan para todo el lote y cada lote se inserta con
+  `identificadores.crear_productos` (bulk_create) en su propia transacción, junto
+  con sus tarjetas, conteos de facetas e índice de búsqueda. Si la
+  importación se interrumpe, puede reanudarse desde la fila siguiente al
+  último lote confirmado.
+- Con la publicación estática activa, al confirmar cada lote se republican
+  el listado global y los de sus categorías; las páginas de detalle de los
+  productos nuevos se publican con `publicar_catalogo`.
+
+Las imágenes no se procesan: la columna `imagen` se guarda tal cual, como
+nombre de un archivo ya subido al almacenamiento.
+"""
+
+import csv
+import json
+import logging
+from collections import Counter
+from contextlib import nullcontext
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.db import transaction
+from django.utils.text import slugify
+
+from . import publicacion
+from .cache_utils import incrementar_version_catalogo
+from .identificadores import ReservaIdentificadores, crear_productos, ocupados
+from .models import MovimientoStock, Producto
+from .normalizacion import normalizar_texto, texto_busqueda
+from .read_models import refrescar_tarjetas
+from .taxonomias import MODELOS_TAXONOMIA, registro_taxonomias
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover - dependencia opcional
+    openpyxl = None
+
+logger = logging.getLogger(__name__)
+
+FORMATOS = ('csv', 'xlsx', 'jsonl')
+LOTE = 1000
+
+CAMPOS_TEXTO = ('nombre', 'descripcion_corta', 'descripcion', 'sku', 'dimensiones', 'origen', 'garantia', 'imagen')
+CAMPOS_DECIMALES = ('precio', 'precio_oferta', 'peso')
+CAMPOS_BOOLEANOS = ('disponible', 'activo', 'destacado')
+# En este orden: la subcategoría se resuelve dentro de su categoría
+TAXONOMIAS = ('categoria', 'subcategoria', 'marca', 'proveedor', 'estatus')
+
+VERDADEROS = {'1', 'true', 'si', 'yes', 'x', 'verdadero'}
+FALSOS = {'0', 'false', 'no', 'falso'}
+
+
+class DependenciasNoDisponibles(RuntimeError):
+    """openpyxl no está instalado"""
+
+
+class ErrorFila(ValueError):
+    """Valor no válido en una fila del archivo"""
+
+
+class ResultadoImportacion:
+    """Contadores de una importación"""
+
+    def __init__(self):
+        self.leidas = 0
+        self.creados = 0
+        self.omitidos = 0
+        self.errores = []
+        self.ultima_fila = 0
+        self.taxonomias_creadas = Counter()
+
+
+# ==================== LECTURA ====================
+
+def detectar_formato(ruta):
+    formato = Path(ruta).suffix.lower().lstrip('.')
+    if formato == 'ndjson':
+        return 'jsonl'
+    if formato not in FORMATOS:
+        raise ValueError(f"No se reconoce el formato de {ruta} (use --formato)")
+    return formato
+
+
+def _columna(nombre):
+    """Nombre de columna normalizado: "Descripción Corta" -> descripcion_corta"""
+    return normalizar_texto(nombre).replace(' ', '_')
+
+
+def _leer_csv(ruta):
+    with open(ruta, newline='', encoding='utf-8-sig') as archivo:
+        muestra = archivo.read(64 * 1024)
+        archivo.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+        except csv.Error:
+            dialecto = csv.excel
+        yield from csv.DictReader(archivo, dialect=dialecto)
+
+
+def _leer_xlsx(ruta):
+    if openpyxl is None:
+        raise DependenciasNoDisponibles('La importación de archivos XLSX requiere openpyxl')
+    libro = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        cabecera = [str(c) if c is not None else '' for c in next(filas, ())]
+        for valores in filas:
+            if any(v is not None for v in valores):
+                yield dict(zip(cabecera, valores))
+    finally:
+        libro.close()
+
+
+def _leer_jsonl(ruta):
+    with open(ruta, encoding='utf-8') as archivo:
+        for linea in archivo:
+            if linea.strip():
+                yield json.loads(linea)
+
+
+def leer_filas(ruta, formato=None):
+    """Genera (número de fila, {columna normalizada: valor}); las filas se numeran desde 1"""
+    lector = {'csv': _leer_csv, 'xlsx': _leer_xlsx, 'jsonl': _leer_jsonl}[formato or detectar_formato(ruta)]
+    columnas = {}
+    for numero, fila in enumerate(lector(ruta), start=1):
+        for nombre in fila.keys() - columnas.keys():
+            columnas[nombre] = _columna(nombre) if nombre else None
+        yield numero, {columnas[nombre]: valor for nombre, valor in fila.items() if nombre}
+
+
+# ==================== CONVERSIÓN ====================
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        # Celdas numéricas de Excel (p. ej. un SKU 1234 leído como 1234.0)
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _decimal(campo, valor):
+    texto = _texto(valor).replace(',', '.')
+    if not texto:
+        return None
+    try:
+        numero = Decimal(texto).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ErrorFila(f"{campo} no es un número: {valor!r}")
+    if numero <= 0:
+        raise ErrorFila(f"{campo} debe ser mayor que cero")
+    return numero
+
+
+def _entero(campo, valor):
+    texto = _texto(valor)
+    if not texto:
+        return 0
+    try:
+        numero = int(Decimal(texto))
+    except (InvalidOperation, ValueError):
+        raise ErrorFila(f"{campo} no es un entero: {valor!r}")
+    if numero < 0:
+        raise ErrorFila(f"{campo} no puede ser negativo")
+    return numero
+
+
+def _booleano(campo, valor, defecto):
+    if isinstance(valor, bool):
+        return valor
+    texto = normalizar_texto(_texto(valor))
+    if not texto:
+        return defecto
+    if texto in VERDADEROS:
+        return True
+    if texto in FALSOS:
+        return False
+    raise ErrorFila(f"{campo} no es un valor sí/no: {valor!r}")
+
+
+class ResolutorTaxonomias:
+    """
+    Resuelve nombres de taxonomía contra una copia de los índices del
+    registro. Con `crear`, los nombres desconocidos se dan de alta (una vez
+    por nombre); sin él, la fila se rechaza.
+    """
+
+    def __init__(self, crear=False):
+        registro = registro_taxonomias()
+        self.crear = crear
+        self.creadas = Counter()
+        self._normalizados = {}
+        self.indices = {faceta: dict(registro.por_nombre[faceta]) for faceta in MODELOS_TAXONOMIA}
+        # Los nombres de subcategoría solo son únicos dentro de su categoría
+        self.indices['subcategoria'] = {
+            (subcategoria.categoria_id, subcategoria.nombre_normalizado): subcategoria
+            for subcategoria in registro.por_id['subcategoria'].values()
+        }
+
+    def resolver(self, faceta, nombre, categoria=None):
+        nombre = _texto(nombre)
+        if not nombre:
+            return None
+        clave = self._normalizados.get(nombre)
+        if clave is None:
+            # Los archivos repiten pocos nombres distintos en miles de filas
+            clave = self._normalizados[nombre] = normalizar_texto(nombre)
+        if faceta == 'subcategoria':
+            if categoria is None:
+                raise ErrorFila(f"La subcategoría {nombre!r} requiere categoría")
+            clave = (categoria.pk, clave)
+
+        objeto = self.indices[faceta].get(clave)
+        if objeto is None:
+            if not self.crear:
+                raise ErrorFila(f"{faceta} desconocida: {nombre!r}")
+            objeto = self._crear(faceta, nombre, categoria)
+            self.indices[faceta][clave] = objeto
+        return objeto
+
+    def _crear(self, faceta, nombre, categoria):
+        modelo = MODELOS_TAXONOMIA[faceta]
+        base = slugify(nombre) or faceta
+        if categoria is not None:
+            base = f"{categoria.slug}-{base}"
+        slug, contador = base, 1
+        while modelo.objects.filter(slug=slug).exists():
+            contador += 1
+            slug = f"{base}-{contador}"
+        objeto = modelo(nombre=nombre, slug=slug)
+        if faceta == 'subcategoria':
+            objeto.categoria = categoria
+        objeto.save()
+        self.creadas[faceta] += 1
+        return objeto
+
+
+def construir_producto(fila, resolutor):
+    """Producto sin guardar (sin slug, y sin SKU si la fila no lo trae)"""
+    nombre = _texto(fila.get('nombre'))
+    if not nombre:
+        raise ErrorFila('Falta el nombre')
+
+    campos = {campo: _texto(fila.get(campo)) for campo in CAMPOS_TEXTO}
+    campos.update({campo: _decimal(campo, fila.get(campo)) for campo in CAMPOS_DECIMALES})
+    campos['stock'] = _entero('stock', fila.get('stock'))
+    for campo in CAMPOS_BOOLEANOS:
+        campos[campo] = _booleano(campo, fila.get(campo), Producto._meta.get_field(campo).default)
+
+    for campo in CAMPOS_TEXTO:
+        longitud = Producto._meta.get_field(campo).max_length
+        if longitud and len(campos[campo]) > longitud:
+            raise ErrorFila(f"{campo} supera {longitud} caracteres")
+
+    categoria = resolutor.resolver('categoria', fila.get('categoria'))
+    for faceta in TAXONOMIAS:
+        campos[faceta] = categoria if faceta == 'categoria' else resolutor.resolver(
+            faceta, fila.get(faceta), categoria
+        )
+
+    producto = Producto(**campos)
+    # Lo mismo que calcula Producto.save()
+    producto.en_oferta = bool(producto.precio_oferta and producto.precio_oferta > 0)
+    return producto
+
+
+# ==================== IMPORTACIÓN ====================
+
+def _preparar_lote(filas, resolutor, resultado):
+    """Productos del lote listos para insertar (errores y SKUs repetidos se descartan)"""
+    productos = []
+    for numero, fila in filas:
+        try:
+            productos.append(construir_producto(fila, resolutor))
+        except ErrorFila as e:
+            resultado.errores.append((numero, str(e)))
+
+    # Un SKU que ya existe indica un producto importado antes: se omite
+    existentes = ocupados('sku', [p.sku for p in productos if p.sku])
+    vistos = set()
+    nuevos = []
+    for producto in productos:
+        if producto.sku:
+            if producto.sku in existentes or producto.sku in vistos:
+                resultado.omitidos += 1
+                continue
+            vistos.add(producto.sku)
+        nuevos.append(producto)
+    return nuevos
+
+
+def _textos_busqueda(productos):
+    """Columnas normalizadas que calcula Producto.save() (el texto incluye el SKU asignado)"""
+    for producto in productos:
+        producto.nombre_normalizado = normalizar_texto(producto.nombre)
+        producto.texto_busqueda = texto_busqueda(
+            producto.nombre, producto.descripcion_corta, producto.descripcion, producto.sku
+        )
+
+
+def _programar_listados(productos):
+    """
+    Republica, al confirmar el lote, el listado global y los de las
+    categorías con productos nuevos. Las páginas de detalle de los productos
+    nuevos se publican con `publicar_catalogo`; mientras tanto responden las
+    vistas.
+    """
+    categorias = {p.categoria.slug for p in productos if p.activo and p.categoria}
+
+    def publicar():
+        # Nueva generación antes de renderizar: si no, los listados saldrían
+        # de la caché anterior al lote
+        incrementar_version_catalogo()
+        try:
+            publicacion.publicar_listado()
+            for categoria in categorias:
+                publicacion.publicar_listado(categoria)
+        except Exception:
+            logger.exception('No se pudieron republicar los listados del lote importado')
+
+    transaction.on_commit(publicar)
+
+
+def importar_catalogo(ruta, formato=None, desde_fila=1, lote=LOTE, crear_taxonomias=False,
+                      simular=False, progreso=None):
+    """
+    Importa el archivo por lotes. Con `simular` todo se ejecuta dentro de una
+    transacción que se revierte al final (valida filas, taxonomías e
+    identificadores sin escribir nada). Retorna un `ResultadoImportacion`.
+    """
+    resultado = ResultadoImportacion()
+    resolutor = ResolutorTaxonomias(crear=crear_taxonomias)
+    reserva = ReservaIdentificadores()
+
+    def procesar(filas):
+        productos = _preparar_lote(filas, resolutor, resultado)
+        with transaction.atomic():
+            crear_productos(productos, reserva, antes_de_insertar=_textos_busqueda)
+            # Stock inicial en el libro de movimientos (bulk_create no pasa por save())
+            MovimientoStock.objects.bulk_create([
+                MovimientoStock(producto_id=p.pk, cantidad=p.stock, stock_resultante=p.stock,
+                                motivo=MovimientoStock.IMPORTACION, referencia=Path(ruta).name[:100])
+                for p in productos if p.stock
+            ])
+            if not simular:
+                # bulk_create no envía señales: tarjetas, facetas e índice del lote
+                refrescar_tarjetas([p.pk for p in productos if p.activo])
+                if productos and publicacion.publicacion_activa():
+                    _programar_listados(productos)
+        resultado.creados += len(productos)
+        resultado.ultima_fila = filas[-1][0]
+        if progreso:
+            progreso(resultado)
+
+    # Sin simular, cada lote se confirma por separado y la importación
+    # puede reanudarse desde la fila siguiente al último lote
+    with transaction.atomic() if simular else nullcontext():
+        pendientes = []
+        for numero, fila in leer_filas(ruta, formato):
+            if numero < desde_fila:
+                continue
+            resultado.leidas += 1
+            pendientes.append((numero, fila))
+            if len(pendientes) >= lote:
+                procesar(pendientes)
+                pendientes = []
+        if pendientes:
+            procesar(pendientes)
+        if simular:
+            transaction.set_rollback(True)
+    resultado.taxonomias_creadas = resolutor.creadas
+
+    if not simular and resultado.creados:
+        incrementar_version_catalogo()
+    logger.info(
+        f"Importación de {ruta}: {resultado.creados} creados, {resultado.omitidos} omitidos, "
+        f"{len(resultado.errores)} con errores"
+    )
+    return resultado
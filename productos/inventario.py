@@ -0,0 +1,60 @@
+"""
+Movimientos de stock fuera del formulario de producto (pedidos, recuentos,
+integraciones).
+
+Todo cambio de stock pasa por el libro `MovimientoStock`: el saldo de
+`Producto.stock` se actualiza con `F('stock') + cantidad`, de modo que dos
+movimientos simultáneos nunca se pisan. Quien necesite leer el stock y
+decidir en función de él (un recuento que fija un valor absoluto) usa la
+versión del producto: el UPDATE solo se aplica si nadie movió el stock
+desde la lectura y, si no, se vuelve a leer y a intentar. Ninguna fila
+queda bloqueada entre peticiones.
+
+Como `update()` no envía señales, la tarjeta del producto se refresca y el
+catálogo se invalida al confirmar la transacción.
+"""
+
+from django.db import transaction
+
+from . import publicacion
+from .cache_utils import incrementar_version_catalogo
+from .identificadores import INTENTOS
+from .models import ConflictoVersion, MovimientoStock, Producto
+from .read_models import refrescar_tarjeta
+
+
+def _programar_refresco(producto_id):
+    transaction.on_commit(lambda: refrescar_tarjeta(producto_id))
+    transaction.on_commit(incrementar_version_catalogo)
+    if publicacion.publicacion_activa():
+        publicacion.programar_publicacion(producto_id)
+
+
+def ajustar_stock(producto_id, cantidad, motivo=MovimientoStock.AJUSTE, referencia='', usuario=None, version=None):
+    """
+    Suma `cantidad` (negativa para descontar) al stock del producto.
+    Lanza StockInsuficiente si el stock quedaría negativo y, con `version`,
+    ConflictoVersion si el stock cambió desde esa versión.
+    Retorna (stock, versión) resultantes.
+    """
+    with transaction.atomic():
+        resultado = MovimientoStock.registrar(producto_id, cantidad, motivo, referencia, usuario, version)
+        _programar_refresco(producto_id)
+    return resultado
+
+
+def fijar_stock(producto_id, stock, motivo=MovimientoStock.RECUENTO, referencia='', usuario=None):
+    """
+    Fija el stock a un valor absoluto registrando la diferencia. Si otro
+    movimiento se confirma entre la lectura y la escritura, reintenta con
+    el valor nuevo. Retorna (stock, versión) resultantes.
+    """
+    for intento in range(INTENTOS):
+        actual, version = Producto.objects.filter(pk=producto_id).values_list('stock', 'version').get()
+        if actual == stock:
+            return actual, version
+        try:
+            return ajustar_stock(producto_id, stock - actual, motivo, referencia, usuario, version=version)
+        except ConflictoVersion:
+            if intento == INTENTOS - 1:
+                raise
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from productos.similares import DependenciasNoDisponibles, calcular_similares
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula los productos similares por contenido (TF-IDF + coseno). Por defecto solo "
+        "recalcula los productos modificados desde la última ejecución."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--completo",
+            action="store_true",
+            help="Recalcular todo el catálogo (ignora la marca de agua)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Filas de la matriz multiplicadas por lote (default: 500)",
+        )
+
+    def handle(self, *args, **options):
+        def progreso(hechos, total):
+            self.stdout.write(f"  {hechos}/{total} productos")
+
+        try:
+            productos, relaciones = calcular_similares(
+                completo=options["completo"],
+                batch_size=options["batch_size"],
+                progreso=progreso if options["verbosity"] > 1 else None,
+            )
+        except DependenciasNoDisponibles as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Similares calculados para {productos} producto(s): {relaciones} relación(es)"
+        ))
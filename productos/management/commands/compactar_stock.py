@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from productos.models import MovimientoStock
+
+
+class Command(BaseCommand):
+    help = (
+        "Concilia el stock de cada producto con su libro de movimientos (añade un movimiento "
+        "de conciliación donde no coinciden) y resume los movimientos antiguos en un saldo "
+        "por producto. Pensado para ejecutarse periódicamente (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dias",
+            type=int,
+            default=90,
+            help="Conservar el detalle de los movimientos de los últimos N días (por defecto 90)",
+        )
+        parser.add_argument(
+            "--sin-compactar",
+            action="store_true",
+            help="Solo conciliar, sin resumir movimientos antiguos",
+        )
+
+    def handle(self, *args, **options):
+        conciliados = MovimientoStock.conciliar()
+        self.stdout.write(f"Productos conciliados: {conciliados}")
+
+        if not options["sin_compactar"]:
+            hasta = timezone.now() - timedelta(days=options["dias"])
+            eliminados = MovimientoStock.compactar(hasta)
+            self.stdout.write(f"Movimientos resumidos en saldos: {eliminados}")
+
+        self.stdout.write(self.style.SUCCESS("Libro de stock al día"))
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from productos.exportacion import COLUMNAS_OPCIONALES, ExportacionInvalida, exportar
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta el catálogo completo (tarjetas disponibles) en JSON Lines o CSV "
+        "leyendo por lotes, con memoria constante."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "salida",
+            nargs="?",
+            default="-",
+            help="Archivo de salida (default: salida estándar)",
+        )
+        parser.add_argument(
+            "--formato",
+            choices=["jsonl", "csv"],
+            default="jsonl",
+        )
+        parser.add_argument(
+            "--incluir",
+            default="",
+            help=f"Columnas opcionales separadas por comas: {', '.join(COLUMNAS_OPCIONALES)}",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Filas leídas por consulta (default: 2000)",
+        )
+
+    def handle(self, *args, **options):
+        incluir = [c for c in options["incluir"].split(",") if c]
+        try:
+            bloques = exportar(options["formato"], incluir=incluir, chunk_size=options["chunk_size"])
+        except ExportacionInvalida as e:
+            raise CommandError(str(e))
+
+        if options["salida"] == "-":
+            for bloque in bloques:
+                sys.stdout.buffer.write(bloque)
+            sys.stdout.buffer.flush()
+            return
+
+        with open(options["salida"], "wb") as archivo:
+            for bloque in bloques:
+                archivo.write(bloque)
+        self.stderr.write(self.style.SUCCESS(f"Catálogo exportado a {options['salida']}"))
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from productos.feeds import generar_feeds
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera los sitemaps y el feed de Merchant Center (XML y CSV, con variantes "
+        "gzip/brotli) en bloques de 50.000 productos. Por defecto solo regenera los "
+        "bloques con cambios desde la última ejecución."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--completo",
+            action="store_true",
+            help="Regenerar todos los bloques (ignora la marca de agua)",
+        )
+
+    def handle(self, *args, **options):
+        def progreso(bloque, urls):
+            self.stdout.write(f"  bloque {bloque}: {urls} producto(s)")
+
+        regenerados, total = generar_feeds(
+            completo=options["completo"],
+            progreso=progreso if options["verbosity"] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Feeds: {regenerados} de {total} bloque(s) regenerado(s)"))
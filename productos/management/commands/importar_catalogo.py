@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from productos.importacion import (FORMATOS, LOTE, DependenciasNoDisponibles, detectar_formato,
+                                   importar_catalogo)
+from productos.publicacion import publicacion_activa
+
+ERRORES_VISIBLES = 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa productos desde un archivo CSV, XLSX o JSON Lines por lotes (bulk_create), "
+        "resolviendo taxonomías por nombre y asignando slugs y SKUs únicos. Las filas cuyo "
+        "SKU ya existe se omiten."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta del archivo a importar")
+        parser.add_argument(
+            "--formato",
+            choices=FORMATOS,
+            default=None,
+            help="Formato del archivo (default: según la extensión)",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=LOTE,
+            help=f"Filas por lote y transacción (default: {LOTE})",
+        )
+        parser.add_argument(
+            "--desde-fila",
+            type=int,
+            default=1,
+            help="Reanudar desde esta fila de datos (la primera es 1)",
+        )
+        parser.add_argument(
+            "--crear-taxonomias",
+            action="store_true",
+            help="Crear las categorías, marcas, etc. que no existan (por defecto la fila se rechaza)",
+        )
+        parser.add_argument(
+            "--simular",
+            action="store_true",
+            help="Validar e importar dentro de una transacción que se revierte al final",
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+
+        def progreso(resultado):
+            velocidad = resultado.leidas / max(time.monotonic() - inicio, 1e-6)
+            self.stdout.write(
+                f"  fila {resultado.ultima_fila}: {resultado.creados} creados, "
+                f"{resultado.omitidos} omitidos, {len(resultado.errores)} errores "
+                f"({velocidad:.0f} filas/s)"
+            )
+
+        try:
+            formato = options["formato"] or detectar_formato(options["archivo"])
+            resultado = importar_catalogo(
+                options["archivo"],
+                formato=formato,
+                desde_fila=options["desde_fila"],
+                lote=options["lote"],
+                crear_taxonomias=options["crear_taxonomias"],
+                simular=options["simular"],
+                progreso=progreso if options["verbosity"] > 0 else None,
+            )
+        except (DependenciasNoDisponibles, OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for numero, mensaje in resultado.errores[:ERRORES_VISIBLES]:
+            self.stderr.write(f"  fila {numero}: {mensaje}")
+        if len(resultado.errores) > ERRORES_VISIBLES:
+            self.stderr.write(f"  ... y {len(resultado.errores) - ERRORES_VISIBLES} error(es) más")
+
+        creadas = ", ".join(f"{total} {faceta}" for faceta, total in resultado.taxonomias_creadas.items())
+        resumen = (
+            f"{resultado.creados} producto(s) {'validados' if options['simular'] else 'importados'}, "
+            f"{resultado.omitidos} omitido(s) por SKU existente, {len(resultado.errores)} con errores "
+            f"en {time.monotonic() - inicio:.1f}s"
+        )
+        if creadas:
+            resumen += f"; taxonomías nuevas: {creadas}"
+        self.stdout.write(self.style.SUCCESS(resumen))
+
+        if resultado.creados and not options["simular"]:
+            pendientes = ["reconstruir_relacionados", "generar_feeds"]
+            if publicacion_activa():
+                # Los listados ya se republicaron; faltan las páginas de detalle
+                pendientes.append("publicar_catalogo")
+            self.stdout.write(f"Para completar: manage.py {', manage.py '.join(pendientes)}")
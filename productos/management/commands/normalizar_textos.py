@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from productos.cache_utils import incrementar_version_taxonomias
+from productos.models import Categoria, Estatus, Marca, Producto, Proveedor, Subcategoria
+from productos.normalizacion import rellenar_nombres_normalizados, rellenar_textos_producto
+from productos.read_models import reconstruir_tarjetas
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula las columnas de búsqueda normalizadas (minúsculas, sin tildes) de "
+        "productos y taxonomías. Útil tras cargas masivas o cambios en la normalización."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Filas procesadas por lote (default: 1000)",
+        )
+        parser.add_argument(
+            "--sin-tarjetas",
+            action="store_true",
+            help="No reconstruir las tarjetas de producto tras actualizar los textos",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        for modelo in (Categoria, Subcategoria, Marca, Proveedor, Estatus):
+            cambiados = rellenar_nombres_normalizados(modelo, chunk_size=chunk_size)
+            self.stdout.write(f"{modelo._meta.verbose_name_plural}: {cambiados} actualizada(s)")
+        # bulk_update no emite señales
+        incrementar_version_taxonomias()
+
+        cambiados = rellenar_textos_producto(Producto, chunk_size=chunk_size)
+        self.stdout.write(f"Productos: {cambiados} actualizado(s)")
+
+        if not options["sin_tarjetas"]:
+            reconstruir_tarjetas()
+        self.stdout.write(self.style.SUCCESS("Textos normalizados actualizados"))
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from productos.imagenes import ESPERA, procesar_imagenes
+
+
+class Command(BaseCommand):
+    help = (
+        "Optimiza en segundo plano las imágenes subidas (redimensionado y JPEG) y las "
+        "sustituye en sus productos, repartiendo la cola entre procesos trabajadores."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--procesos",
+            type=int,
+            default=None,
+            help="Procesos trabajadores (default: número de CPUs)",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="No terminar al vaciar la cola: seguir esperando tareas nuevas",
+        )
+        parser.add_argument(
+            "--espera",
+            type=float,
+            default=ESPERA,
+            help=f"Segundos entre consultas con la cola vacía en modo continuo (default: {ESPERA})",
+        )
+
+    def handle(self, *args, **options):
+        total = procesar_imagenes(
+            procesos=options["procesos"], continuo=options["continuo"], espera=options["espera"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Imágenes procesadas: {total}"))
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from productos.publicacion import publicacion_activa, publicar_catalogo
+
+
+class Command(BaseCommand):
+    help = (
+        "Renderiza a archivos estáticos las páginas de detalle y los listados JSON por "
+        "categoría (con variantes gzip/brotli) repartiendo el trabajo entre procesos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--procesos",
+            type=int,
+            default=None,
+            help="Procesos de renderizado (default: número de CPUs)",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=200,
+            help="Páginas de producto por tarea (default: 200)",
+        )
+        parser.add_argument(
+            "--forzar",
+            action="store_true",
+            help="Publicar aunque PUBLICACION_ENABLED esté desactivado",
+        )
+
+    def handle(self, *args, **options):
+        if not publicacion_activa() and not options["forzar"]:
+            raise CommandError("La publicación estática está desactivada (PUBLICACION_ENABLED)")
+        total = publicar_catalogo(procesos=options["procesos"], lote=options["lote"])
+        self.stdout.write(self.style.SUCCESS(f"Publicados {total} archivo(s)"))
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from productos.models import ResumenValoraciones
+from productos.read_models import reconstruir_tarjetas
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los resúmenes de valoraciones (total, suma y distribución por estrellas) "
+        "desde la tabla de valoraciones y corrige cualquier desvío."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sin-tarjetas",
+            action="store_true",
+            help="No reconstruir las tarjetas de producto tras corregir resúmenes",
+        )
+
+    def handle(self, *args, **options):
+        corregidos = ResumenValoraciones.reconciliar()
+        if corregidos and not options["sin_tarjetas"]:
+            reconstruir_tarjetas()
+        self.stdout.write(self.style.SUCCESS(f"Resúmenes corregidos: {corregidos}"))
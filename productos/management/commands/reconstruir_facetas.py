@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from productos.facetas import reconstruir_facetas
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula desde las tarjetas de producto los conteos materializados de facetas "
+        "(globales y condicionados a un filtro)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Tarjetas leídas por lote (default: 2000)",
+        )
+
+    def handle(self, *args, **options):
+        filas = reconstruir_facetas(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Reconstruidas {filas} fila(s) de conteos de facetas"))
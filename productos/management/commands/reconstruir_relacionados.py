@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from productos.relacionados import reconstruir_relacionados
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula la tabla de productos relacionados (categoría, subcategoría, marca y "
+        "cercanía de precio). Pensado para ejecutarse periódicamente y tras cargas masivas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Productos escritos por transacción (default: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        total = reconstruir_relacionados(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Escritas {total} relación(es) de productos"))
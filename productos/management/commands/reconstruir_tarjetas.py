@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from productos.read_models import reconstruir_tarjetas
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye el modelo de lectura ProductoCard (una fila por producto activo). "
+        "Útil tras cargas masivas o si las tarjetas quedaron desincronizadas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Productos procesados por lote (default: 500)",
+        )
+
+    def handle(self, *args, **options):
+        total = reconstruir_tarjetas(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Reconstruidas {total} tarjeta(s) de producto"))
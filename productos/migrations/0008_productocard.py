@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0007_producto_garantia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductoCard',
+            fields=[
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='productos.producto')),
+                ('nombre', models.CharField(max_length=250)),
+                ('slug', models.SlugField(max_length=250)),
+                ('descripcion_corta', models.CharField(blank=True, max_length=500)),
+                ('sku', models.CharField(blank=True, max_length=100)),
+                ('origen', models.CharField(blank=True, max_length=100)),
+                ('categoria_id', models.BigIntegerField(blank=True, null=True)),
+                ('categoria_nombre', models.CharField(blank=True, max_length=120)),
+                ('categoria_slug', models.CharField(blank=True, max_length=120)),
+                ('subcategoria_id', models.BigIntegerField(blank=True, null=True)),
+                ('subcategoria_nombre', models.CharField(blank=True, max_length=120)),
+                ('subcategoria_slug', models.CharField(blank=True, max_length=120)),
+                ('marca_id', models.BigIntegerField(blank=True, null=True)),
+                ('marca_nombre', models.CharField(blank=True, max_length=100)),
+                ('marca_slug', models.CharField(blank=True, max_length=100)),
+                ('proveedor_id', models.BigIntegerField(blank=True, null=True)),
+                ('proveedor_nombre', models.CharField(blank=True, max_length=120)),
+                ('estatus_id', models.BigIntegerField(blank=True, null=True)),
+                ('estatus_nombre', models.CharField(blank=True, max_length=120)),
+                ('precio', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('precio_oferta', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('precio_final', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('tiene_descuento', models.BooleanField(default=False)),
+                ('porcentaje_descuento', models.PositiveSmallIntegerField(default=0)),
+                ('stock', models.IntegerField(default=0)),
+                ('disponible', models.BooleanField(default=True)),
+                ('destacado', models.BooleanField(default=False)),
+                ('en_oferta', models.BooleanField(default=False)),
+                ('badges', models.JSONField(blank=True, default=list)),
+                ('imagen_url', models.CharField(blank=True, max_length=500)),
+                ('rating_promedio', models.FloatField(default=0)),
+                ('total_valoraciones', models.PositiveIntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField()),
+                ('fecha_actualizacion', models.DateTimeField()),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Tarjeta de Producto',
+                'verbose_name_plural': 'Tarjetas de Productos',
+                'ordering': ['-destacado', '-en_oferta', '-fecha_creacion'],
+                'indexes': [models.Index(fields=['disponible', '-destacado', '-en_oferta', '-fecha_creacion'], name='productos_p_disponi_e9c275_idx'), models.Index(fields=['disponible', 'fecha_creacion'], name='productos_p_disponi_8282d7_idx'), models.Index(fields=['disponible', 'precio'], name='productos_p_disponi_14d727_idx'), models.Index(fields=['disponible', 'nombre'], name='productos_p_disponi_1e0ddf_idx'), models.Index(fields=['categoria_slug', 'disponible'], name='productos_p_categor_9360b0_idx'), models.Index(fields=['subcategoria_slug', 'disponible'], name='productos_p_subcate_91d8e9_idx'), models.Index(fields=['marca_id'], name='productos_p_marca_i_3583aa_idx'), models.Index(fields=['proveedor_id'], name='productos_p_proveed_89e0c7_idx'), models.Index(fields=['estatus_id'], name='productos_p_estatus_7d9cd4_idx'), models.Index(fields=['categoria_id'], name='productos_p_categor_68bc71_idx'), models.Index(fields=['subcategoria_id'], name='productos_p_subcate_0ac7c8_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0008_productocard'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='productocard',
+            name='productos_p_disponi_e9c275_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productocard',
+            name='productos_p_disponi_8282d7_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productocard',
+            name='productos_p_disponi_14d727_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productocard',
+            name='productos_p_disponi_1e0ddf_idx',
+        ),
+        migrations.AddIndex(
+            model_name='productocard',
+            index=models.Index(fields=['disponible', '-destacado', '-en_oferta', '-fecha_creacion', '-producto'], name='productos_p_disponi_20e6b0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productocard',
+            index=models.Index(fields=['disponible', 'fecha_creacion', 'producto'], name='productos_p_disponi_8274a0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productocard',
+            index=models.Index(fields=['disponible', 'precio', 'producto'], name='productos_p_disponi_de2ba7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productocard',
+            index=models.Index(fields=['disponible', 'nombre', 'producto'], name='productos_p_disponi_f8962e_idx'),
+        ),
+    ]
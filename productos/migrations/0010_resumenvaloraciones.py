@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def poblar_resumenes(apps, schema_editor):
+    Valoracion = apps.get_model('productos', 'Valoracion')
+    ResumenValoraciones = apps.get_model('productos', 'ResumenValoraciones')
+    filas = Valoracion.objects.values('producto_id').annotate(
+        total=Count('id'),
+        suma=Sum('puntuacion'),
+        **{f'estrellas_{n}': Count('id', filter=Q(puntuacion=n)) for n in range(1, 6)}
+    ).order_by()
+    ResumenValoraciones.objects.bulk_create([
+        ResumenValoraciones(**{k: v or 0 for k, v in fila.items()})
+        for fila in filas
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0009_productocard_indices_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenValoraciones',
+            fields=[
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen_valoraciones', serialize=False, to='productos.producto')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('suma', models.PositiveIntegerField(default=0)),
+                ('estrellas_1', models.PositiveIntegerField(default=0)),
+                ('estrellas_2', models.PositiveIntegerField(default=0)),
+                ('estrellas_3', models.PositiveIntegerField(default=0)),
+                ('estrellas_4', models.PositiveIntegerField(default=0)),
+                ('estrellas_5', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Resumen de Valoraciones',
+                'verbose_name_plural': 'Resúmenes de Valoraciones',
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
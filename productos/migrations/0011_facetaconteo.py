@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0010_resumenvaloraciones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetaConteo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filtro', models.CharField(blank=True, max_length=20)),
+                ('filtro_valor', models.CharField(blank=True, max_length=64)),
+                ('faceta', models.CharField(max_length=20)),
+                ('valor', models.CharField(max_length=64)),
+                ('total', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Conteo de Faceta',
+                'verbose_name_plural': 'Conteos de Facetas',
+                'indexes': [models.Index(fields=['filtro', 'filtro_valor', 'faceta'], name='productos_f_filtro_ff0aaa_idx')],
+                'unique_together': {('filtro', 'filtro_valor', 'faceta', 'valor')},
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations, OperationalError
+
+
+def crear_indice_fts(apps, schema_editor):
+    """Crea y puebla la tabla FTS5 (solo en SQLite con FTS5 disponible)"""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS productos_busqueda USING fts5("
+                "nombre, descripcion_corta, descripcion, sku, categoria, subcategoria, marca, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+        except OperationalError:
+            # SQLite compilado sin FTS5: la búsqueda usa icontains
+            return
+        cursor.execute(
+            "INSERT INTO productos_busqueda "
+            "(rowid, nombre, descripcion_corta, descripcion, sku, categoria, subcategoria, marca) "
+            "SELECT p.id, p.nombre, COALESCE(p.descripcion_corta, ''), COALESCE(p.descripcion, ''), "
+            "COALESCE(p.sku, ''), COALESCE(c.nombre, ''), COALESCE(s.nombre, ''), COALESCE(m.nombre, '') "
+            "FROM productos_producto p "
+            "LEFT JOIN productos_categoria c ON c.id = p.categoria_id "
+            "LEFT JOIN productos_subcategoria s ON s.id = p.subcategoria_id "
+            "LEFT JOIN productos_marca m ON m.id = p.marca_id "
+            "WHERE p.activo"
+        )
+
+
+def eliminar_indice_fts(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS productos_busqueda")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0011_facetaconteo'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice_fts, eliminar_indice_fts),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:40
+
+from django.db import migrations, models
+
+from productos.normalizacion import rellenar_nombres_normalizados, rellenar_textos_producto
+
+
+TAXONOMIAS = ('Categoria', 'Subcategoria', 'Marca', 'Proveedor', 'Estatus')
+
+
+def rellenar_textos(apps, schema_editor):
+    for nombre in TAXONOMIAS:
+        rellenar_nombres_normalizados(apps.get_model('productos', nombre))
+    rellenar_textos_producto(apps.get_model('productos', 'Producto'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0012_productos_busqueda_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='nombre_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=120),
+        ),
+        migrations.AddField(
+            model_name='estatus',
+            name='nombre_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=120),
+        ),
+        migrations.AddField(
+            model_name='marca',
+            name='nombre_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='nombre_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=250),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='texto_busqueda',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='productocard',
+            name='texto_busqueda',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='proveedor',
+            name='nombre_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=120),
+        ),
+        migrations.AddField(
+            model_name='subcategoria',
+            name='nombre_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=120),
+        ),
+        migrations.RunPython(rellenar_textos, migrations.RunPython.noop),
+    ]
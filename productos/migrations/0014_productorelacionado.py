@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0013_textos_normalizados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductoRelacionado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('puntuacion', models.FloatField(default=0)),
+                ('posicion', models.PositiveSmallIntegerField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relacionados', to='productos.producto')),
+                ('relacionado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relacionado_con', to='productos.productocard')),
+            ],
+            options={
+                'verbose_name': 'Producto Relacionado',
+                'verbose_name_plural': 'Productos Relacionados',
+                'ordering': ['producto', 'posicion'],
+                'indexes': [models.Index(fields=['producto', 'posicion'], name='productos_p_product_116a6f_idx')],
+                'unique_together': {('producto', 'relacionado')},
+            },
+        ),
+    ]
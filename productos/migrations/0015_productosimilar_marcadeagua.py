@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0014_productorelacionado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaDeAgua',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=100, unique=True)),
+                ('valor', models.DateTimeField(blank=True, null=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Marca de Agua',
+                'verbose_name_plural': 'Marcas de Agua',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductoSimilar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('puntuacion', models.FloatField(default=0)),
+                ('posicion', models.PositiveSmallIntegerField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similares', to='productos.producto')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_a', to='productos.productocard')),
+            ],
+            options={
+                'verbose_name': 'Producto Similar',
+                'verbose_name_plural': 'Productos Similares',
+                'ordering': ['producto', 'posicion'],
+                'indexes': [models.Index(fields=['producto', 'posicion'], name='productos_p_product_f224f1_idx')],
+                'unique_together': {('producto', 'similar')},
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def poblar_movimientos(apps, schema_editor):
+    # El stock actual de cada producto como movimiento inicial del libro
+    Producto = apps.get_model('productos', 'Producto')
+    MovimientoStock = apps.get_model('productos', 'MovimientoStock')
+    movimientos = [
+        MovimientoStock(producto_id=producto_id, cantidad=stock, stock_resultante=stock, motivo='inicial')
+        for producto_id, stock in Producto.objects.exclude(stock=0).values_list('id', 'stock').iterator()
+    ]
+    MovimientoStock.objects.bulk_create(movimientos, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0015_productosimilar_marcadeagua'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.IntegerField(help_text='Positiva si entra stock, negativa si sale')),
+                ('stock_resultante', models.IntegerField()),
+                ('motivo', models.CharField(choices=[('inicial', 'Stock inicial'), ('ajuste', 'Ajuste manual'), ('recuento', 'Recuento'), ('venta', 'Venta'), ('devolucion', 'Devolución'), ('importacion', 'Importación'), ('saldo', 'Saldo compactado'), ('conciliacion', 'Conciliación')], max_length=20)),
+                ('referencia', models.CharField(blank=True, help_text='Pedido, documento u origen del movimiento', max_length=100)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_stock', to='productos.producto')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Stock',
+                'verbose_name_plural': 'Movimientos de Stock',
+                'ordering': ['-fecha', '-id'],
+                'indexes': [models.Index(fields=['producto', 'fecha'], name='productos_m_product_21750f_idx'), models.Index(fields=['fecha'], name='productos_m_fecha_4cdfe4_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_movimientos, migrations.RunPython.noop),
+    ]
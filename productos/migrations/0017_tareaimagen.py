@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0016_movimientostock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TareaImagen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo', models.CharField(help_text='Archivo subido sin optimizar', max_length=255)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completada', 'Optimizada'), ('descartada', 'Descartada'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('trabajador', models.CharField(blank=True, max_length=100)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('imagen', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tareas', to='productos.productimage')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tareas_imagen', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Tarea de Imagen',
+                'verbose_name_plural': 'Tareas de Imágenes',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['estado', 'id'], name='productos_t_estado_32d7de_idx')],
+            },
+        ),
+    ]
@@ -1,21 +1,48 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from django.utils.text import slugify
 from decimal import Decimal
 import random
 import string
 import uuid
-from datetime import datetime
-from PIL import Image
-from io import BytesIO
-from django.core.files.uploadedfile import InMemoryUploadedFile
-import sys
+
+from .identificadores import INTENTOS, asignar_slug, asignar_sku, ocupados, prefijo_sku
+from .normalizacion import normalizar_texto, texto_busqueda
 
 # Create your models here.
 
+
+def _incluir_campos(kwargs, *campos):
+    """Añade campos calculados a update_fields cuando save() lo restringe"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None:
+        kwargs['update_fields'] = set(update_fields) | set(campos)
+
+
+def _excluir_campos(instancia, kwargs, *campos):
+    """Restringe update_fields (por defecto, los campos cargados) para que save() no escriba `campos`"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields is None:
+        diferidos = instancia.get_deferred_fields()
+        update_fields = [f.name for f in instancia._meta.concrete_fields
+                         if not f.primary_key and f.attname not in diferidos]
+    kwargs['update_fields'] = set(update_fields) - set(campos)
+
+
+class StockInsuficiente(ValueError):
+    """El movimiento dejaría el stock del producto por debajo de cero"""
+
+
+class ConflictoVersion(Exception):
+    """El stock del producto cambió desde que se leyó (versión distinta a la esperada)"""
+
+
 class Proveedor(models.Model):
     """Proveedores de productos"""
     nombre = models.CharField(max_length=120, verbose_name="Nombre")
+    nombre_normalizado = models.CharField(max_length=120, blank=True, db_index=True, editable=False)
     slug = models.SlugField(unique=True, blank=True)
     logo = models.ImageField(upload_to='proveedores/', blank=True, null=True, verbose_name="Logo")
     id_unico = models.CharField(max_length=50, unique=True, verbose_name="ID Único", 
@@ -26,6 +53,8 @@ class Proveedor(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     
     def save(self, *args, **kwargs):
+        self.nombre_normalizado = normalizar_texto(self.nombre)
+        _incluir_campos(kwargs, 'nombre_normalizado')
         if not self.slug:
             self.slug = slugify(self.nombre)
         if not self.id_unico:
@@ -54,6 +83,7 @@ class Proveedor(models.Model):
 class Categoria(models.Model):
     """Categorías de productos (ej: Electrónica, Ropa, Hogar)"""
     nombre = models.CharField(max_length=120, verbose_name="Nombre", unique=True)
+    nombre_normalizado = models.CharField(max_length=120, blank=True, db_index=True, editable=False)
     descripcion = models.TextField(blank=True)
     slug = models.SlugField(max_length=120, unique=True, blank=True)
     imagen = models.ImageField(upload_to='categorias/', blank=True, null=True)
@@ -61,6 +91,8 @@ class Categoria(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     
     def save(self, *args, **kwargs):
+        self.nombre_normalizado = normalizar_texto(self.nombre)
+        _incluir_campos(kwargs, 'nombre_normalizado')
         if not self.slug:
             self.slug = slugify(self.nombre)
         super().save(*args, **kwargs)
@@ -87,6 +119,7 @@ class Categoria(models.Model):
 class Subcategoria(models.Model):
     """Subcategorías de productos"""
     nombre = models.CharField(max_length=120, verbose_name="Nombre")
+    nombre_normalizado = models.CharField(max_length=120, blank=True, db_index=True, editable=False)
     slug = models.SlugField(max_length=120, unique=True, blank=True)
     categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, related_name="subcategorias", verbose_name="Categoría")
     descripcion = models.TextField(blank=True, verbose_name="Descripción")
@@ -94,6 +127,8 @@ class Subcategoria(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     
     def save(self, *args, **kwargs):
+        self.nombre_normalizado = normalizar_texto(self.nombre)
+        _incluir_campos(kwargs, 'nombre_normalizado')
         if not self.slug:
             self.slug = slugify(self.nombre)
         super().save(*args, **kwargs)
@@ -120,12 +155,15 @@ class Subcategoria(models.Model):
 class Estatus(models.Model):
     """Estatus de procedencia de productos"""
     nombre = models.CharField(max_length=120, verbose_name="Nombre")
+    nombre_normalizado = models.CharField(max_length=120, blank=True, db_index=True, editable=False)
     slug = models.SlugField(max_length=120, unique=True, blank=True)
     descripcion = models.TextField(blank=True, verbose_name="Descripción")
     activo = models.BooleanField(default=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     
     def save(self, *args, **kwargs):
+        self.nombre_normalizado = normalizar_texto(self.nombre)
+        _incluir_campos(kwargs, 'nombre_normalizado')
         if not self.slug:
             self.slug = slugify(self.nombre)
         super().save(*args, **kwargs)
@@ -152,6 +190,7 @@ class Estatus(models.Model):
 class Marca(models.Model):
     """Marcas de productos"""
     nombre = models.CharField(max_length=100, unique=True)
+    nombre_normalizado = models.CharField(max_length=100, blank=True, db_index=True, editable=False)
     slug = models.SlugField(max_length=100, unique=True, blank=True)
     descripcion = models.TextField(blank=True)
     logo = models.ImageField(upload_to='marcas/', blank=True, null=True)
@@ -159,6 +198,8 @@ class Marca(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     
     def save(self, *args, **kwargs):
+        self.nombre_normalizado = normalizar_texto(self.nombre)
+        _incluir_campos(kwargs, 'nombre_normalizado')
         if not self.slug:
             self.slug = slugify(self.nombre)
         super().save(*args, **kwargs)
@@ -179,6 +220,10 @@ class Producto(models.Model):
     descripcion_corta = models.CharField(max_length=500, blank=True, verbose_name="Descripción Corta")
     descripcion = models.TextField(blank=True, verbose_name="Descripción")
     
+    # Texto normalizado (minúsculas, sin tildes) para búsquedas
+    nombre_normalizado = models.CharField(max_length=250, blank=True, db_index=True, editable=False)
+    texto_busqueda = models.TextField(blank=True, editable=False)
+    
     # Relaciones
     categoria = models.ForeignKey(Categoria, on_delete=models.SET_NULL, null=True, blank=True, related_name='productos', verbose_name="Categoría")
     subcategoria = models.ForeignKey(Subcategoria, on_delete=models.SET_NULL, null=True, blank=True, related_name='productos', verbose_name="Subcategoría")
@@ -190,6 +235,8 @@ class Producto(models.Model):
     precio = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, validators=[MinValueValidator(Decimal('0.01'))], verbose_name="Precio")
     precio_oferta = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, validators=[MinValueValidator(Decimal('0.01'))], verbose_name="Precio de Oferta")
     stock = models.IntegerField(default=0, validators=[MinValueValidator(0)])
+    # Versión del stock para concurrencia optimista: +1 con cada movimiento (ver MovimientoStock)
+    version = models.PositiveIntegerField(default=0, editable=False)
     sku = models.CharField(max_length=100, unique=True, blank=True, verbose_name="Código SKU", help_text="Código único del producto (se genera automáticamente)")
     
     # Características del producto
@@ -228,95 +275,98 @@ class Producto(models.Model):
     def __str__(self):
         return self.nombre
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._stock_leido = instancia.__dict__.get('stock')
+        return instancia
+    
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if fields is None or 'stock' in fields:
+            self._stock_leido = self.__dict__.get('stock')
+    
+    def editar_stock(self, nuevo, visto=None):
+        """
+        Fija el stock que guardará save() como la diferencia entre `nuevo` y
+        el valor que vio quien edita (`visto`; por defecto, el leído de la
+        base). Los movimientos registrados mientras tanto no se pierden.
+        """
+        if visto is not None:
+            self._stock_leido = visto
+        self.stock = nuevo
+    
     def save(self, *args, **kwargs):
-        # Optimizar imagen principal antes de guardar
-        if self.imagen:
-            self.imagen = self.optimize_image(self.imagen)
+        # La imagen recién subida se guarda tal cual y se optimiza en segundo
+        # plano (comando `procesar_imagenes`)
+        imagen_subida = bool(self.imagen) and not self.imagen._committed
         
-        # Generar slug si no existe
+        # Slug y SKU únicos si no existen; la restricción UNIQUE resuelve
+        # la carrera entre guardados simultáneos (ver identificadores.py)
+        generados = []
         if not self.slug:
-            base_slug = slugify(self.nombre)
-            slug = base_slug
-            counter = 1
-            while Producto.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
+            self.slug = asignar_slug(self.nombre, excluir_pk=self.pk)
+            generados.append('slug')
+        if not self.sku:
+            self.sku = self.generar_sku()
+            generados.append('sku')
+        _incluir_campos(kwargs, *generados)
         
         # Calcular automáticamente si está en oferta
         if self.precio_oferta and self.precio_oferta > 0:
             self.en_oferta = True
         else:
             self.en_oferta = False
-            
-        super().save(*args, **kwargs)
-    
-    @staticmethod
-    def optimize_image(image_field, max_size=(1200, 1200), quality=90):
-        """Optimiza la imagen manteniendo calidad y aspecto"""
-        try:
-            img = Image.open(image_field)
-            
-            # Convertir RGBA a RGB si es necesario
-            if img.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            
-            # Redimensionar manteniendo aspecto
-            img.thumbnail(max_size, Image.Resampling.LANCZOS)
-            
-            # Guardar optimizada
-            output = BytesIO()
-            img.save(output, format='JPEG', quality=quality, optimize=True)
-            output.seek(0)
-            
-            return InMemoryUploadedFile(
-                output,
-                'ImageField',
-                f"{image_field.name.split('.')[0]}.jpg",
-                'image/jpeg',
-                sys.getsizeof(output),
-                None
-            )
-        except Exception as e:
-            print(f"Error optimizando imagen: {e}")
-            return image_field
+        
+        # El stock de un producto existente solo cambia con movimientos
+        # (F('stock') + diferencia): save() nunca sobrescribe la columna
+        nuevo = self._state.adding
+        diferencia = 0
+        if not nuevo:
+            leido = getattr(self, '_stock_leido', None)
+            if leido is not None and 'stock' in self.__dict__:
+                diferencia = self.stock - leido
+            _excluir_campos(self, kwargs, 'stock', 'version')
+        
+        for intento in range(INTENTOS):
+            # Columnas de búsqueda normalizadas (incluyen el SKU)
+            self.nombre_normalizado = normalizar_texto(self.nombre)
+            self.texto_busqueda = texto_busqueda(self.nombre, self.descripcion_corta, self.descripcion, self.sku)
+            _incluir_campos(kwargs, 'nombre_normalizado', 'texto_busqueda')
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                    if diferencia:
+                        self.stock, self.version = MovimientoStock.registrar(
+                            self.pk, diferencia, MovimientoStock.AJUSTE
+                        )
+                    elif nuevo and self.stock:
+                        MovimientoStock.objects.create(
+                            producto=self, cantidad=self.stock, stock_resultante=self.stock,
+                            motivo=MovimientoStock.INICIAL,
+                        )
+                    if imagen_subida:
+                        TareaImagen.objects.create(producto=self, archivo=self.imagen.name)
+                self._stock_leido = self.stock
+                return
+            except IntegrityError:
+                if intento == INTENTOS - 1 or not self._reasignar_identificadores(generados):
+                    raise
+    
+    def _reasignar_identificadores(self, generados):
+        """Vuelve a asignar los identificadores generados que otro guardado ocupó. Retorna si cambió alguno"""
+        cambiados = False
+        if 'slug' in generados and ocupados('slug', [self.slug], excluir_pk=self.pk):
+            self.slug = asignar_slug(self.nombre, excluir_pk=self.pk)
+            cambiados = True
+        if 'sku' in generados and ocupados('sku', [self.sku], excluir_pk=self.pk):
+            self.sku = self.generar_sku()
+            cambiados = True
+        return cambiados
     
     def generar_sku(self):
         """Genera un SKU único para el producto con formato PROV-CAT-YYMMDD-HHMM-UUID4"""
-        if self.proveedor:
-            # Usar las primeras 3 letras del proveedor
-            proveedor_code = ''.join(c for c in self.proveedor.nombre if c.isalnum())[:3].upper()
-        else:
-            proveedor_code = 'GEN'  # General si no hay proveedor
-        
-        if self.categoria:
-            # Usar las primeras 2 letras de la categoría
-            categoria_code = ''.join(c for c in self.categoria.nombre if c.isalnum())[:2].upper()
-        else:
-            categoria_code = 'XX'  # Default si no hay categoría
-        
-        # Fecha actual en formato YYMMDD
-        date_code = datetime.now().strftime('%y%m%d')
-        
-        # Número secuencial basado en la hora actual + últimos 4 dígitos del UUID
-        time_code = datetime.now().strftime('%H%M')
-        uuid_suffix = str(uuid.uuid4().hex)[-4:].upper()
-        
-        # Formato: PROV-CAT-YYMMDD-HHMM-UUID4
-        base_sku = f"{proveedor_code}-{categoria_code}-{date_code}-{time_code}-{uuid_suffix}"
-        
-        # Verificar que el SKU sea único
-        counter = 1
-        sku = base_sku
-        while Producto.objects.filter(sku=sku).exclude(pk=self.pk).exists():
-            sku = f"{base_sku}-{counter:02d}"
-            counter += 1
-        
-        return sku
+        return asignar_sku(prefijo_sku(self.proveedor, self.categoria), excluir_pk=self.pk)
     
     def get_absolute_url(self):
         """URL absoluta del producto - Importante para SEO"""
@@ -444,14 +494,59 @@ class ProductImage(models.Model):
         verbose_name_plural = "Imágenes de Galería"
 
     def save(self, *args, **kwargs):
-        # Optimizar imagen antes de guardar
-        if self.image:
-            self.image = Producto.optimize_image(self.image)
+        # La imagen recién subida se optimiza en segundo plano (ver TareaImagen)
+        imagen_subida = bool(self.image) and not self.image._committed
         
-        # Si es imagen principal, desmarcar otras como principales
-        if self.is_main:
-            ProductImage.objects.filter(producto=self.producto, is_main=True).exclude(pk=self.pk).update(is_main=False)
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            # Si es imagen principal, desmarcar otras como principales
+            if self.is_main:
+                ProductImage.objects.filter(producto=self.producto, is_main=True).exclude(pk=self.pk).update(is_main=False)
+            super().save(*args, **kwargs)
+            if imagen_subida:
+                TareaImagen.objects.create(producto_id=self.producto_id, imagen=self, archivo=self.image.name)
+
+
+class TareaImagen(models.Model):
+    """
+    Cola de optimización de imágenes subidas (imagen principal del producto
+    o imagen de galería). Las procesa fuera de las peticiones el comando
+    `procesar_imagenes` (ver productos/imagenes.py).
+    """
+    PENDIENTE = 'pendiente'
+    PROCESANDO = 'procesando'
+    COMPLETADA = 'completada'
+    DESCARTADA = 'descartada'
+    ERROR = 'error'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (PROCESANDO, 'Procesando'),
+        (COMPLETADA, 'Optimizada'),
+        (DESCARTADA, 'Descartada'),
+        (ERROR, 'Error'),
+    ]
+    
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='tareas_imagen')
+    # Vacía si la tarea es de la imagen principal (Producto.imagen)
+    imagen = models.ForeignKey(ProductImage, on_delete=models.CASCADE, null=True, blank=True, related_name='tareas')
+    archivo = models.CharField(max_length=255, help_text="Archivo subido sin optimizar")
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    trabajador = models.CharField(max_length=100, blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Tarea de Imagen'
+        verbose_name_plural = 'Tareas de Imágenes'
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['estado', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.archivo} ({self.get_estado_display()})"
 
 
 class ProductVideo(models.Model):
@@ -490,3 +585,418 @@ class Valoracion(models.Model):
     
     def __str__(self):
         return f"{self.puntuacion} estrellas - {self.producto.nombre}"
+    
+    def save(self, *args, **kwargs):
+        # El resumen se actualiza en la misma transacción que la valoración
+        with transaction.atomic():
+            anterior = None
+            if self.pk:
+                anterior = Valoracion.objects.filter(pk=self.pk).values('producto_id', 'puntuacion').first()
+            super().save(*args, **kwargs)
+            
+            if anterior and (anterior['producto_id'], anterior['puntuacion']) == (self.producto_id, self.puntuacion):
+                return
+            if anterior:
+                ResumenValoraciones.registrar(anterior['producto_id'], anterior['puntuacion'], -1)
+            ResumenValoraciones.registrar(self.producto_id, self.puntuacion, 1)
+
+
+class ResumenValoraciones(models.Model):
+    """Resumen incremental de valoraciones por producto (total, suma y distribución)"""
+    producto = models.OneToOneField(Producto, on_delete=models.CASCADE, primary_key=True, related_name='resumen_valoraciones')
+    total = models.PositiveIntegerField(default=0)
+    suma = models.PositiveIntegerField(default=0)
+    estrellas_1 = models.PositiveIntegerField(default=0)
+    estrellas_2 = models.PositiveIntegerField(default=0)
+    estrellas_3 = models.PositiveIntegerField(default=0)
+    estrellas_4 = models.PositiveIntegerField(default=0)
+    estrellas_5 = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Resumen de Valoraciones'
+        verbose_name_plural = 'Resúmenes de Valoraciones'
+    
+    def __str__(self):
+        return f"{self.promedio} ({self.total}) - {self.producto_id}"
+    
+    @property
+    def promedio(self):
+        """Puntuación media redondeada a un decimal"""
+        return round(self.suma / self.total, 1) if self.total else 0
+    
+    @property
+    def distribucion(self):
+        """Cantidad de valoraciones por número de estrellas"""
+        return {str(n): getattr(self, f'estrellas_{n}') for n in range(5, 0, -1)}
+    
+    @classmethod
+    def registrar(cls, producto_id, puntuacion, signo, crear=True):
+        """
+        Suma (signo=1) o resta (signo=-1) una valoración al resumen del producto
+        con un UPDATE atómico basado en F().
+        """
+        if crear:
+            cls.objects.get_or_create(producto_id=producto_id)
+        cambios = {
+            'total': F('total') + signo,
+            'suma': F('suma') + signo * puntuacion,
+        }
+        if 1 <= puntuacion <= 5:
+            campo = f'estrellas_{puntuacion}'
+            cambios[campo] = F(campo) + signo
+        cls.objects.filter(producto_id=producto_id).update(**cambios)
+    
+    @classmethod
+    def reconciliar(cls):
+        """
+        Recalcula todos los resúmenes desde las valoraciones y corrige las
+        diferencias. Retorna el número de resúmenes corregidos.
+        """
+        from django.db.models import Count, Q, Sum
+        
+        agregados = {
+            fila['producto_id']: fila
+            for fila in Valoracion.objects.values('producto_id').annotate(
+                total=Count('id'),
+                suma=Sum('puntuacion'),
+                **{f'estrellas_{n}': Count('id', filter=Q(puntuacion=n)) for n in range(1, 6)}
+            ).order_by()
+        }
+        campos = ['total', 'suma'] + [f'estrellas_{n}' for n in range(1, 6)]
+        
+        corregidos = 0
+        existentes = set()
+        for resumen in cls.objects.all():
+            existentes.add(resumen.producto_id)
+            esperado = agregados.get(resumen.producto_id, {})
+            cambios = {c: esperado.get(c) or 0 for c in campos if getattr(resumen, c) != (esperado.get(c) or 0)}
+            if cambios:
+                cls.objects.filter(pk=resumen.pk).update(**cambios)
+                corregidos += 1
+        
+        faltantes = [
+            cls(producto_id=producto_id, **{c: fila[c] or 0 for c in campos})
+            for producto_id, fila in agregados.items() if producto_id not in existentes
+        ]
+        cls.objects.bulk_create(faltantes)
+        return corregidos + len(faltantes)
+
+
+class MovimientoStock(models.Model):
+    """
+    Libro de movimientos de stock (solo se añaden filas). `Producto.stock`
+    es el saldo: cada movimiento lo actualiza con `F('stock') + cantidad`
+    en la misma transacción, sin bloquear la fila entre peticiones.
+    `compactar` resume los movimientos antiguos en un saldo y `conciliar`
+    corrige los desvíos (comando `compactar_stock`).
+    """
+    INICIAL = 'inicial'
+    AJUSTE = 'ajuste'
+    RECUENTO = 'recuento'
+    VENTA = 'venta'
+    DEVOLUCION = 'devolucion'
+    IMPORTACION = 'importacion'
+    SALDO = 'saldo'
+    CONCILIACION = 'conciliacion'
+    MOTIVOS = [
+        (INICIAL, 'Stock inicial'),
+        (AJUSTE, 'Ajuste manual'),
+        (RECUENTO, 'Recuento'),
+        (VENTA, 'Venta'),
+        (DEVOLUCION, 'Devolución'),
+        (IMPORTACION, 'Importación'),
+        (SALDO, 'Saldo compactado'),
+        (CONCILIACION, 'Conciliación'),
+    ]
+    
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='movimientos_stock')
+    cantidad = models.IntegerField(help_text="Positiva si entra stock, negativa si sale")
+    stock_resultante = models.IntegerField()
+    motivo = models.CharField(max_length=20, choices=MOTIVOS)
+    referencia = models.CharField(max_length=100, blank=True, help_text="Pedido, documento u origen del movimiento")
+    usuario = models.ForeignKey('auth.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos_stock')
+    fecha = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Movimiento de Stock'
+        verbose_name_plural = 'Movimientos de Stock'
+        ordering = ['-fecha', '-id']
+        indexes = [
+            models.Index(fields=['producto', 'fecha']),
+            models.Index(fields=['fecha']),
+        ]
+    
+    def __str__(self):
+        return f"{self.producto_id}: {self.cantidad:+d} ({self.get_motivo_display()})"
+    
+    @classmethod
+    def registrar(cls, producto_id, cantidad, motivo, referencia='', usuario=None, version=None):
+        """
+        Aplica el movimiento al stock del producto con un UPDATE atómico
+        basado en F() y lo anota en el libro, en la misma transacción.
+        Con `version`, solo se aplica si el stock no cambió desde que se
+        leyó esa versión (ConflictoVersion en caso contrario).
+        Retorna (stock, versión) resultantes.
+        """
+        with transaction.atomic():
+            filtro = models.Q(pk=producto_id)
+            if cantidad < 0:
+                filtro &= models.Q(stock__gte=-cantidad)
+            if version is not None:
+                filtro &= models.Q(version=version)
+            actualizados = Producto.objects.filter(filtro).update(
+                stock=F('stock') + cantidad,
+                version=F('version') + 1,
+                fecha_actualizacion=timezone.now(),
+            )
+            if not actualizados:
+                actual = Producto.objects.filter(pk=producto_id).values_list('stock', 'version').first()
+                if actual is None:
+                    raise Producto.DoesNotExist(f"No existe el producto {producto_id}")
+                if version is not None and actual[1] != version:
+                    raise ConflictoVersion(f"El stock del producto {producto_id} cambió (versión {actual[1]})")
+                raise StockInsuficiente(f"Stock insuficiente: {actual[0]} disponible(s), movimiento de {cantidad}")
+            
+            stock, version = Producto.objects.filter(pk=producto_id).values_list('stock', 'version').get()
+            cls.objects.create(
+                producto_id=producto_id, cantidad=cantidad, stock_resultante=stock,
+                motivo=motivo, referencia=referencia, usuario=usuario,
+            )
+        return stock, version
+    
+    @classmethod
+    def compactar(cls, hasta, chunk_size=500):
+        """
+        Resume, por producto, los movimientos anteriores a `hasta` en un único
+        movimiento de saldo con su suma. Los movimientos posteriores no se
+        tocan, así que puede ejecutarse con la tienda en marcha.
+        Retorna el número de movimientos eliminados.
+        """
+        from django.db.models import Count, Max, OuterRef, Subquery, Sum
+        
+        antiguos = cls.objects.filter(fecha__lt=hasta)
+        ultimo = antiguos.filter(producto_id=OuterRef('producto_id')).order_by('-fecha', '-id')
+        producto_ids = list(
+            antiguos.values('producto_id').annotate(n=Count('id')).filter(n__gt=1)
+            .order_by('producto_id').values_list('producto_id', flat=True)
+        )
+        
+        eliminados = 0
+        for inicio in range(0, len(producto_ids), chunk_size):
+            bloque = producto_ids[inicio:inicio + chunk_size]
+            with transaction.atomic():
+                resumen = antiguos.filter(producto_id__in=bloque).values('producto_id').annotate(
+                    cantidad=Sum('cantidad'),
+                    fecha=Max('fecha'),
+                    stock_resultante=Subquery(ultimo.values('stock_resultante')[:1]),
+                ).order_by()
+                saldos = [cls(motivo=cls.SALDO, **fila) for fila in resumen]
+                eliminados += antiguos.filter(producto_id__in=bloque).delete()[0]
+                cls.objects.bulk_create(saldos)
+        return eliminados
+    
+    @classmethod
+    def conciliar(cls):
+        """
+        Añade un movimiento de conciliación a cada producto cuyo stock no
+        coincide con la suma de sus movimientos (cambios hechos fuera del
+        libro). Una sola sentencia INSERT ... SELECT: los movimientos que se
+        confirman mientras tanto no se ven a medias.
+        Retorna el número de productos conciliados.
+        """
+        from django.db import connection
+        
+        movimientos = cls._meta.db_table
+        productos = Producto._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {movimientos} (producto_id, cantidad, stock_resultante, motivo, referencia, fecha) '
+                f'SELECT p.id, p.stock - COALESCE(SUM(m.cantidad), 0), p.stock, %s, %s, %s '
+                f'FROM {productos} p LEFT JOIN {movimientos} m ON m.producto_id = p.id '
+                f'GROUP BY p.id, p.stock HAVING p.stock <> COALESCE(SUM(m.cantidad), 0)',
+                [cls.CONCILIACION, '', timezone.now()],
+            )
+            return cursor.rowcount
+
+
+class ProductoCard(models.Model):
+    """Modelo de lectura desnormalizado con los datos de tarjeta de cada producto activo.
+
+    Se mantiene actualizado mediante señales (ver productos/signals.py) y se
+    reconstruye con el comando `reconstruir_tarjetas`. Los listados públicos
+    leen de esta tabla en lugar de unir las cinco taxonomías, la galería y
+    las valoraciones en cada petición.
+    """
+    producto = models.OneToOneField(Producto, on_delete=models.CASCADE, primary_key=True, related_name='card')
+    nombre = models.CharField(max_length=250)
+    slug = models.SlugField(max_length=250)
+    descripcion_corta = models.CharField(max_length=500, blank=True)
+    sku = models.CharField(max_length=100, blank=True)
+    origen = models.CharField(max_length=100, blank=True)
+    # Nombre, descripciones, SKU y taxonomías normalizados (búsqueda sin FTS)
+    texto_busqueda = models.TextField(blank=True)
+    
+    # Taxonomías resueltas
+    categoria_id = models.BigIntegerField(null=True, blank=True)
+    categoria_nombre = models.CharField(max_length=120, blank=True)
+    categoria_slug = models.CharField(max_length=120, blank=True)
+    subcategoria_id = models.BigIntegerField(null=True, blank=True)
+    subcategoria_nombre = models.CharField(max_length=120, blank=True)
+    subcategoria_slug = models.CharField(max_length=120, blank=True)
+    marca_id = models.BigIntegerField(null=True, blank=True)
+    marca_nombre = models.CharField(max_length=100, blank=True)
+    marca_slug = models.CharField(max_length=100, blank=True)
+    proveedor_id = models.BigIntegerField(null=True, blank=True)
+    proveedor_nombre = models.CharField(max_length=120, blank=True)
+    estatus_id = models.BigIntegerField(null=True, blank=True)
+    estatus_nombre = models.CharField(max_length=120, blank=True)
+    
+    # Precios, inventario y estado
+    precio = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    precio_oferta = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    precio_final = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    tiene_descuento = models.BooleanField(default=False)
+    porcentaje_descuento = models.PositiveSmallIntegerField(default=0)
+    stock = models.IntegerField(default=0)
+    disponible = models.BooleanField(default=True)
+    destacado = models.BooleanField(default=False)
+    en_oferta = models.BooleanField(default=False)
+    badges = models.JSONField(default=list, blank=True)
+    
+    # Imagen y valoraciones
+    imagen_url = models.CharField(max_length=500, blank=True)
+    rating_promedio = models.FloatField(default=0)
+    total_valoraciones = models.PositiveIntegerField(default=0)
+    
+    # Metadata
+    fecha_creacion = models.DateTimeField()
+    fecha_actualizacion = models.DateTimeField()
+    actualizado = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Tarjeta de Producto'
+        verbose_name_plural = 'Tarjetas de Productos'
+        ordering = ['-destacado', '-en_oferta', '-fecha_creacion']
+        indexes = [
+            # Claves de ordenamiento con desempate por id (paginación por cursor)
+            models.Index(fields=['disponible', '-destacado', '-en_oferta', '-fecha_creacion', '-producto']),
+            models.Index(fields=['disponible', 'fecha_creacion', 'producto']),
+            models.Index(fields=['disponible', 'precio', 'producto']),
+            models.Index(fields=['disponible', 'nombre', 'producto']),
+            models.Index(fields=['categoria_slug', 'disponible']),
+            models.Index(fields=['subcategoria_slug', 'disponible']),
+            models.Index(fields=['marca_id']),
+            models.Index(fields=['proveedor_id']),
+            models.Index(fields=['estatus_id']),
+            models.Index(fields=['categoria_id']),
+            models.Index(fields=['subcategoria_id']),
+        ]
+    
+    def __str__(self):
+        return self.nombre
+    
+    def get_absolute_url(self):
+        """URL absoluta del producto"""
+        from django.urls import reverse
+        return reverse('productos:detalle', args=[self.slug])
+    
+    @property
+    def en_stock(self):
+        """Indica si hay stock disponible"""
+        return self.stock > 0
+
+
+class FacetaConteo(models.Model):
+    """
+    Conteo materializado de productos por opción de filtro (faceta).
+    Las filas con `filtro` vacío son conteos globales; el resto están
+    condicionados a un único filtro seleccionado (filtro = filtro_valor).
+    La faceta especial 'total' guarda el número de productos de la selección.
+    """
+    filtro = models.CharField(max_length=20, blank=True)
+    filtro_valor = models.CharField(max_length=64, blank=True)
+    faceta = models.CharField(max_length=20)
+    valor = models.CharField(max_length=64)
+    total = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Conteo de Faceta'
+        verbose_name_plural = 'Conteos de Facetas'
+        unique_together = ['filtro', 'filtro_valor', 'faceta', 'valor']
+        indexes = [
+            models.Index(fields=['filtro', 'filtro_valor', 'faceta']),
+        ]
+    
+    def __str__(self):
+        condicion = f" [{self.filtro}={self.filtro_valor}]" if self.filtro else ''
+        return f"{self.faceta}={self.valor}{condicion}: {self.total}"
+
+
+class ProductoRelacionado(models.Model):
+    """
+    Productos relacionados precalculados (comando `reconstruir_relacionados`).
+    Apunta a la tarjeta del relacionado para leer la lista con una sola
+    consulta; al desaparecer la tarjeta, la relación se elimina en cascada.
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='relacionados')
+    relacionado = models.ForeignKey(ProductoCard, on_delete=models.CASCADE, related_name='relacionado_con')
+    puntuacion = models.FloatField(default=0)
+    posicion = models.PositiveSmallIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Producto Relacionado'
+        verbose_name_plural = 'Productos Relacionados'
+        ordering = ['producto', 'posicion']
+        unique_together = ['producto', 'relacionado']
+        indexes = [
+            models.Index(fields=['producto', 'posicion']),
+        ]
+    
+    def __str__(self):
+        return f"{self.producto_id} → {self.relacionado_id} ({self.puntuacion:.2f})"
+
+
+class ProductoSimilar(models.Model):
+    """
+    Vecinos más cercanos por similitud de texto (TF-IDF + coseno),
+    calculados por el comando `calcular_similares`.
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='similares')
+    similar = models.ForeignKey(ProductoCard, on_delete=models.CASCADE, related_name='similar_a')
+    puntuacion = models.FloatField(default=0)
+    posicion = models.PositiveSmallIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Producto Similar'
+        verbose_name_plural = 'Productos Similares'
+        ordering = ['producto', 'posicion']
+        unique_together = ['producto', 'similar']
+        indexes = [
+            models.Index(fields=['producto', 'posicion']),
+        ]
+    
+    def __str__(self):
+        return f"{self.producto_id} ~ {self.similar_id} ({self.puntuacion:.3f})"
+
+
+class MarcaDeAgua(models.Model):
+    """Marca de tiempo de la última ejecución de un proceso incremental"""
+    clave = models.CharField(max_length=100, unique=True)
+    valor = models.DateTimeField(null=True, blank=True)
+    actualizado = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Marca de Agua'
+        verbose_name_plural = 'Marcas de Agua'
+    
+    def __str__(self):
+        return f"{self.clave}: {self.valor}"
+    
+    @classmethod
+    def obtener(cls, clave):
+        """Retorna el valor guardado para la clave (None si nunca se ejecutó)"""
+        return cls.objects.filter(clave=clave).values_list('valor', flat=True).first()
+    
+    @classmethod
+    def guardar(cls, clave, valor):
+        cls.objects.update_or_create(clave=clave, defaults={'valor': valor})
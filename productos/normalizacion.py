@@ -0,0 +1,71 @@
+"""
+Normalización de texto para búsquedas en español.
+
+Todas las rutas de búsqueda (columnas precalculadas, índice FTS, filtros
+de respaldo y autocompletado) comparan texto pasado por `normalizar_texto`,
+de modo que "Electrónica", "ELECTRONICA" y "electronica" coinciden.
+"""
+
+import unicodedata
+
+
+def normalizar_texto(texto):
+    """Minúsculas (casefold), sin tildes ni diéresis y con espacios colapsados"""
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto).casefold())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.split())
+
+
+def texto_busqueda(*partes):
+    """Une y normaliza varias partes de texto en una sola columna de búsqueda"""
+    return normalizar_texto(' '.join(str(parte) for parte in partes if parte))
+
+
+# ==================== RELLENO DE COLUMNAS ====================
+# Reciben la clase del modelo para poder usarse también desde migraciones
+# (con los modelos históricos, que no ejecutan el save() personalizado).
+
+def _por_lotes(queryset, chunk_size):
+    """Recorre el queryset por lotes de id creciente (permite escribir entre lotes)"""
+    ultimo = 0
+    while True:
+        lote = list(queryset.filter(id__gt=ultimo).order_by('id')[:chunk_size])
+        if not lote:
+            return
+        yield lote
+        ultimo = lote[-1].id
+
+
+def rellenar_nombres_normalizados(modelo, chunk_size=1000):
+    """Recalcula `nombre_normalizado` de una taxonomía. Retorna las filas cambiadas"""
+    total = 0
+    for lote in _por_lotes(modelo.objects.only('id', 'nombre', 'nombre_normalizado'), chunk_size):
+        cambiados = []
+        for objeto in lote:
+            normalizado = normalizar_texto(objeto.nombre)
+            if objeto.nombre_normalizado != normalizado:
+                objeto.nombre_normalizado = normalizado
+                cambiados.append(objeto)
+        modelo.objects.bulk_update(cambiados, ['nombre_normalizado'])
+        total += len(cambiados)
+    return total
+
+
+def rellenar_textos_producto(modelo, chunk_size=1000):
+    """Recalcula `nombre_normalizado` y `texto_busqueda` de los productos. Retorna las filas cambiadas"""
+    campos = ('id', 'nombre', 'descripcion_corta', 'descripcion', 'sku', 'nombre_normalizado', 'texto_busqueda')
+    total = 0
+    for lote in _por_lotes(modelo.objects.only(*campos), chunk_size):
+        cambiados = []
+        for producto in lote:
+            nombre = normalizar_texto(producto.nombre)
+            texto = texto_busqueda(producto.nombre, producto.descripcion_corta, producto.descripcion, producto.sku)
+            if producto.nombre_normalizado != nombre or producto.texto_busqueda != texto:
+                producto.nombre_normalizado = nombre
+                producto.texto_busqueda = texto
+                cambiados.append(producto)
+        modelo.objects.bulk_update(cambiados, ['nombre_normalizado', 'texto_busqueda'])
+        total += len(cambiados)
+    return total
@@ -0,0 +1,230 @@
+"""
+Operaciones masivas del panel sobre productos (estado, stock, precios y ofertas).
+
+Cada operación se aplica con un único `UPDATE ... WHERE id IN (...)` por
+lote de productos, sin cargar los modelos ni pasar por `Producto.save()`
+(que optimiza imágenes y asigna identificadores). Como `update()` no envía
+señales, tras cada lote se refrescan sus tarjetas (con sus conteos de
+facetas e índice de búsqueda) y se programa una sola invalidación del
+catálogo.
+
+Los productos se seleccionan por id o por categoría, marca y proveedor.
+Las listas de relacionados, que dependen del precio, se actualizan en la
+siguiente reconstrucción (`reconstruir_relacionados`).
+"""
+
+import logging
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Value, When
+from django.db.models.functions import Greatest, Round
+from django.utils import timezone
+
+from . import publicacion
+from .cache_utils import incrementar_version_catalogo
+from .models import MovimientoStock, Producto
+from .read_models import refrescar_tarjetas
+
+logger = logging.getLogger(__name__)
+
+LOTE = 500
+CAMPOS_ESTADO = ('activo', 'destacado', 'disponible')
+# Filtros de selección y campo de Producto al que corresponden
+FILTROS = {'categoria': 'categoria_id', 'marca': 'marca_id', 'proveedor': 'proveedor_id'}
+PRECIO_MINIMO = Decimal('0.01')
+CENTAVO = Decimal('0.01')
+CAMPO_PRECIO = DecimalField(max_digits=10, decimal_places=2)
+
+
+class OperacionInvalida(ValueError):
+    """Operación, selección o parámetros no válidos"""
+
+
+# ==================== PARÁMETROS ====================
+
+def _decimal(datos, campo):
+    try:
+        return Decimal(str(datos[campo])).quantize(CENTAVO)
+    except (KeyError, InvalidOperation, ValueError):
+        raise OperacionInvalida(f"'{campo}' debe ser un número")
+
+
+def _entero(datos, campo):
+    valor = datos.get(campo)
+    if isinstance(valor, bool) or not isinstance(valor, (int, str)):
+        raise OperacionInvalida(f"'{campo}' debe ser un entero")
+    try:
+        return int(valor)
+    except ValueError:
+        raise OperacionInvalida(f"'{campo}' debe ser un entero")
+
+
+def _precio(expresion):
+    """Redondeo a centavos sin bajar del precio mínimo del modelo"""
+    return Greatest(
+        Round(ExpressionWrapper(expresion, output_field=DecimalField(max_digits=12, decimal_places=4)), 2),
+        Value(PRECIO_MINIMO),
+        output_field=CAMPO_PRECIO,
+    )
+
+
+def _si_no_nulo(campo, expresion):
+    """GREATEST ignora los NULL en algunos motores: un precio vacío sigue vacío"""
+    return Case(When(**{f'{campo}__isnull': True}, then=Value(None)), default=expresion, output_field=CAMPO_PRECIO)
+
+
+def _cambios_estado(datos):
+    campo = datos.get('campo')
+    if campo not in CAMPOS_ESTADO:
+        raise OperacionInvalida(f"'campo' debe ser uno de: {', '.join(CAMPOS_ESTADO)}")
+    valor = datos.get('valor')
+    if not isinstance(valor, bool):
+        raise OperacionInvalida("'valor' debe ser true o false")
+    return {campo: valor}, {}
+
+
+def _cambios_stock(datos):
+    stock = _entero(datos, 'valor')
+    if stock < 0:
+        raise OperacionInvalida('El stock no puede ser negativo')
+    return {'stock': stock, 'version': F('version') + 1}, {}
+
+
+def _cambios_precio(datos):
+    """Ajuste por porcentaje (+10 = sube un 10 %) o por importe absoluto; la oferta se ajusta igual"""
+    modo = datos.get('modo')
+    valor = _decimal(datos, 'valor')
+    if modo == 'porcentaje':
+        if valor <= -100:
+            raise OperacionInvalida('El porcentaje debe ser mayor que -100')
+        factor = Value(1 + valor / 100)
+        ajustar = lambda campo: _precio(F(campo) * factor)
+    elif modo == 'absoluto':
+        ajustar = lambda campo: _precio(F(campo) + Value(valor))
+    else:
+        raise OperacionInvalida("'modo' debe ser 'porcentaje' o 'absoluto'")
+    cambios = {
+        'precio': ajustar('precio'),
+        'precio_oferta': _si_no_nulo('precio_oferta', ajustar('precio_oferta')),
+    }
+    # Los productos sin precio ("consultar") no se tocan
+    return cambios, {'precio__isnull': False}
+
+
+def _cambios_oferta(datos):
+    """Aplica un descuento porcentual sobre el precio (precio_oferta) o retira la oferta"""
+    if datos.get('quitar'):
+        return {'precio_oferta': None, 'en_oferta': False}, {}
+    descuento = _decimal(datos, 'descuento')
+    if not 0 < descuento < 100:
+        raise OperacionInvalida("'descuento' debe estar entre 0 y 100")
+    # Misma regla que Producto.save(): en oferta si hay precio de oferta
+    return {
+        'precio_oferta': _precio(F('precio') * Value(1 - descuento / 100)),
+        'en_oferta': True,
+    }, {'precio__isnull': False}
+
+
+OPERACIONES = {
+    'estado': _cambios_estado,
+    'stock': _cambios_stock,
+    'precio': _cambios_precio,
+    'oferta': _cambios_oferta,
+}
+
+
+def seleccion(datos):
+    """QuerySet de los productos elegidos por 'ids' o por 'filtros' (categoria/marca/proveedor)"""
+    ids = datos.get('ids')
+    filtros = datos.get('filtros') or {}
+    if not isinstance(filtros, dict) or set(filtros) - set(FILTROS):
+        raise OperacionInvalida(f"'filtros' admite: {', '.join(FILTROS)}")
+    if ids is None and not filtros:
+        raise OperacionInvalida("Indique 'ids' o 'filtros'")
+
+    queryset = Producto.objects.all()
+    if ids is not None:
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            raise OperacionInvalida("'ids' debe ser una lista de enteros")
+        queryset = queryset.filter(id__in=ids)
+    for nombre, valor in filtros.items():
+        queryset = queryset.filter(**{FILTROS[nombre]: _entero(filtros, nombre)})
+    return queryset
+
+
+# ==================== APLICACIÓN ====================
+
+def _retirar_publicados(producto_ids):
+    """
+    Retira las páginas publicadas de los productos (vuelven a servirse desde
+    las vistas hasta el siguiente `publicar_catalogo`) y republica los
+    listados de sus categorías, una vez por lote.
+    """
+    filas = Producto.objects.filter(id__in=producto_ids).values_list('slug', 'categoria__slug')
+    slugs, categorias = set(), set()
+    for slug, categoria in filas:
+        slugs.add(slug)
+        categorias.add(categoria)
+
+    def retirar():
+        try:
+            for slug in slugs:
+                publicacion.despublicar_detalle(slug)
+            publicacion.publicar_listado()
+            for categoria in categorias - {None, ''}:
+                publicacion.publicar_listado(categoria)
+        except Exception:
+            logger.exception('No se pudieron retirar las páginas publicadas del lote')
+
+    transaction.on_commit(retirar)
+
+
+def _anotar_stock(producto_ids, condiciones, stock):
+    """Registra en el libro de movimientos la diferencia de cada producto con el stock fijado"""
+    actuales = Producto.objects.select_for_update().filter(
+        id__in=producto_ids, **condiciones
+    ).exclude(stock=stock).values_list('id', 'stock')
+    MovimientoStock.objects.bulk_create([
+        MovimientoStock(producto_id=producto_id, cantidad=stock - actual, stock_resultante=stock,
+                        motivo=MovimientoStock.RECUENTO, referencia='Operación masiva')
+        for producto_id, actual in actuales
+    ])
+
+
+def _aplicar_lote(producto_ids, cambios, condiciones):
+    with transaction.atomic():
+        # Los callbacks de on_commit se ejecutan en orden: la generación del
+        # catálogo cambia antes de republicar, o los listados se
+        # renderizarían desde la caché anterior al cambio
+        transaction.on_commit(incrementar_version_catalogo)
+        if publicacion.publicacion_activa():
+            _retirar_publicados(producto_ids)
+        if 'stock' in cambios:
+            _anotar_stock(producto_ids, condiciones, cambios['stock'])
+        actualizados = Producto.objects.filter(id__in=producto_ids, **condiciones).update(
+            **cambios, fecha_actualizacion=timezone.now()
+        )
+        # update() no envía señales: tarjetas, facetas e índice del lote
+        refrescar_tarjetas(producto_ids)
+    return actualizados
+
+
+def aplicar_operacion(datos, lote=LOTE):
+    """
+    Valida y aplica la operación descrita en `datos` ({'operacion': ..., 'ids'
+    o 'filtros', parámetros}). Retorna (productos actualizados, lotes).
+    """
+    operacion = OPERACIONES.get(datos.get('operacion'))
+    if operacion is None:
+        raise OperacionInvalida(f"'operacion' debe ser una de: {', '.join(OPERACIONES)}")
+    cambios, condiciones = operacion(datos)
+    ids = list(seleccion(datos).order_by('id').values_list('id', flat=True))
+
+    actualizados = 0
+    lotes = 0
+    for inicio in range(0, len(ids), lote):
+        actualizados += _aplicar_lote(ids[inicio:inicio + lote], cambios, condiciones)
+        lotes += 1
+    logger.info(f"Operación {datos['operacion']}: {actualizados} producto(s) en {lotes} lote(s)")
+    return actualizados, lotes
@@ -0,0 +1,138 @@
+"""
+Paginación por cursor (keyset) para la API de productos.
+
+En lugar de `OFFSET` + `COUNT(*)`, cada página continúa a partir de los
+valores de ordenamiento del último elemento de la página anterior. Todos
+los ordenamientos terminan en la clave primaria para que el orden sea
+total y estable; las páginas profundas cuestan lo mismo que la primera.
+"""
+
+from django.core import signing
+from django.db.models import F, Q
+
+from .models import ProductoCard
+
+PRODUCTOS_POR_PAGINA = 12
+
+ORDEN_POR_DEFECTO = 'default'
+
+# Claves de ordenamiento: (campo, descendente, admite_nulos)
+ORDENAMIENTOS = {
+    'precio_asc': [('precio', False, True), ('producto_id', False, False)],
+    'precio_desc': [('precio', True, True), ('producto_id', True, False)],
+    'nombre_asc': [('nombre', False, False), ('producto_id', False, False)],
+    'nombre_desc': [('nombre', True, False), ('producto_id', True, False)],
+    'recientes': [('fecha_creacion', True, False), ('producto_id', True, False)],
+    'antiguos': [('fecha_creacion', False, False), ('producto_id', False, False)],
+    ORDEN_POR_DEFECTO: [
+        ('destacado', True, False),
+        ('en_oferta', True, False),
+        ('fecha_creacion', True, False),
+        ('producto_id', True, False),
+    ],
+}
+
+_SALT_CURSOR = 'productos.paginacion.cursor'
+
+
+class CursorInvalido(ValueError):
+    """El cursor recibido no es válido para este ordenamiento"""
+
+
+def claves_orden(orden):
+    """Retorna las claves de ordenamiento para el orden pedido (o el por defecto)"""
+    return ORDENAMIENTOS.get(orden, ORDENAMIENTOS[ORDEN_POR_DEFECTO])
+
+
+def nombre_orden(orden):
+    """Normaliza el nombre del orden a una clave conocida"""
+    return orden if orden in ORDENAMIENTOS else ORDEN_POR_DEFECTO
+
+
+def ordenar(queryset, orden):
+    """Aplica el ordenamiento total (con desempate por id) al queryset"""
+    expresiones = []
+    for campo, descendente, _ in claves_orden(orden):
+        if descendente:
+            expresiones.append(F(campo).desc(nulls_last=True))
+        else:
+            expresiones.append(F(campo).asc(nulls_last=True))
+    return queryset.order_by(*expresiones)
+
+
+def _posterior(campo, descendente, admite_nulos, valor):
+    """Condición 'viene después de valor' para un campo (nulos al final)"""
+    if valor is None:
+        # Los nulos van al final: nada viene después salvo por desempate
+        return None
+    lookup = 'lt' if descendente else 'gt'
+    condicion = Q(**{f'{campo}__{lookup}': valor})
+    if admite_nulos:
+        condicion |= Q(**{f'{campo}__isnull': True})
+    return condicion
+
+
+def _igual(campo, valor):
+    if valor is None:
+        return Q(**{f'{campo}__isnull': True})
+    return Q(**{campo: valor})
+
+
+def filtrar_despues_de(queryset, orden, valores):
+    """Filtra el queryset a los elementos posteriores a la tupla `valores`"""
+    condicion = None
+    igualdad = Q()
+    for (campo, descendente, admite_nulos), valor in zip(claves_orden(orden), valores):
+        posterior = _posterior(campo, descendente, admite_nulos, valor)
+        if posterior is not None:
+            rama = igualdad & posterior
+            condicion = rama if condicion is None else condicion | rama
+        igualdad &= _igual(campo, valor)
+    if condicion is None:
+        return queryset.none()
+    return queryset.filter(condicion)
+
+
+def codificar_cursor(card, orden):
+    """Genera el cursor opaco (firmado) que apunta después de `card`"""
+    valores = []
+    for campo, _, _ in claves_orden(orden):
+        field = ProductoCard._meta.get_field(campo)
+        valor = getattr(card, field.attname)
+        valores.append(None if valor is None else field.value_to_string(card))
+    return signing.dumps({'o': nombre_orden(orden), 'v': valores}, salt=_SALT_CURSOR, compress=True)
+
+
+def decodificar_cursor(cursor, orden):
+    """Retorna la tupla de valores del cursor o lanza CursorInvalido"""
+    try:
+        datos = signing.loads(cursor, salt=_SALT_CURSOR)
+    except signing.BadSignature:
+        raise CursorInvalido('Cursor inválido')
+
+    claves = claves_orden(orden)
+    if datos.get('o') != nombre_orden(orden) or len(datos.get('v', [])) != len(claves):
+        raise CursorInvalido('El cursor no corresponde al ordenamiento solicitado')
+
+    valores = []
+    for (campo, _, _), valor in zip(claves, datos['v']):
+        field = ProductoCard._meta.get_field(campo)
+        valores.append(None if valor is None else field.to_python(valor))
+    return valores
+
+
+def pagina_por_cursor(queryset, orden, cursor=None, por_pagina=PRODUCTOS_POR_PAGINA):
+    """
+    Retorna (elementos, siguiente_cursor) para la página que sigue al cursor.
+    El queryset debe venir ya filtrado; aquí se ordena y se recorta.
+    """
+    queryset = ordenar(queryset, orden)
+    if cursor:
+        queryset = filtrar_despues_de(queryset, orden, decodificar_cursor(cursor, orden))
+
+    elementos = list(queryset[:por_pagina + 1])
+    siguiente = None
+    if len(elementos) > por_pagina:
+        elementos = elementos[:por_pagina]
+        siguiente = codificar_cursor(elementos[-1], orden)
+    return elementos, siguiente
@@ -0,0 +1,292 @@
+"""
+Publicación estática del catálogo (modo opcional, `PUBLICACION_ENABLED`).
+
+Las páginas de detalle y la primera página de `get_productos_json` (global y
+por categoría) se renderizan a archivos en `PUBLICACION_ROOT` cada vez que
+cambia un producto, junto con sus variantes .gz/.br. El middleware
+`kitaluro.middleware.PublishedCatalogMiddleware` los sirve a los visitantes
+anónimos con WhiteNoise, sin pasar por las vistas ni por la base de datos.
+
+Estructura de archivos (relativa a la raíz de publicación):
+
+    productos/<slug>/index.html                      -> /productos/<slug>/
+    productos/api/productos/index.json               -> /productos/api/productos/
+    productos/api/productos/categoria/<slug>.json    -> /productos/api/productos/?categoria=<slug>
+
+Al publicar un producto solo se regeneran su página y los listados de sus
+categorías; el resto de páginas (menú con conteos, carruseles de
+relacionados) se actualiza con la reconstrucción completa
+(`manage.py publicar_catalogo`). Un cambio de taxonomía retira todo lo
+publicado hasta la siguiente reconstrucción: mientras tanto responden las
+vistas, con su caché habitual.
+"""
+
+import logging
+import os
+import re
+import shutil
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connections, transaction
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve, reverse
+
+from .models import ProductoCard
+
+logger = logging.getLogger(__name__)
+
+ARCHIVO_DETALLE = 'index.html'
+ARCHIVO_LISTADO = 'index.json'
+_SLUG = re.compile(r'[-a-zA-Z0-9_]+')
+
+
+def publicacion_activa():
+    return getattr(settings, 'PUBLICACION_ENABLED', False)
+
+
+def raiz_publicacion():
+    return Path(settings.PUBLICACION_ROOT)
+
+
+# ==================== RUTAS ====================
+
+def _urls():
+    return reverse('productos:index'), reverse('productos:api_productos')
+
+
+def ruta_detalle(slug):
+    return Path(_urls()[0].strip('/')) / slug / ARCHIVO_DETALLE
+
+
+def ruta_listado(categoria_slug=None):
+    base = Path(_urls()[1].strip('/'))
+    if categoria_slug:
+        return base / 'categoria' / f'{categoria_slug}.json'
+    return base / ARCHIVO_LISTADO
+
+
+def archivo_publicado(request):
+    """
+    Ruta relativa del archivo publicado que corresponde a la petición, o
+    None si la URL no es publicable (querystring no contemplada, etc.).
+    """
+    url_index, url_listado = _urls()
+    path = request.path_info
+
+    if path == url_listado:
+        if not request.GET:
+            return ruta_listado()
+        categoria = request.GET.getlist('categoria')
+        if list(request.GET) == ['categoria'] and len(categoria) == 1 and _SLUG.fullmatch(categoria[0]):
+            return ruta_listado(categoria[0])
+        return None
+
+    if request.GET or not path.startswith(url_index) or not path.endswith('/'):
+        return None
+    slug = path[len(url_index):-1]
+    if _SLUG.fullmatch(slug):
+        return ruta_detalle(slug)
+    return None
+
+
+# ==================== RENDERIZADO ====================
+
+def _peticion(path, query=''):
+    """Petición GET anónima equivalente a la de un visitante"""
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = path
+    request.GET = QueryDict(query)
+    request.META = {
+        'REQUEST_METHOD': 'GET',
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+    }
+    request.user = AnonymousUser()
+    request.resolver_match = resolve(path)
+    return request
+
+
+def _renderizar(path, query='', vista=None):
+    """Contenido de la respuesta 200 de la URL (None en cualquier otro caso)"""
+    try:
+        request = _peticion(path, query)
+    except Resolver404:
+        return None
+    match = request.resolver_match
+    if vista is not None and match.view_name != vista:
+        # La URL la atiende otra vista (p. ej. un slug que coincide con una ruta fija)
+        return None
+    respuesta = match.func(request, *match.args, **match.kwargs)
+    if hasattr(respuesta, 'render'):
+        respuesta.render()
+    if respuesta.status_code != 200:
+        return None
+    return respuesta.content
+
+
+def _eliminar(archivo):
+    for ruta in (archivo, archivo.with_name(archivo.name + '.gz'), archivo.with_name(archivo.name + '.br')):
+        try:
+            ruta.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _escribir(raiz, relativa, contenido):
+    """Escribe el archivo de forma atómica y genera sus variantes comprimidas"""
+    from whitenoise.compress import Compressor
+
+    archivo = raiz / relativa
+    archivo.parent.mkdir(parents=True, exist_ok=True)
+    temporal = archivo.with_name(f'.{archivo.name}.{uuid.uuid4().hex}.tmp')
+    temporal.write_bytes(contenido)
+    # Las variantes anteriores no deben sobrevivir si la nueva no compensa comprimirla
+    _eliminar(archivo)
+    os.replace(temporal, archivo)
+    list(Compressor(quiet=True).compress(str(archivo)))
+
+
+def publicar_detalle(slug, raiz=None):
+    """Publica (o retira, si ya no responde 200) la página de un producto"""
+    raiz = raiz or raiz_publicacion()
+    relativa = ruta_detalle(slug)
+    contenido = _renderizar(f'/{relativa.parent.as_posix()}/', vista='productos:detalle')
+    if contenido is None:
+        despublicar_detalle(slug, raiz)
+        return False
+    _escribir(raiz, relativa, contenido)
+    return True
+
+
+def despublicar_detalle(slug, raiz=None):
+    raiz = raiz or raiz_publicacion()
+    shutil.rmtree(raiz / ruta_detalle(slug).parent, ignore_errors=True)
+
+
+def publicar_listado(categoria_slug=None, raiz=None):
+    """Publica la primera página del listado global o de una categoría"""
+    raiz = raiz or raiz_publicacion()
+    relativa = ruta_listado(categoria_slug)
+    query = QueryDict(mutable=True)
+    if categoria_slug:
+        query['categoria'] = categoria_slug
+    contenido = _renderizar(_urls()[1], query.urlencode(), vista='productos:api_productos')
+    if contenido is None:
+        _eliminar(raiz / relativa)
+        return False
+    _escribir(raiz, relativa, contenido)
+    return True
+
+
+# ==================== PUBLICACIÓN AL ESCRIBIR ====================
+
+def publicar_cambios(producto_id, slugs=(), categorias=()):
+    """
+    Republica la página del producto y los listados afectados. `slugs` y
+    `categorias` son los valores con los que pudo estar publicado antes del
+    cambio (los aportan las señales): las páginas con un slug que ya no es
+    el vigente se retiran.
+    """
+    card = ProductoCard.objects.filter(producto_id=producto_id).values_list('slug', 'categoria_slug').first()
+    for slug in slugs:
+        if slug and (card is None or slug != card[0]):
+            despublicar_detalle(slug)
+
+    categorias = set(categorias)
+    if card:
+        publicar_detalle(card[0])
+        categorias.add(card[1])
+
+    publicar_listado()
+    for categoria in categorias:
+        if categoria:
+            publicar_listado(categoria)
+
+
+def programar_publicacion(producto_id, slugs=(), categorias=()):
+    """Publica los cambios cuando la transacción se confirme (tras refrescar la tarjeta)"""
+    def publicar():
+        try:
+            publicar_cambios(producto_id, slugs, categorias)
+        except Exception:
+            # La publicación nunca debe romper la escritura: las vistas siguen respondiendo
+            logger.exception(f"No se pudo publicar el producto {producto_id}")
+
+    transaction.on_commit(publicar)
+
+
+def despublicar_todo():
+    """Retira todo lo publicado (las peticiones vuelven a las vistas)"""
+    raiz = raiz_publicacion()
+    if not raiz.exists():
+        return
+    retirada = raiz.with_name(f'.{raiz.name}.{uuid.uuid4().hex}')
+    try:
+        raiz.rename(retirada)
+    except FileNotFoundError:
+        return
+    shutil.rmtree(retirada, ignore_errors=True)
+
+
+# ==================== RECONSTRUCCIÓN COMPLETA ====================
+
+def _publicar_lote(raiz, slugs, categorias):
+    """Tarea de un proceso del pool: publica un lote de páginas"""
+    import django
+    django.setup()
+
+    raiz = Path(raiz)
+    publicados = 0
+    trabajos = [(publicar_detalle, slug) for slug in slugs]
+    trabajos += [(publicar_listado, categoria) for categoria in categorias]
+    for publicar, valor in trabajos:
+        try:
+            publicados += publicar(valor, raiz)
+        except Exception:
+            # Una página que falla se sigue sirviendo desde la vista
+            logger.exception(f"No se pudo publicar {publicar.__name__}({valor!r})")
+    connections.close_all()
+    return publicados
+
+
+def publicar_catalogo(procesos=None, lote=200):
+    """
+    Reconstruye la publicación completa en un directorio nuevo, repartiendo
+    el renderizado entre procesos, y lo intercambia con el actual.
+    Retorna el número de archivos publicados.
+    """
+    raiz = raiz_publicacion()
+    nueva = raiz.with_name(f'.{raiz.name}.nueva.{uuid.uuid4().hex}')
+    nueva.mkdir(parents=True)
+
+    slugs = list(ProductoCard.objects.order_by('producto_id').values_list('slug', flat=True))
+    categorias = sorted(set(
+        ProductoCard.objects.exclude(categoria_slug='').values_list('categoria_slug', flat=True)
+    ))
+
+    tareas = [(slugs[i:i + lote], []) for i in range(0, len(slugs), lote)]
+    tareas.append(([], [None, *categorias]))
+
+    # Los procesos hijos abren sus propias conexiones
+    connections.close_all()
+    try:
+        with ProcessPoolExecutor(max_workers=procesos or os.cpu_count()) as pool:
+            futuros = [pool.submit(_publicar_lote, str(nueva), s, c) for s, c in tareas]
+            total = sum(futuro.result() for futuro in futuros)
+    except BaseException:
+        shutil.rmtree(nueva, ignore_errors=True)
+        raise
+
+    anterior = raiz.with_name(f'.{raiz.name}.anterior.{uuid.uuid4().hex}')
+    if raiz.exists():
+        raiz.rename(anterior)
+    nueva.rename(raiz)
+    shutil.rmtree(anterior, ignore_errors=True)
+    logger.info(f"Catálogo publicado: {total} archivos")
+    return total
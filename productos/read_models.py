@@ -0,0 +1,188 @@
+"""
+Mantenimiento del modelo de lectura `ProductoCard`.
+
+Cada producto activo tiene una fila con las taxonomías ya resueltas, la URL
+de la imagen principal, el resumen de valoraciones, el precio final y los
+badges. Las funciones de este módulo la recalculan a partir de `Producto`
+y son invocadas por las señales y por el comando `reconstruir_tarjetas`.
+"""
+
+import logging
+
+from django.db import transaction
+
+from .facetas import CAMPOS_FACETAS, reconstruir_facetas, registrar_cambio
+from .models import Producto, ProductoCard
+from .normalizacion import texto_busqueda
+from .search import indexar_productos, reconstruir_indice_busqueda
+
+logger = logging.getLogger(__name__)
+
+# Campos que se sobrescriben al refrescar una tarjeta existente
+CAMPOS_TARJETA = [
+    'nombre', 'slug', 'descripcion_corta', 'sku', 'origen', 'texto_busqueda',
+    'categoria_id', 'categoria_nombre', 'categoria_slug',
+    'subcategoria_id', 'subcategoria_nombre', 'subcategoria_slug',
+    'marca_id', 'marca_nombre', 'marca_slug',
+    'proveedor_id', 'proveedor_nombre',
+    'estatus_id', 'estatus_nombre',
+    'precio', 'precio_oferta', 'precio_final', 'tiene_descuento', 'porcentaje_descuento',
+    'stock', 'disponible', 'destacado', 'en_oferta', 'badges',
+    'imagen_url', 'rating_promedio', 'total_valoraciones',
+    'fecha_creacion', 'fecha_actualizacion', 'actualizado',
+]
+
+
+def _url_archivo(archivo):
+    """Retorna la URL de un archivo o cadena vacía si no se puede resolver"""
+    if not archivo:
+        return ''
+    try:
+        return archivo.url
+    except (ValueError, AttributeError):
+        return ''
+
+
+def imagen_principal_url(producto):
+    """
+    Resuelve la URL de la imagen principal usando la galería precargada.
+    Misma prioridad que `Producto.get_main_image`: principal, primera de la
+    galería y, por último, el campo `imagen` del producto.
+    """
+    galeria = list(producto.imagenes_galeria.all())
+    principal = next((img for img in galeria if img.is_main), None)
+    if principal is None and galeria:
+        principal = galeria[0]
+    if principal is not None:
+        url = _url_archivo(principal.image)
+        if url:
+            return url
+    return _url_archivo(producto.imagen)
+
+
+def construir_tarjeta(producto):
+    """
+    Construye (sin guardar) la `ProductoCard` de un producto.
+    Espera el producto con taxonomías y resumen de valoraciones en
+    select_related y la galería en prefetch_related.
+    """
+    categoria = producto.categoria
+    subcategoria = producto.subcategoria
+    marca = producto.marca
+    proveedor = producto.proveedor
+    estatus = producto.estatus
+    resumen = getattr(producto, 'resumen_valoraciones', None)
+
+    return ProductoCard(
+        producto=producto,
+        nombre=producto.nombre,
+        slug=producto.slug,
+        descripcion_corta=producto.descripcion_corta,
+        sku=producto.sku,
+        origen=producto.origen,
+        texto_busqueda=texto_busqueda(
+            producto.nombre, producto.descripcion_corta, producto.descripcion, producto.sku,
+            categoria.nombre if categoria else '',
+            subcategoria.nombre if subcategoria else '',
+            marca.nombre if marca else '',
+        ),
+        categoria_id=categoria.id if categoria else None,
+        categoria_nombre=categoria.nombre if categoria else '',
+        categoria_slug=categoria.slug if categoria else '',
+        subcategoria_id=subcategoria.id if subcategoria else None,
+        subcategoria_nombre=subcategoria.nombre if subcategoria else '',
+        subcategoria_slug=subcategoria.slug if subcategoria else '',
+        marca_id=marca.id if marca else None,
+        marca_nombre=marca.nombre if marca else '',
+        marca_slug=marca.slug if marca else '',
+        proveedor_id=proveedor.id if proveedor else None,
+        proveedor_nombre=proveedor.nombre if proveedor else '',
+        estatus_id=estatus.id if estatus else None,
+        estatus_nombre=estatus.nombre if estatus else '',
+        precio=producto.precio,
+        precio_oferta=producto.precio_oferta,
+        precio_final=producto.precio_final,
+        tiene_descuento=bool(producto.precio and producto.tiene_descuento),
+        porcentaje_descuento=producto.porcentaje_descuento if producto.precio else 0,
+        stock=producto.stock,
+        disponible=producto.disponible,
+        destacado=producto.destacado,
+        en_oferta=producto.en_oferta,
+        badges=producto.get_status_badges(),
+        imagen_url=imagen_principal_url(producto),
+        rating_promedio=resumen.promedio if resumen else 0,
+        total_valoraciones=resumen.total if resumen else 0,
+        fecha_creacion=producto.fecha_creacion,
+        fecha_actualizacion=producto.fecha_actualizacion,
+    )
+
+
+def productos_para_tarjetas():
+    """QuerySet de productos con todo lo necesario para construir tarjetas"""
+    return Producto.objects.select_related(
+        'categoria',
+        'subcategoria',
+        'marca',
+        'proveedor',
+        'estatus',
+        'resumen_valoraciones'
+    ).prefetch_related(
+        'imagenes_galeria'
+    ).order_by()
+
+
+def refrescar_tarjetas(producto_ids):
+    """
+    Recalcula las tarjetas de los productos indicados.
+    Los productos inactivos o inexistentes pierden su tarjeta (los conteos
+    de facetas y el índice de búsqueda de las tarjetas eliminadas los
+    ajusta la señal post_delete).
+    Retorna el número de tarjetas escritas.
+    """
+    producto_ids = {pid for pid in producto_ids if pid}
+    if not producto_ids:
+        return 0
+
+    productos = list(productos_para_tarjetas().filter(id__in=producto_ids, activo=True))
+    tarjetas = [construir_tarjeta(producto) for producto in productos]
+
+    activos = {tarjeta.producto_id for tarjeta in tarjetas}
+    with transaction.atomic():
+        ProductoCard.objects.filter(producto_id__in=producto_ids - activos).delete()
+
+        if tarjetas:
+            anteriores = list(ProductoCard.objects.filter(producto_id__in=activos).only(*CAMPOS_FACETAS))
+            ProductoCard.objects.bulk_create(
+                tarjetas,
+                update_conflicts=True,
+                unique_fields=['producto'],
+                update_fields=CAMPOS_TARJETA,
+            )
+            registrar_cambio(anteriores, tarjetas)
+            indexar_productos(productos)
+    return len(tarjetas)
+
+
+def refrescar_tarjeta(producto_id):
+    """Recalcula la tarjeta de un único producto"""
+    return refrescar_tarjetas([producto_id])
+
+
+def reconstruir_tarjetas(chunk_size=500):
+    """
+    Reconstruye el modelo de lectura completo por lotes.
+    Retorna el número de tarjetas escritas.
+    """
+    ids = list(Producto.objects.filter(activo=True).order_by('id').values_list('id', flat=True))
+    total = 0
+    for inicio in range(0, len(ids), chunk_size):
+        total += refrescar_tarjetas(ids[inicio:inicio + chunk_size])
+
+    # Eliminar tarjetas huérfanas (productos desactivados fuera de las señales)
+    ProductoCard.objects.exclude(producto__activo=True).delete()
+
+    # Recalcular conteos e índice desde cero corrige cualquier deriva acumulada
+    reconstruir_facetas()
+    reconstruir_indice_busqueda()
+    logger.info(f"Tarjetas de producto reconstruidas: {total}")
+    return total
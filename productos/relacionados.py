@@ -0,0 +1,196 @@
+"""
+Productos relacionados precalculados.
+
+La puntuación combina coincidencia de subcategoría, categoría y marca con
+la cercanía de precio. Los candidatos de cada producto se limitan a los
+más cercanos en precio dentro de su categoría y de su marca, de modo que
+el coste por producto es acotado aunque una categoría sea muy grande.
+
+`reconstruir_relacionados` recalcula todo el catálogo (comando programado)
+y `refrescar_relacionados` recalcula, al guardar un producto, su lista y
+las de los productos que lo muestran. Los productos nuevos aparecen en
+listas ajenas tras la siguiente reconstrucción.
+"""
+
+import logging
+from bisect import bisect_left
+from heapq import nlargest
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import ProductoCard, ProductoRelacionado
+
+logger = logging.getLogger(__name__)
+
+# Relaciones guardadas por producto (margen sobre las visibles por si
+# alguna tarjeta deja de estar disponible antes de la siguiente reconstrucción)
+MAX_RELACIONADOS = 12
+RELACIONADOS_VISIBLES = 8
+
+# Candidatos a cada lado en precio dentro de cada grupo (categoría / marca)
+VENTANA_CANDIDATOS = 100
+
+PESO_SUBCATEGORIA = 4.0
+PESO_CATEGORIA = 3.0
+PESO_MARCA = 2.0
+PESO_PRECIO = 2.0
+PESO_DESTACADO = 0.25
+
+_CAMPOS = ('producto_id', 'categoria_id', 'subcategoria_id', 'marca_id', 'precio_final', 'destacado')
+
+
+class _Item:
+    __slots__ = ('id', 'categoria', 'subcategoria', 'marca', 'precio', 'destacado')
+
+    def __init__(self, fila):
+        self.id, self.categoria, self.subcategoria, self.marca, precio, self.destacado = fila
+        self.precio = float(precio) if precio else None
+
+
+class _Grupo:
+    """Items de un grupo ordenados por precio (los que no tienen precio al final)"""
+
+    def __init__(self):
+        self.items = []
+        self.precios = []
+
+    def preparar(self):
+        self.items.sort(key=lambda i: (i.precio is None, i.precio or 0))
+        self.precios = [i.precio for i in self.items if i.precio is not None]
+
+    def cercanos(self, precio):
+        if precio is None or not self.precios:
+            return self.items[:2 * VENTANA_CANDIDATOS]
+        posicion = bisect_left(self.precios, precio)
+        inicio = max(0, posicion - VENTANA_CANDIDATOS)
+        return self.items[inicio:posicion + VENTANA_CANDIDATOS]
+
+
+class _Catalogo:
+    """Items disponibles agrupados por categoría y por marca"""
+
+    def __init__(self, filas):
+        self.items = {}
+        self.categorias = {}
+        self.marcas = {}
+        for fila in filas:
+            item = _Item(fila)
+            self.items[item.id] = item
+            if item.categoria:
+                self.categorias.setdefault(item.categoria, _Grupo()).items.append(item)
+            if item.marca:
+                self.marcas.setdefault(item.marca, _Grupo()).items.append(item)
+        for grupo in (*self.categorias.values(), *self.marcas.values()):
+            grupo.preparar()
+
+    def candidatos(self, item):
+        candidatos = {}
+        for grupos, clave in ((self.categorias, item.categoria), (self.marcas, item.marca)):
+            grupo = grupos.get(clave) if clave else None
+            if grupo is not None:
+                for candidato in grupo.cercanos(item.precio):
+                    candidatos[candidato.id] = candidato
+        candidatos.pop(item.id, None)
+        return candidatos.values()
+
+
+def puntuacion(item, candidato):
+    """Puntuación de relación entre dos productos (mayor = más relacionado)"""
+    puntos = 0.0
+    if item.subcategoria and item.subcategoria == candidato.subcategoria:
+        puntos += PESO_SUBCATEGORIA
+    if item.categoria and item.categoria == candidato.categoria:
+        puntos += PESO_CATEGORIA
+    if item.marca and item.marca == candidato.marca:
+        puntos += PESO_MARCA
+    if item.precio and candidato.precio:
+        diferencia = abs(item.precio - candidato.precio) / max(item.precio, candidato.precio)
+        puntos += PESO_PRECIO * (1 - min(diferencia, 1))
+    if candidato.destacado:
+        puntos += PESO_DESTACADO
+    return puntos
+
+
+def calcular_relacionados(item, catalogo):
+    """Top de relaciones de un item como lista de (puntuación, id)"""
+    return nlargest(
+        MAX_RELACIONADOS,
+        ((puntuacion(item, candidato), candidato.id) for candidato in catalogo.candidatos(item)),
+        key=lambda par: (par[0], -par[1]),
+    )
+
+
+def _guardar(producto_ids, relaciones):
+    """Reemplaza las relaciones de los productos indicados"""
+    with transaction.atomic():
+        ProductoRelacionado.objects.filter(producto_id__in=producto_ids).delete()
+        ProductoRelacionado.objects.bulk_create(relaciones, batch_size=1000)
+
+
+def _relaciones(item, catalogo):
+    return [
+        ProductoRelacionado(producto_id=item.id, relacionado_id=relacionado_id,
+                            puntuacion=puntos, posicion=posicion)
+        for posicion, (puntos, relacionado_id) in enumerate(calcular_relacionados(item, catalogo))
+    ]
+
+
+def reconstruir_relacionados(chunk_size=1000):
+    """Recalcula las relaciones de todo el catálogo. Retorna las relaciones escritas"""
+    filas = ProductoCard.objects.filter(disponible=True).order_by('producto_id').values_list(*_CAMPOS)
+    catalogo = _Catalogo(filas)
+
+    ids = list(catalogo.items)
+    total = 0
+    for inicio in range(0, len(ids), chunk_size):
+        lote = ids[inicio:inicio + chunk_size]
+        relaciones = []
+        for producto_id in lote:
+            relaciones += _relaciones(catalogo.items[producto_id], catalogo)
+        _guardar(lote, relaciones)
+        total += len(relaciones)
+
+    # Productos que ya no están disponibles pierden su lista
+    ProductoRelacionado.objects.exclude(producto_id__in=ProductoCard.objects.filter(disponible=True).values('producto_id')).delete()
+    logger.info(f"Productos relacionados reconstruidos: {total} relaciones para {len(ids)} productos")
+    return total
+
+
+def refrescar_relacionados(producto_id):
+    """
+    Recalcula la lista del producto y las de los productos que lo muestran.
+    Solo carga las tarjetas de las categorías y marcas involucradas.
+    """
+    afectados = {producto_id} | set(
+        ProductoRelacionado.objects.filter(relacionado_id=producto_id).values_list('producto_id', flat=True)
+    )
+    grupos = list(
+        ProductoCard.objects.filter(producto_id__in=afectados, disponible=True).values_list('categoria_id', 'marca_id')
+    )
+    categorias = {categoria for categoria, _ in grupos if categoria}
+    marcas = {marca for _, marca in grupos if marca}
+
+    filas = ProductoCard.objects.filter(
+        Q(producto_id__in=afectados) | Q(categoria_id__in=categorias) | Q(marca_id__in=marcas),
+        disponible=True,
+    ).values_list(*_CAMPOS)
+    catalogo = _Catalogo(filas)
+
+    relaciones = []
+    for afectado in afectados:
+        item = catalogo.items.get(afectado)
+        if item is not None:
+            relaciones += _relaciones(item, catalogo)
+    _guardar(afectados, relaciones)
+    return len(relaciones)
+
+
+def relacionados_de(producto_id, limite=RELACIONADOS_VISIBLES):
+    """Tarjetas relacionadas disponibles, en orden de relevancia (una consulta)"""
+    return list(
+        ProductoCard.objects.filter(
+            relacionado_con__producto_id=producto_id,
+            disponible=True,
+        ).order_by('relacionado_con__posicion')[:limite]
+    )
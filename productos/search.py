@@ -0,0 +1,181 @@
+"""
+Búsqueda de texto completo del catálogo con SQLite FTS5.
+
+La tabla virtual `productos_busqueda` indexa por producto (rowid = id del
+producto) el nombre, las descripciones, el SKU y los nombres de categoría,
+subcategoría y marca. Se mantiene desde `refrescar_tarjetas` y la señal de
+borrado de tarjetas, y las consultas se ordenan con bm25. En backends sin
+FTS5 (o si la tabla no existe) se busca por prefijo en la columna indexada
+`Producto.nombre_normalizado`, como rango para que use el índice B-tree en
+cualquier motor.
+"""
+
+import logging
+import re
+
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Producto
+from .normalizacion import normalizar_texto
+
+logger = logging.getLogger(__name__)
+
+TABLA_FTS = 'productos_busqueda'
+
+# Columnas indexadas y su peso en bm25 (mayor = más relevante)
+COLUMNAS_FTS = (
+    ('nombre', 10.0),
+    ('descripcion_corta', 4.0),
+    ('descripcion', 1.0),
+    ('sku', 8.0),
+    ('categoria', 3.0),
+    ('subcategoria', 3.0),
+    ('marca', 5.0),
+)
+
+# Cota superior del rango de un prefijo (mayor que cualquier carácter)
+FIN_PREFIJO = '\U0010ffff'
+
+_fts_disponible = None
+
+
+def fts_disponible():
+    """Indica si la base de datos tiene la tabla FTS5 (se comprueba una vez por proceso)"""
+    global _fts_disponible
+    if _fts_disponible is None:
+        _fts_disponible = False
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABLA_FTS])
+                _fts_disponible = cursor.fetchone() is not None
+    return _fts_disponible
+
+
+def expresion_fts(texto):
+    """
+    Convierte el texto del usuario en una consulta FTS5 segura: cada palabra
+    como prefijo entre comillas, todas obligatorias. Retorna None si no hay
+    palabras.
+    """
+    palabras = re.findall(r'\w+', normalizar_texto(texto))
+    if not palabras:
+        return None
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+
+# ==================== MANTENIMIENTO ====================
+
+def _fila_indice(producto):
+    return (
+        producto.id,
+        producto.nombre or '',
+        producto.descripcion_corta or '',
+        producto.descripcion or '',
+        producto.sku or '',
+        producto.categoria.nombre if producto.categoria else '',
+        producto.subcategoria.nombre if producto.subcategoria else '',
+        producto.marca.nombre if producto.marca else '',
+    )
+
+
+def indexar_productos(productos):
+    """Reescribe las filas del índice de los productos dados (con taxonomías en select_related)"""
+    if not productos or not fts_disponible():
+        return
+    columnas = ', '.join(nombre for nombre, _ in COLUMNAS_FTS)
+    marcadores = ', '.join(['%s'] * (len(COLUMNAS_FTS) + 1))
+    with connection.cursor() as cursor:
+        desindexar_productos([producto.id for producto in productos], cursor)
+        cursor.executemany(
+            f'INSERT INTO {TABLA_FTS} (rowid, {columnas}) VALUES ({marcadores})',
+            [_fila_indice(producto) for producto in productos],
+        )
+
+
+def desindexar_productos(producto_ids, cursor=None):
+    """Elimina del índice las filas de los productos dados"""
+    producto_ids = list(producto_ids)
+    if not producto_ids or not fts_disponible():
+        return
+    if cursor is None:
+        with connection.cursor() as cursor:
+            return desindexar_productos(producto_ids, cursor)
+    marcadores = ', '.join(['%s'] * len(producto_ids))
+    cursor.execute(f'DELETE FROM {TABLA_FTS} WHERE rowid IN ({marcadores})', producto_ids)
+
+
+def reconstruir_indice_busqueda():
+    """Regenera el índice completo a partir de los productos activos. Retorna las filas indexadas"""
+    if not fts_disponible():
+        return 0
+    columnas = ', '.join(nombre for nombre, _ in COLUMNAS_FTS)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLA_FTS}')
+        cursor.execute(
+            f'INSERT INTO {TABLA_FTS} (rowid, {columnas}) '
+            "SELECT p.id, p.nombre, COALESCE(p.descripcion_corta, ''), COALESCE(p.descripcion, ''), "
+            "COALESCE(p.sku, ''), COALESCE(c.nombre, ''), COALESCE(s.nombre, ''), COALESCE(m.nombre, '') "
+            'FROM productos_producto p '
+            'LEFT JOIN productos_categoria c ON c.id = p.categoria_id '
+            'LEFT JOIN productos_subcategoria s ON s.id = p.subcategoria_id '
+            'LEFT JOIN productos_marca m ON m.id = p.marca_id '
+            'WHERE p.activo'
+        )
+        return cursor.rowcount
+
+
+# ==================== CONSULTAS ====================
+
+def condicion_prefijo(columna, prefijo):
+    """Q de prefijo como rango (>= prefijo y < prefijo + FIN_PREFIJO), que sí usa el índice de la columna"""
+    return Q(**{f'{columna}__gte': prefijo, f'{columna}__lt': prefijo + FIN_PREFIJO})
+
+
+def condicion_nombre(texto, campo='producto_id'):
+    """Q que restringe `campo` a los productos cuyo nombre normalizado empieza por el texto"""
+    prefijo = normalizar_texto(texto)
+    if not prefijo:
+        return Q(pk__in=[])
+    return Q(**{f'{campo}__in': Producto.objects.filter(condicion_prefijo('nombre_normalizado', prefijo)).values('pk')})
+
+
+def condicion_busqueda(texto, campo='producto_id'):
+    """
+    Q que restringe `campo` a los productos que coinciden con la búsqueda:
+    índice FTS5 o, sin él, prefijo del nombre normalizado.
+    """
+    if not fts_disponible():
+        return condicion_nombre(texto, campo)
+    expresion = expresion_fts(texto)
+    if expresion is None:
+        return Q(pk__in=[])
+    return Q(**{f'{campo}__in': RawSQL(f'SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s', [expresion])})
+
+
+def buscar_ids(texto, limite=20):
+    """
+    Ids de productos disponibles que coinciden con la búsqueda, ordenados por
+    relevancia (bm25). Retorna None si FTS no está disponible (el llamador
+    usa `condicion_nombre`).
+    """
+    if not fts_disponible():
+        return None
+    expresion = expresion_fts(texto)
+    if expresion is None:
+        return []
+    pesos = ', '.join(str(peso) for _, peso in COLUMNAS_FTS)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT f.rowid FROM {TABLA_FTS} f '
+                f'JOIN productos_productocard c ON c.producto_id = f.rowid '
+                f'WHERE {TABLA_FTS} MATCH %s AND c.disponible '
+                f'ORDER BY bm25({TABLA_FTS}, {pesos}) LIMIT %s',
+                [expresion, limite],
+            )
+            return [fila[0] for fila in cursor.fetchall()]
+    except DatabaseError:
+        logger.exception('Error en la búsqueda FTS; se usa el prefijo del nombre normalizado')
+        return None
@@ -0,0 +1,154 @@
+"""
+Señales que mantienen sincronizados los modelos de lectura del catálogo
+y la generación usada en las claves de caché.
+
+Los refrescos se difieren con `transaction.on_commit` para no trabajar
+sobre filas que la transacción en curso todavía puede borrar (por ejemplo,
+las imágenes eliminadas en cascada junto con su producto).
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import publicacion
+from .cache_utils import incrementar_version_catalogo, incrementar_version_taxonomias
+from .facetas import registrar_cambio
+from .models import (Categoria, Estatus, Marca, Producto, ProductImage, ProductVideo,
+                     ProductoCard, Proveedor, ResumenValoraciones, Subcategoria,
+                     Valoracion)
+from .read_models import refrescar_tarjeta, refrescar_tarjetas
+from .relacionados import refrescar_relacionados
+from .search import desindexar_productos
+from .taxonomias import registro_taxonomias
+
+
+def _programar_refresco(producto_id):
+    """Refresca la tarjeta del producto cuando la transacción se confirme"""
+    if producto_id:
+        transaction.on_commit(lambda: refrescar_tarjeta(producto_id))
+    _invalidar_catalogo()
+
+
+def _invalidar_catalogo():
+    """Incrementa la generación del catálogo tras confirmar la transacción"""
+    transaction.on_commit(incrementar_version_catalogo)
+
+
+# ==================== PRODUCTOS ====================
+
+@receiver(pre_save, sender=Producto)
+def producto_por_guardar(sender, instance, raw=False, **kwargs):
+    # Slug y categoría con los que está publicado, por si el guardado los cambia
+    if raw or not instance.pk or not publicacion.publicacion_activa():
+        return
+    instance._publicado_como = ProductoCard.objects.filter(
+        producto_id=instance.pk
+    ).values_list('slug', 'categoria_slug').first()
+
+
+@receiver(post_save, sender=Producto)
+def producto_guardado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _programar_refresco(instance.pk)
+    # Después de refrescar la tarjeta (los callbacks se ejecutan en orden)
+    producto_id = instance.pk
+    transaction.on_commit(lambda: refrescar_relacionados(producto_id))
+    if publicacion.publicacion_activa():
+        slug, categoria = getattr(instance, '_publicado_como', None) or ('', '')
+        publicacion.programar_publicacion(producto_id, slugs=[slug, instance.slug], categorias=[categoria])
+
+
+@receiver(post_delete, sender=Producto)
+def producto_eliminado(sender, instance, **kwargs):
+    # La tarjeta se elimina en cascada junto con el producto
+    _invalidar_catalogo()
+    if publicacion.publicacion_activa():
+        categoria = registro_taxonomias().obtener('categoria', instance.categoria_id)
+        publicacion.programar_publicacion(
+            instance.pk, slugs=[instance.slug], categorias=[categoria.slug if categoria else '']
+        )
+
+
+@receiver(post_delete, sender=ProductoCard)
+def tarjeta_eliminada(sender, instance, **kwargs):
+    # Cubre tanto el borrado en cascada del producto como las tarjetas que
+    # `refrescar_tarjetas` retira al desactivar productos
+    registrar_cambio([instance], [])
+    desindexar_productos([instance.producto_id])
+
+
+# ==================== IMÁGENES Y VALORACIONES ====================
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=Valoracion)
+@receiver(post_delete, sender=Valoracion)
+def dependiente_modificado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _programar_refresco(instance.producto_id)
+    if publicacion.publicacion_activa():
+        publicacion.programar_publicacion(instance.producto_id)
+
+
+@receiver(post_save, sender=ProductVideo)
+@receiver(post_delete, sender=ProductVideo)
+def video_modificado(sender, instance, raw=False, **kwargs):
+    # Los videos no forman parte de la tarjeta, pero sí del detalle cacheado
+    if raw:
+        return
+    _invalidar_catalogo()
+    if publicacion.publicacion_activa():
+        publicacion.programar_publicacion(instance.producto_id)
+
+
+@receiver(post_delete, sender=Valoracion)
+def valoracion_eliminada(sender, instance, **kwargs):
+    # Se ejecuta dentro de la transacción del borrado (también en borrados
+    # masivos). Si el producto se está eliminando, su resumen ya no existe
+    # y el UPDATE no afecta filas.
+    ResumenValoraciones.registrar(instance.producto_id, instance.puntuacion, -1, crear=False)
+
+
+# ==================== TAXONOMÍAS ====================
+
+# Campo de ProductoCard que referencia a cada taxonomía
+_CAMPO_TAXONOMIA = {
+    Categoria: 'categoria_id',
+    Subcategoria: 'subcategoria_id',
+    Marca: 'marca_id',
+    Proveedor: 'proveedor_id',
+    Estatus: 'estatus_id',
+}
+
+
+def _taxonomia_modificada(sender, instance, raw=False, **kwargs):
+    """
+    Refresca las tarjetas que muestran la taxonomía modificada e invalida
+    el registro de taxonomías de los workers.
+    Al eliminarla, la FK de los productos pasa a NULL mediante un UPDATE
+    directo (sin señales), por lo que las tarjetas se localizan por el id
+    que todavía conservan.
+    """
+    if raw:
+        return
+    campo = _CAMPO_TAXONOMIA[sender]
+    taxonomia_id = instance.pk
+
+    def refrescar():
+        ids = ProductoCard.objects.filter(**{campo: taxonomia_id}).values_list('producto_id', flat=True)
+        refrescar_tarjetas(list(ids))
+
+    transaction.on_commit(refrescar)
+    transaction.on_commit(incrementar_version_taxonomias)
+    _invalidar_catalogo()
+    if publicacion.publicacion_activa():
+        # Los nombres de taxonomías aparecen en todas las páginas publicadas
+        transaction.on_commit(publicacion.despublicar_todo)
+
+
+for _modelo in _CAMPO_TAXONOMIA:
+    post_save.connect(_taxonomia_modificada, sender=_modelo, dispatch_uid=f'card_{_modelo.__name__}_save')
+    post_delete.connect(_taxonomia_modificada, sender=_modelo, dispatch_uid=f'card_{_modelo.__name__}_delete')
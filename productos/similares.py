@@ -0,0 +1,183 @@
+"""
+Productos similares por contenido (TF-IDF + similitud coseno).
+
+Cada producto disponible se representa como un vector TF-IDF disperso de
+su nombre, descripciones y marca (texto normalizado, con pesos por campo).
+Los vecinos más cercanos se obtienen multiplicando por lotes la matriz
+normalizada por su transpuesta (scipy.sparse) y seleccionando el top-k de
+cada fila con `argpartition`.
+
+El cálculo incremental solo recalcula las filas de los productos cuyas
+tarjetas cambiaron desde la última ejecución (marca de agua); las listas
+de los demás productos se actualizan en la siguiente ejecución completa.
+Requiere numpy y scipy; la lectura (`similares_de`) no los necesita.
+"""
+
+import logging
+import math
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import MarcaDeAgua, ProductoCard, ProductoSimilar
+from .normalizacion import normalizar_texto
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # pragma: no cover - dependencias opcionales
+    np = sparse = None
+
+logger = logging.getLogger(__name__)
+
+CLAVE_MARCA_AGUA = 'productos.similares'
+
+MAX_SIMILARES = 12
+SIMILARES_VISIBLES = 8
+SIMILITUD_MINIMA = 0.05
+# Términos presentes en más de esta fracción del catálogo no discriminan
+FRECUENCIA_DOCUMENTAL_MAXIMA = 0.5
+
+# Repeticiones de cada campo en el documento (peso en la frecuencia del término)
+PESOS_CAMPO = (3, 2, 1, 2)  # nombre, descripcion_corta, descripcion, marca
+
+PALABRAS_VACIAS = frozenset((
+    'de', 'la', 'el', 'en', 'y', 'a', 'los', 'las', 'del', 'un', 'una', 'con', 'por',
+    'para', 'es', 'al', 'lo', 'su', 'sus', 'se', 'que', 'o', 'mas', 'muy', 'sin',
+    'sobre', 'este', 'esta', 'como', 'le', 'les', 'tu', 'mi', 'ya', 'pero',
+))
+
+
+class DependenciasNoDisponibles(RuntimeError):
+    """numpy o scipy no están instalados"""
+
+
+def tokenizar(texto):
+    """Palabras normalizadas de al menos dos caracteres, sin palabras vacías"""
+    return [
+        palabra for palabra in re.findall(r'\w{2,}', normalizar_texto(texto))
+        if palabra not in PALABRAS_VACIAS
+    ]
+
+
+def _documentos():
+    return ProductoCard.objects.filter(disponible=True).order_by('producto_id').values_list(
+        'producto_id', 'nombre', 'descripcion_corta', 'producto__descripcion', 'marca_nombre'
+    ).iterator(chunk_size=2000)
+
+
+def construir_matriz():
+    """
+    Retorna (ids, X): ids de producto ordenados y la matriz TF-IDF dispersa
+    (CSR, filas normalizadas L2) alineada con ellos.
+    """
+    if np is None:
+        raise DependenciasNoDisponibles('El cálculo de similares requiere numpy y scipy')
+
+    vocabulario = {}
+    ids, indptr, indices, valores = [], [0], [], []
+    for producto_id, *campos in _documentos():
+        frecuencias = Counter()
+        for texto, peso in zip(campos, PESOS_CAMPO):
+            for palabra in tokenizar(texto):
+                frecuencias[palabra] += peso
+        for palabra, frecuencia in frecuencias.items():
+            indices.append(vocabulario.setdefault(palabra, len(vocabulario)))
+            valores.append(1 + math.log(frecuencia))  # tf sublineal
+        ids.append(producto_id)
+        indptr.append(len(indices))
+
+    total = len(ids)
+    X = sparse.csr_matrix(
+        (np.array(valores, dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+        shape=(total, max(len(vocabulario), 1)),
+    )
+    if not total:
+        return np.array(ids, dtype=np.int64), X
+
+    # idf suavizado; los términos demasiado frecuentes se descartan
+    df = np.bincount(X.indices, minlength=X.shape[1])
+    idf = np.log((1 + total) / (1 + df)) + 1
+    if total > 2:
+        idf[df > FRECUENCIA_DOCUMENTAL_MAXIMA * total] = 0
+    X = sparse.csr_matrix(X.multiply(idf.astype(np.float32)))
+    X.eliminate_zeros()
+
+    normas = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    normas[normas == 0] = 1
+    X = sparse.csr_matrix(sparse.diags(1 / normas) @ X)
+    return np.array(ids, dtype=np.int64), X
+
+
+def vecinos(X, filas, k=MAX_SIMILARES):
+    """Genera (fila, [(similitud, columna), ...]) con el top-k de cada fila"""
+    S = (X[filas] @ X.T).tocsr()
+    for local, fila in enumerate(filas):
+        inicio, fin = S.indptr[local], S.indptr[local + 1]
+        columnas = S.indices[inicio:fin]
+        similitudes = S.data[inicio:fin]
+        validos = (columnas != fila) & (similitudes >= SIMILITUD_MINIMA)
+        columnas, similitudes = columnas[validos], similitudes[validos]
+        if len(similitudes) > k:
+            top = np.argpartition(-similitudes, k)[:k]
+            columnas, similitudes = columnas[top], similitudes[top]
+        orden = np.lexsort((columnas, -similitudes))
+        yield fila, [(float(similitudes[i]), int(columnas[i])) for i in orden]
+
+
+def calcular_similares(completo=False, batch_size=500, progreso=None):
+    """
+    Calcula y guarda los similares. Sin `completo`, solo los productos con
+    tarjeta actualizada desde la última ejecución. Retorna (productos, relaciones).
+    """
+    inicio = timezone.now()
+    marca_agua = None if completo else MarcaDeAgua.obtener(CLAVE_MARCA_AGUA)
+    ids, X = construir_matriz()
+
+    if marca_agua is None:
+        filas = np.arange(len(ids))
+    else:
+        cambiados = ProductoCard.objects.filter(disponible=True, actualizado__gt=marca_agua).values_list('producto_id', flat=True)
+        cambiados = np.array(sorted(cambiados), dtype=np.int64)
+        filas = np.searchsorted(ids, cambiados)
+        # Descartar productos que aparecieron después de construir la matriz
+        validos = filas < len(ids)
+        filas = filas[validos][ids[filas[validos]] == cambiados[validos]]
+
+    relaciones_totales = 0
+    for desde in range(0, len(filas), batch_size):
+        lote = filas[desde:desde + batch_size]
+        relaciones = [
+            ProductoSimilar(producto_id=int(ids[fila]), similar_id=int(ids[columna]),
+                            puntuacion=similitud, posicion=posicion)
+            for fila, lista in vecinos(X, lote)
+            for posicion, (similitud, columna) in enumerate(lista)
+        ]
+        with transaction.atomic():
+            ProductoSimilar.objects.filter(producto_id__in=[int(ids[f]) for f in lote]).delete()
+            ProductoSimilar.objects.bulk_create(relaciones, batch_size=1000)
+        relaciones_totales += len(relaciones)
+        if progreso:
+            progreso(min(desde + batch_size, len(filas)), len(filas))
+
+    if marca_agua is None:
+        # Productos que ya no están disponibles pierden su lista
+        ProductoSimilar.objects.exclude(
+            producto_id__in=ProductoCard.objects.filter(disponible=True).values('producto_id')
+        ).delete()
+
+    MarcaDeAgua.guardar(CLAVE_MARCA_AGUA, inicio)
+    logger.info(f"Similares calculados: {len(filas)} productos, {relaciones_totales} relaciones")
+    return len(filas), relaciones_totales
+
+
+def similares_de(producto_id, limite=SIMILARES_VISIBLES):
+    """Tarjetas similares disponibles, de mayor a menor similitud (una consulta)"""
+    return list(
+        ProductoCard.objects.filter(
+            similar_a__producto_id=producto_id,
+            disponible=True,
+        ).order_by('similar_a__posicion')[:limite]
+    )
@@ -0,0 +1,276 @@
+"""
+Snapshot columnar del catálogo en memoria (uno por proceso/worker).
+
+Guarda en arrays de NumPy las columnas de `ProductoCard` necesarias para
+filtrar y ordenar el listado público: ids, ids de taxonomías, precio,
+banderas, fecha de creación y el rango alfabético del nombre. La API de
+productos resuelve filtros, orden y paginación con máscaras y `lexsort`,
+y solo consulta la base de datos para cargar las tarjetas de la página.
+
+El snapshot es inmutable y se reconstruye de forma perezosa cuando cambia
+la generación del catálogo. NumPy es opcional: sin él (o si el catálogo
+supera `CATALOGO_SNAPSHOT_MAX_PRODUCTOS`) las vistas siguen usando SQL.
+"""
+
+import logging
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+from .cache_utils import obtener_version_catalogo
+from .models import ProductoCard
+from .paginacion import decodificar_cursor, nombre_orden
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dependencia opcional
+    np = None
+
+logger = logging.getLogger(__name__)
+
+_SIN_VALOR = -1
+
+# Columnas leídas de ProductoCard (en este orden)
+_COLUMNAS = (
+    'producto_id', 'categoria_slug', 'subcategoria_slug', 'marca_id', 'proveedor_id',
+    'estatus_id', 'destacado', 'en_oferta', 'precio', 'nombre', 'fecha_creacion',
+)
+
+# Filtros por id numérico (parámetro -> columna)
+_FILTROS_ID = ('marca', 'proveedor', 'estatus')
+
+
+class SnapshotCatalogo:
+    """Columnas inmutables de las tarjetas disponibles en una generación dada"""
+
+    def __init__(self, version, filas):
+        self.version = version
+        self.creado = time.time()
+        columnas = list(zip(*filas)) if filas else [()] * len(_COLUMNAS)
+        (ids, categorias, subcategorias, marcas, proveedores, estatus,
+         destacados, ofertas, precios, nombres, fechas) = columnas
+
+        self.ids = np.array(ids, dtype=np.int64)
+        self.categorias, self.categoria_codigo = self._internar(categorias)
+        self.subcategorias, self.subcategoria_codigo = self._internar(subcategorias)
+        self.marca = self._enteros(marcas)
+        self.proveedor = self._enteros(proveedores)
+        self.estatus = self._enteros(estatus)
+        self.destacado = np.array(destacados, dtype=bool)
+        self.en_oferta = np.array(ofertas, dtype=bool)
+        self.precio = np.array([np.nan if p is None else float(p) for p in precios], dtype=np.float64)
+        self.fecha = np.array([int(f.timestamp() * 1_000_000) for f in fechas], dtype=np.int64)
+
+        # Rango del nombre en orden de código (igual que la intercalación BINARY de SQLite)
+        orden_nombres = sorted(range(len(nombres)), key=nombres.__getitem__)
+        self.nombre_rango = np.empty(len(nombres), dtype=np.int64)
+        rango = -1
+        anterior = None
+        for posicion, indice in enumerate(orden_nombres):
+            if posicion == 0 or nombres[indice] != anterior:
+                rango = posicion
+                anterior = nombres[indice]
+            self.nombre_rango[indice] = rango
+
+        self._ordenes = {}
+
+    @staticmethod
+    def _internar(valores):
+        """Convierte cadenas en códigos enteros. Retorna (dict valor->código, array)"""
+        codigos = {}
+        array = np.empty(len(valores), dtype=np.int32)
+        for i, valor in enumerate(valores):
+            if not valor:
+                array[i] = _SIN_VALOR
+                continue
+            array[i] = codigos.setdefault(sys.intern(valor), len(codigos))
+        return codigos, array
+
+    @staticmethod
+    def _enteros(valores):
+        return np.array([_SIN_VALOR if v is None else v for v in valores], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        """Memoria aproximada ocupada por las columnas"""
+        arrays = (self.ids, self.categoria_codigo, self.subcategoria_codigo, self.marca,
+                  self.proveedor, self.estatus, self.destacado, self.en_oferta, self.precio,
+                  self.fecha, self.nombre_rango)
+        return sum(a.nbytes for a in arrays) + sum(o.nbytes for o in self._ordenes.values())
+
+    # ==================== FILTRADO Y ORDEN ====================
+
+    def mascara(self, params):
+        """
+        Máscara booleana de los filtros de `filtrar_cards`.
+        Retorna None si algún filtro no puede resolverse en memoria.
+        """
+        if params.get('q'):
+            return None
+        mascara = np.ones(len(self), dtype=bool)
+
+        for parametro, codigos, columna in (
+            ('categoria', self.categorias, self.categoria_codigo),
+            ('subcategoria', self.subcategorias, self.subcategoria_codigo),
+        ):
+            valor = params.get(parametro)
+            if valor:
+                codigo = codigos.get(valor)
+                if codigo is None:
+                    return np.zeros(len(self), dtype=bool)
+                mascara &= columna == codigo
+
+        for parametro in _FILTROS_ID:
+            valor = params.get(parametro)
+            if valor:
+                try:
+                    valor = int(valor)
+                except ValueError:
+                    return None
+                mascara &= getattr(self, parametro) == valor
+
+        if params.get('destacado') == 'true':
+            mascara &= self.destacado
+        if params.get('en_oferta') == 'true':
+            mascara &= self.en_oferta
+        return mascara
+
+    def _permutacion(self, orden):
+        """Índices de todas las filas en el orden pedido (memorizado por snapshot)"""
+        orden = nombre_orden(orden)
+        permutacion = self._ordenes.get(orden)
+        if permutacion is not None:
+            return permutacion
+
+        # np.lexsort usa la última clave como primaria; los NaN quedan al final
+        claves = {
+            'precio_asc': (self.ids, self.precio),
+            'precio_desc': (-self.ids, -self.precio),
+            'nombre_asc': (self.ids, self.nombre_rango),
+            'nombre_desc': (-self.ids, -self.nombre_rango),
+            'recientes': (-self.ids, -self.fecha),
+            'antiguos': (self.ids, self.fecha),
+        }.get(orden)
+        if claves is None:
+            claves = (-self.ids, -self.fecha, ~self.en_oferta, ~self.destacado)
+        permutacion = np.lexsort(claves)
+        self._ordenes[orden] = permutacion
+        return permutacion
+
+    def ids_ordenados(self, params, orden):
+        """Ids de producto filtrados y ordenados, o None si hay que usar SQL"""
+        mascara = self.mascara(params)
+        if mascara is None:
+            return None
+        permutacion = self._permutacion(orden)
+        return self.ids[permutacion[mascara[permutacion]]]
+
+    def estadisticas(self):
+        return {
+            'version': self.version,
+            'productos': len(self),
+            'bytes': self.nbytes,
+            'ordenes_memorizados': sorted(self._ordenes),
+            'categorias': len(self.categorias),
+            'subcategorias': len(self.subcategorias),
+            'edad_segundos': round(time.time() - self.creado, 1),
+        }
+
+
+# ==================== PAGINACIÓN ====================
+
+def posicion_cursor(ids, cursor, orden):
+    """
+    Índice del primer elemento posterior al cursor dentro de `ids`.
+    Todos los ordenamientos terminan en producto_id, así que basta con
+    localizar ese id. Retorna None si el producto ya no está en el listado.
+    """
+    producto_id = decodificar_cursor(cursor, orden)[-1]
+    encontrados = np.flatnonzero(ids == producto_id)
+    if not len(encontrados):
+        return None
+    return int(encontrados[0]) + 1
+
+
+def cargar_tarjetas(ids):
+    """Carga las tarjetas de los ids indicados conservando su orden (una consulta)"""
+    ids = [int(pid) for pid in ids]
+    tarjetas = ProductoCard.objects.in_bulk(ids)
+    return [tarjetas[pid] for pid in ids if pid in tarjetas]
+
+
+# ==================== SNAPSHOT POR PROCESO ====================
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def snapshot_habilitado():
+    return np is not None and getattr(settings, 'CATALOGO_SNAPSHOT_ENABLED', True)
+
+
+def construir_snapshot(version):
+    """Construye un snapshot o retorna None si el catálogo excede el límite"""
+    limite = getattr(settings, 'CATALOGO_SNAPSHOT_MAX_PRODUCTOS', 200000)
+    cards = ProductoCard.objects.filter(disponible=True).order_by().values_list(*_COLUMNAS)
+    filas = list(cards[:limite + 1])
+    if len(filas) > limite:
+        logger.warning(f"Snapshot del catálogo deshabilitado: más de {limite} productos")
+        return None
+    return SnapshotCatalogo(version, filas)
+
+
+def obtener_snapshot():
+    """
+    Retorna el snapshot de la generación actual (reconstruyéndolo si cambió)
+    o None si no puede usarse.
+    """
+    global _snapshot
+    if not snapshot_habilitado():
+        return None
+
+    version = obtener_version_catalogo()
+    actual = _snapshot
+    if actual is not None and actual.version == version:
+        return actual
+
+    with _lock:
+        actual = _snapshot
+        if actual is None or actual.version != version:
+            # La versión se lee antes de cargar los datos: si cambia mientras
+            # tanto, la siguiente petición vuelve a reconstruir
+            actual = construir_snapshot(version)
+            _snapshot = actual if actual is not None else _SnapshotVacio(version)
+            if actual is not None:
+                logger.info(f"Snapshot del catálogo v{version}: {len(actual)} productos, {actual.nbytes} bytes")
+        actual = _snapshot
+    return actual if isinstance(actual, SnapshotCatalogo) else None
+
+
+class _SnapshotVacio:
+    """Marca una generación en la que el snapshot no se usa (catálogo demasiado grande)"""
+
+    def __init__(self, version):
+        self.version = version
+
+
+def estado_snapshot():
+    """Información de diagnóstico del snapshot del proceso actual"""
+    actual = _snapshot
+    estado = {
+        'numpy': np is not None,
+        'habilitado': snapshot_habilitado(),
+        'limite_productos': getattr(settings, 'CATALOGO_SNAPSHOT_MAX_PRODUCTOS', 200000),
+        'version_catalogo': obtener_version_catalogo(),
+        'snapshot': None,
+    }
+    if isinstance(actual, SnapshotCatalogo):
+        estado['snapshot'] = actual.estadisticas()
+    elif actual is not None:
+        estado['snapshot'] = {'version': actual.version, 'excede_limite': True}
+    return estado
@@ -0,0 +1,201 @@
+"""
+Autocompletado del buscador con un árbol de prefijos en memoria.
+
+Cada worker mantiene un trie de nombres de producto, SKUs, marcas y
+categorías. Cada nodo guarda sus mejores `TOP_K` sugerencias ordenadas por
+popularidad, de modo que responder a un prefijo es recorrer tantos nodos
+como caracteres tenga la consulta, sin acceder a la base de datos.
+
+Cuando cambia la generación del catálogo solo se leen las tarjetas
+actualizadas desde la última carga (y la lista de ids disponibles para
+detectar bajas) y el trie se regenera a partir de esas entradas en un hilo
+de fondo. Las peticiones siguen respondiendo con el trie anterior hasta que
+el nuevo lo sustituye; los cambios de generación que llegan durante la
+construcción se agrupan en una sola pasada más. Recién arrancado el worker
+no hay trie anterior y las sugerencias salen vacías hasta la primera carga.
+"""
+
+import logging
+import threading
+
+from django.db import connections
+from django.urls import reverse
+
+from .cache_utils import obtener_version_catalogo
+from .models import ProductoCard
+from .normalizacion import normalizar_texto
+
+logger = logging.getLogger(__name__)
+
+TOP_K = 10
+# Longitud máxima indexada por sufijo (acota la memoria del árbol)
+PROFUNDIDAD_MAXIMA = 40
+
+_CAMPOS_ENTRADA = (
+    'producto_id', 'nombre', 'slug', 'sku', 'marca_id', 'marca_nombre',
+    'categoria_nombre', 'categoria_slug', 'destacado', 'en_oferta',
+    'rating_promedio', 'total_valoraciones', 'actualizado',
+)
+
+
+class _Nodo:
+    __slots__ = ('hijos', 'top')
+
+    def __init__(self):
+        self.hijos = {}
+        self.top = []
+
+
+class TrieSugerencias:
+    """Trie inmutable con top-k por nodo construido a partir de sugerencias"""
+
+    def __init__(self, sugerencias):
+        # Insertar en orden de peso descendente deja cada top-k ya ordenado
+        self.sugerencias = sorted(sugerencias, key=lambda s: -s['peso'])
+        self.raiz = _Nodo()
+        self.nodos = 1
+        for indice, sugerencia in enumerate(self.sugerencias):
+            texto = normalizar_texto(sugerencia['texto'])
+            # Indexar desde el inicio de cada palabra
+            for inicio, caracter in enumerate(texto):
+                if inicio == 0 or (not texto[inicio - 1].isalnum() and caracter.isalnum()):
+                    self._insertar(texto[inicio:inicio + PROFUNDIDAD_MAXIMA], indice)
+
+    def _insertar(self, clave, indice):
+        nodo = self.raiz
+        for caracter in clave:
+            hijo = nodo.hijos.get(caracter)
+            if hijo is None:
+                hijo = nodo.hijos[caracter] = _Nodo()
+                self.nodos += 1
+            nodo = hijo
+            top = nodo.top
+            if len(top) < TOP_K and (not top or top[-1] != indice):
+                top.append(indice)
+
+    def buscar(self, prefijo, limite=TOP_K):
+        nodo = self.raiz
+        for caracter in normalizar_texto(prefijo)[:PROFUNDIDAD_MAXIMA]:
+            nodo = nodo.hijos.get(caracter)
+            if nodo is None:
+                return []
+        return [self.sugerencias[i] for i in nodo.top[:limite]]
+
+
+# ==================== ENTRADAS ====================
+
+def _peso_producto(fila):
+    """Popularidad: valoraciones ponderadas por rating, más destacados y ofertas"""
+    peso = 1 + fila['total_valoraciones'] * (fila['rating_promedio'] or 0) / 5
+    if fila['destacado']:
+        peso += 5
+    if fila['en_oferta']:
+        peso += 2
+    return peso
+
+
+def construir_sugerencias(entradas):
+    """Genera las sugerencias (productos, SKUs, marcas y categorías) desde las entradas"""
+    sugerencias = []
+    marcas = {}
+    categorias = {}
+    for fila in entradas.values():
+        peso = _peso_producto(fila)
+        url = reverse('productos:detalle', args=[fila['slug']])
+        sugerencias.append({'texto': fila['nombre'], 'tipo': 'producto', 'url': url, 'peso': peso})
+        if fila['sku']:
+            sugerencias.append({'texto': fila['sku'], 'tipo': 'sku', 'url': url, 'peso': peso})
+        if fila['marca_nombre']:
+            marca = marcas.setdefault(fila['marca_id'], [fila['marca_nombre'], 0])
+            marca[1] += peso
+        if fila['categoria_slug']:
+            categoria = categorias.setdefault(fila['categoria_slug'], [fila['categoria_nombre'], 0])
+            categoria[1] += peso
+
+    url_catalogo = reverse('productos:index')
+    # Las taxonomías agrupan varios productos: su peso es la suma
+    for marca_id, (nombre, peso) in marcas.items():
+        sugerencias.append({'texto': nombre, 'tipo': 'marca', 'url': f'{url_catalogo}?marca={marca_id}', 'peso': peso})
+    for slug, (nombre, peso) in categorias.items():
+        sugerencias.append({'texto': nombre, 'tipo': 'categoria', 'url': f'{url_catalogo}?categoria={slug}', 'peso': peso})
+    return sugerencias
+
+
+# ==================== ÍNDICE POR PROCESO ====================
+
+class _Indice:
+    def __init__(self):
+        self.version = None
+        self.marca_agua = None
+        self.entradas = {}
+        self.trie = TrieSugerencias([])
+        self.construyendo = False
+
+
+_indice = _Indice()
+_lock = threading.Lock()
+
+
+def _actualizar(indice, version):
+    """
+    Aplica los cambios desde la última carga y sustituye el trie. Solo la
+    llama el hilo de construcción: los lectores únicamente ven `indice.trie`,
+    que se reemplaza de una vez.
+    """
+    disponibles = ProductoCard.objects.filter(disponible=True)
+    cambiadas = disponibles
+    if indice.marca_agua is not None:
+        cambiadas = cambiadas.filter(actualizado__gte=indice.marca_agua)
+        ids = set(disponibles.values_list('producto_id', flat=True))
+        for producto_id in set(indice.entradas) - ids:
+            del indice.entradas[producto_id]
+
+    for fila in cambiadas.order_by().values(*_CAMPOS_ENTRADA):
+        indice.entradas[fila['producto_id']] = fila
+        if indice.marca_agua is None or fila['actualizado'] > indice.marca_agua:
+            indice.marca_agua = fila['actualizado']
+
+    indice.trie = TrieSugerencias(construir_sugerencias(indice.entradas))
+    indice.version = version
+    logger.info(f"Índice de sugerencias v{version}: {len(indice.entradas)} productos, {indice.trie.nodos} nodos")
+
+
+def _construir(version):
+    """Hilo de fondo: actualiza el trie hasta alcanzar la generación vigente"""
+    try:
+        while True:
+            _actualizar(_indice, version)
+            vigente = obtener_version_catalogo()
+            if vigente == version:
+                break
+            version = vigente
+    except Exception:
+        logger.exception('No se pudo actualizar el índice de sugerencias')
+    finally:
+        # El hilo abrió su propia conexión
+        connections.close_all()
+        with _lock:
+            _indice.construyendo = False
+
+
+def obtener_trie():
+    """
+    Retorna el trie disponible sin esperar: si la generación del catálogo
+    cambió, lanza su actualización en segundo plano (una a la vez).
+    """
+    version = obtener_version_catalogo()
+    if _indice.version != version and not _indice.construyendo:
+        with _lock:
+            if _indice.version != version and not _indice.construyendo:
+                _indice.construyendo = True
+                threading.Thread(target=_construir, args=(version,), daemon=True,
+                                 name='sugerencias').start()
+    return _indice.trie
+
+
+def sugerir(prefijo, limite=TOP_K):
+    """Sugerencias para el prefijo (sin campos internos)"""
+    return [
+        {'texto': s['texto'], 'tipo': s['tipo'], 'url': s['url']}
+        for s in obtener_trie().buscar(prefijo, limite)
+    ]
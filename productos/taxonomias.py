@@ -0,0 +1,102 @@
+"""
+Registro en memoria de las taxonomías del catálogo.
+
+Categorías, subcategorías, marcas, proveedores y estatus cambian muy poco y
+se consultan en casi todas las páginas (menú de navegación, filtros del
+catálogo, formularios del panel). Cada worker las carga completas en una
+sola pasada y las indexa por id, slug y nombre normalizado.
+
+El registro se invalida con una generación compartida en la caché (ver
+`cache_utils.incrementar_version_taxonomias`) que las señales incrementan
+al guardar o eliminar cualquier taxonomía: el siguiente acceso de cada
+worker detecta el cambio y recarga.
+
+Los objetos del registro son compartidos entre peticiones y no deben
+modificarse; `anotar_conteos` trabaja sobre copias.
+"""
+
+import threading
+
+from .cache_utils import obtener_version_taxonomias
+from .models import Categoria, Estatus, Marca, Proveedor, Subcategoria
+
+MODELOS_TAXONOMIA = {
+    'categoria': Categoria,
+    'subcategoria': Subcategoria,
+    'marca': Marca,
+    'proveedor': Proveedor,
+    'estatus': Estatus,
+}
+
+
+class RegistroTaxonomias:
+    """Instantánea de las cinco taxonomías indexada por id, slug y nombre"""
+
+    def __init__(self, version, objetos):
+        self.version = version
+        self.por_id = {}
+        self.por_slug = {}
+        self.por_nombre = {}
+        for faceta, lista in objetos.items():
+            self.por_id[faceta] = {objeto.pk: objeto for objeto in lista}
+            self.por_slug[faceta] = {objeto.slug: objeto for objeto in lista if objeto.slug}
+            self.por_nombre[faceta] = {
+                objeto.nombre_normalizado: objeto for objeto in lista if objeto.nombre_normalizado
+            }
+        self._activos = {
+            faceta: sorted((o for o in lista if o.activo), key=lambda o: o.nombre)
+            for faceta, lista in objetos.items()
+        }
+
+    @classmethod
+    def cargar(cls, version):
+        """Carga todas las taxonomías (las subcategorías llegan con el prefetch de sus categorías)"""
+        categorias = list(Categoria.objects.prefetch_related('subcategorias'))
+        subcategorias = []
+        for categoria in categorias:
+            for subcategoria in categoria.subcategorias.all():
+                # Evita una consulta al acceder a subcategoria.categoria
+                subcategoria.categoria = categoria
+                subcategorias.append(subcategoria)
+        return cls(version, {
+            'categoria': categorias,
+            'subcategoria': subcategorias,
+            'marca': list(Marca.objects.all()),
+            'proveedor': list(Proveedor.objects.all()),
+            'estatus': list(Estatus.objects.all()),
+        })
+
+    def obtener(self, faceta, pk):
+        """Objeto por id (acepta el id como texto, tal como llega en formularios y conteos)"""
+        try:
+            return self.por_id[faceta].get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    def obtener_por_slug(self, faceta, slug):
+        return self.por_slug[faceta].get(slug)
+
+    def obtener_por_nombre(self, faceta, nombre_normalizado):
+        return self.por_nombre[faceta].get(nombre_normalizado)
+
+    def activos(self, faceta):
+        """Objetos activos ordenados por nombre"""
+        return self._activos[faceta]
+
+
+_registro = None
+_candado = threading.Lock()
+
+
+def registro_taxonomias():
+    """Registro vigente del worker; se recarga si la generación compartida cambió"""
+    global _registro
+    version = obtener_version_taxonomias()
+    registro = _registro
+    if registro is not None and registro.version == version:
+        return registro
+
+    with _candado:
+        if _registro is None or _registro.version != version:
+            _registro = RegistroTaxonomias.cargar(version)
+        return _registro
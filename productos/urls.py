@@ -16,6 +16,7 @@ urlpatterns = [
     path('admin/editar/<int:producto_id>/', views.editar_producto, name='editar_producto'),
     path('admin/eliminar/<int:producto_id>/', views.eliminar_producto, name='eliminar_producto'),
     path('admin/toggle-status/<int:producto_id>/', views.toggle_producto_status, name='toggle_producto_status'),
+    path('admin/operaciones/', views.operacion_masiva_productos, name='operacion_masiva_productos'),
     
     # URLs de Taxonomías
     path('admin/taxonomias/', views.admin_taxonomias, name='admin_taxonomias'),
@@ -31,7 +32,12 @@ urlpatterns = [
     
     # APIs
     path('api/productos/', views.get_productos_json, name='api_productos'),
+    path('api/productos/html/', views.productos_fragmento, name='api_productos_html'),
+    path('api/facetas/', views.get_facetas_json, name='api_facetas'),
+    path('api/debug/snapshot/', views.snapshot_catalogo_debug, name='snapshot_catalogo_debug'),
+    path('api/sugerencias/', views.get_sugerencias_json, name='api_sugerencias'),
     path('api/buscar/', views.buscar_productos, name='buscar_productos'),
+    path('api/exportar/', views.exportar_catalogo, name='exportar_catalogo'),
     path('<slug:slug>/json/', views.get_producto_detalle_json, name='detalle_json'),
     path('<slug:slug>/', views.detalle, name='detalle'),
 ]
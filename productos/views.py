@@ -1,16 +1,44 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.http import (Http404, HttpResponse, HttpResponseBadRequest, JsonResponse,
+                         StreamingHttpResponse)
+from django.core.cache import cache
+from django.template.loader import render_to_string
 from django.contrib import messages
-from django.db.models import Q, Avg, Count
-from django.views.decorators.http import require_POST
+from django.db.models import Count
+from django.views.decorators.http import condition, require_POST
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
+from django.conf import settings
+from django.utils import timezone
 from functools import wraps
+import hashlib
+import hmac
 import json
-from .models import (Producto, Categoria, Subcategoria, Marca, Proveedor, 
-                     Estatus, ProductImage, ProductVideo)
+from .models import (Producto, Categoria, Subcategoria, ProductImage, ProductVideo,
+                     ProductoCard, ResumenValoraciones, StockInsuficiente)
+from .cache_utils import (clave_catalogo, clave_peticion, obtener_modificacion_catalogo,
+                          obtener_version_catalogo, respuesta_cacheada)
+from .exportacion import FORMATOS, ExportacionInvalida, exportar
+from .facetas import (FACETA_TOTAL, FACETAS_TAXONOMIA, VALOR_TOTAL, categorias_con_conteos,
+                      conteos_en_vivo, conteos_precalculados, seleccion_faceta)
+from .filtros import clave_filtros, filtrar_cards, parametros_filtro
+from .imagenes import con_estado, estado_imagen_principal
+from .operaciones import OperacionInvalida, aplicar_operacion
+from .paginacion import (PRODUCTOS_POR_PAGINA, CursorInvalido, codificar_cursor,
+                         ordenar, pagina_por_cursor)
+from .relacionados import relacionados_de
+from .search import buscar_ids, condicion_nombre
+from .similares import similares_de
+from .sugerencias import sugerir
+from .taxonomias import registro_taxonomias
+from .snapshot import cargar_tarjetas, estado_snapshot, obtener_snapshot, posicion_cursor
+
+
+# Segundos que se conserva un fragmento del catálogo (además de invalidarse
+# con cada cambio de generación)
+FRAGMENTO_CATALOGO_TIMEOUT = 60 * 15
 
 
 # ==================== DECORADORES DE AUTENTICACIÓN ====================
@@ -35,6 +63,25 @@ def admin_required(view_func):
     return wrapper
 
 
+def exportacion_autorizada(view_func):
+    """
+    Decorador para la exportación: permite superusuarios con sesión o socios
+    que envían `Authorization: Bearer <EXPORTACION_TOKEN>`. Sin token
+    configurado solo entran los superusuarios.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.user.is_authenticated and request.user.is_superuser:
+            return view_func(request, *args, **kwargs)
+        
+        esperado = settings.EXPORTACION_TOKEN
+        tipo, _, token = request.headers.get('Authorization', '').partition(' ')
+        if esperado and tipo.lower() == 'bearer' and hmac.compare_digest(token.strip(), esperado):
+            return view_func(request, *args, **kwargs)
+        return JsonResponse({'error': 'No autorizado'}, status=401 if not token else 403)
+    return wrapper
+
+
 # ==================== VISTAS DE AUTENTICACIÓN ====================
 
 def admin_login(request):
@@ -82,6 +129,63 @@ def admin_logout(request):
     return redirect('home')
 
 
+# ==================== GET CONDICIONAL ====================
+# Validadores calculados antes de ejecutar la vista: si el cliente ya tiene
+# la versión vigente se responde 304 sin serializar ni renderizar nada.
+
+def _etag(*partes):
+    return hashlib.md5('|'.join(str(p) for p in partes).encode('utf-8')).hexdigest()
+
+
+def _etag_listado(request, *args, **kwargs):
+    """Generación del catálogo + filtros canónicos (sin consultas)"""
+    return _etag('listado', obtener_version_catalogo(), clave_peticion(request))
+
+
+def _modificacion_listado(request, *args, **kwargs):
+    return obtener_modificacion_catalogo()
+
+
+def _fecha_producto(request, slug):
+    """fecha_actualizacion del producto (una consulta por petición)"""
+    if not hasattr(request, '_fecha_producto'):
+        request._fecha_producto = Producto.objects.filter(
+            slug=slug, activo=True
+        ).values_list('fecha_actualizacion', flat=True).first()
+    return request._fecha_producto
+
+
+def _etag_detalle_json(request, slug):
+    fecha = _fecha_producto(request, slug)
+    if fecha is None:
+        return None
+    # Incluye la generación: valoraciones, galería y relacionados no tocan la fecha del producto
+    return _etag('detalle-json', slug, fecha.isoformat(), obtener_version_catalogo())
+
+
+def _etag_detalle(request, slug):
+    # La página incluye el estado de sesión: solo se valida para anónimos
+    if request.user.is_authenticated:
+        return None
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return _etag_detalle_json(request, slug)
+    fecha = _fecha_producto(request, slug)
+    if fecha is None:
+        return None
+    return _etag('detalle-html', slug, fecha.isoformat(), obtener_version_catalogo())
+
+
+def _modificacion_detalle_json(request, slug):
+    fechas = [f for f in (_fecha_producto(request, slug), obtener_modificacion_catalogo()) if f]
+    return max(fechas) if fechas else None
+
+
+def _modificacion_detalle(request, slug):
+    if request.user.is_authenticated:
+        return None
+    return _modificacion_detalle_json(request, slug)
+
+
 # ==================== VISTAS PÚBLICAS ====================
 
 def index(request):
@@ -91,32 +195,24 @@ def index(request):
         return get_productos_json(request)
     
     # Si es petición normal, devolver template
-    categorias = Categoria.objects.filter(activo=True)
-    subcategorias = Subcategoria.objects.filter(activo=True).select_related('categoria')
-    marcas = Marca.objects.filter(activo=True)
-    proveedores = Proveedor.objects.filter(activo=True)
-    estatus_list = Estatus.objects.filter(activo=True)
-    
-    # Obtener todos los productos activos y disponibles con optimización
-    productos = Producto.objects.filter(
-        activo=True, 
-        disponible=True
-    ).select_related(
-        'categoria', 
-        'subcategoria', 
-        'marca', 
-        'proveedor', 
-        'estatus'
-    ).prefetch_related(
-        'imagenes_galeria',
-        'valoraciones'
-    ).order_by('-destacado', '-en_oferta', '-fecha_creacion')
+    # Conteos de productos por categoría/subcategoría (precalculados)
+    categorias = categorias_con_conteos()
+    registro = registro_taxonomias()
+    
+    # Solo la primera página se renderiza en el servidor; el resto llega
+    # como fragmentos HTML desde productos_fragmento
+    params = parametros_filtro(request.GET)
+    productos_filtrados = filtrar_cards(params)
+    productos, next_cursor = pagina_por_cursor(productos_filtrados, params.get('orden'))
+    total_productos = productos_filtrados.count()
     
     # Detectar categoría activa desde la URL (?categoria=slug) para UI
     categoria_activa = None
     categoria_slug = request.GET.get('categoria')
     if categoria_slug:
-        categoria_activa = Categoria.objects.filter(slug=categoria_slug, activo=True).first()
+        categoria_activa = registro.obtener_por_slug('categoria', categoria_slug)
+        if categoria_activa and not categoria_activa.activo:
+            categoria_activa = None
     
     # Productos destacados y en oferta para destacar en la UI
     productos_destacados = Producto.get_featured_products()[:8]
@@ -124,12 +220,15 @@ def index(request):
     
     context = {
         'page_title': 'Catálogo de Productos',
-        'productos': productos,  # Agregar todos los productos
+        'productos': productos,  # Primera página de tarjetas
+        'total_productos': total_productos,
+        'next_cursor': next_cursor,
+        'filtros': params,
         'categorias': categorias,
-        'subcategorias': subcategorias,
-        'marcas': marcas,
-        'proveedores': proveedores,
-        'estatus_list': estatus_list,
+        'subcategorias': registro.activos('subcategoria'),
+        'marcas': registro.activos('marca'),
+        'proveedores': registro.activos('proveedor'),
+        'estatus_list': registro.activos('estatus'),
         'productos_destacados': productos_destacados,
         'productos_oferta': productos_oferta,
         'categoria_activa': categoria_activa,
@@ -137,123 +236,176 @@ def index(request):
     return render(request, 'index.html', context)
 
 
+def productos_fragmento(request):
+    """
+    Fragmento HTML con una página de tarjetas del catálogo.
+    Acepta los mismos filtros que get_productos_json y pagina por cursor.
+    Los fragmentos se cachean por filtros + cursor + generación del catálogo.
+    """
+    params = parametros_filtro(request.GET)
+    cursor = request.GET.get('cursor') or None
+    clave = clave_catalogo('fragmento', clave_filtros(params), cursor or '')
+    
+    fragmento = cache.get(clave)
+    if fragmento is None:
+        productos = filtrar_cards(params)
+        try:
+            page_items, next_cursor = pagina_por_cursor(productos, params.get('orden'), cursor)
+        except CursorInvalido as e:
+            return HttpResponseBadRequest(str(e))
+        
+        fragmento = {
+            'html': render_to_string('includes/catalogo_productos.html', {'productos': page_items}),
+            'next_cursor': next_cursor,
+            # El total solo se calcula para la primera página
+            'total': None if cursor else productos.count(),
+        }
+        cache.set(clave, fragmento, FRAGMENTO_CATALOGO_TIMEOUT)
+    
+    response = HttpResponse(fragmento['html'])
+    response['X-Next-Cursor'] = fragmento['next_cursor'] or ''
+    if fragmento['total'] is not None:
+        response['X-Total-Count'] = str(fragmento['total'])
+    return response
+
+
+def get_facetas_json(request):
+    """
+    API con el número de productos por opción de cada filtro.
+    Sin filtros o con un único filtro se leen los conteos materializados;
+    las combinaciones de varios filtros o con búsqueda se agregan al vuelo.
+    """
+    params = parametros_filtro(request.GET)
+    seleccion = seleccion_faceta(params)
+    if seleccion is None:
+        return JsonResponse({'error': 'Filtro no encontrado'}, status=404)
+    
+    precalculado = len(seleccion) <= 1 and not params.get('q')
+    if precalculado:
+        conteos = conteos_precalculados(*(seleccion[0] if seleccion else ()))
+    else:
+        conteos = conteos_en_vivo(filtrar_cards(params))
+    
+    registro = registro_taxonomias()
+    facetas = {}
+    for faceta in FACETAS_TAXONOMIA:
+        valores = conteos.get(faceta, {})
+        objetos = {valor: registro.obtener(faceta, valor) for valor in valores}
+        objetos = {valor: objeto for valor, objeto in objetos.items() if objeto is not None}
+        facetas[faceta] = [
+            {
+                'id': objeto.id,
+                'nombre': objeto.nombre,
+                'slug': getattr(objeto, 'slug', None),
+                'total': valores[str(objeto.id)],
+            }
+            for objeto in sorted(objetos.values(), key=lambda o: o.nombre)
+        ]
+    for faceta in ('destacado', 'en_oferta'):
+        facetas[faceta] = conteos.get(faceta, {}).get('true', 0)
+    
+    return JsonResponse({
+        'total': conteos.get(FACETA_TOTAL, {}).get(VALOR_TOTAL, 0),
+        'facetas': facetas,
+        'precalculado': precalculado,
+    })
+
+
+def serializar_card(card):
+    """Serializa una ProductoCard con el formato de la API de productos"""
+    return {
+        'id': card.producto_id,
+        'nombre': card.nombre,
+        'slug': card.slug,
+        'descripcion_corta': card.descripcion_corta,
+        'precio': str(card.precio) if card.precio else None,
+        'precio_oferta': str(card.precio_oferta) if card.precio_oferta else None,
+        'tiene_descuento': card.tiene_descuento,
+        'porcentaje_descuento': card.porcentaje_descuento,
+        'stock': card.stock,
+        'en_stock': card.en_stock,
+        'imagen_principal': card.imagen_url or None,
+        'rating': card.rating_promedio,
+        'total_valoraciones': card.total_valoraciones,
+        'categoria': card.categoria_nombre or None,
+        'categoria_slug': card.categoria_slug or None,
+        'subcategoria': card.subcategoria_nombre or None,
+        'subcategoria_slug': card.subcategoria_slug or None,
+        'marca': card.marca_nombre or None,
+        'proveedor': card.proveedor_nombre or None,
+        'estatus': card.estatus_nombre or None,
+        'origen': card.origen,
+        'destacado': card.destacado,
+        'en_oferta': card.en_oferta,
+        'badges': card.badges,
+        'url': card.get_absolute_url(),
+    }
+
+
+def serializar_card_resumida(card):
+    """Serialización breve de una tarjeta para listas de relacionados/similares"""
+    return {
+        'id': card.producto_id,
+        'nombre': card.nombre,
+        'slug': card.slug,
+        'precio': str(card.precio) if card.precio else None,
+        'precio_oferta': str(card.precio_oferta) if card.precio_oferta else None,
+        'tiene_descuento': card.tiene_descuento,
+        'porcentaje_descuento': card.porcentaje_descuento,
+        'imagen_principal': card.imagen_url or None,
+        'rating': round(card.rating_promedio, 1),
+        'destacado': card.destacado,
+        'en_oferta': card.en_oferta,
+        'url': card.get_absolute_url(),
+    }
+
+
+@condition(etag_func=_etag_listado, last_modified_func=_modificacion_listado)
+@respuesta_cacheada('api_productos')
 def get_productos_json(request):
     """API para obtener productos en formato JSON"""
-    # Obtener parámetros de filtrado
-    categoria_slug = request.GET.get('categoria')
-    subcategoria_slug = request.GET.get('subcategoria')
-    marca_id = request.GET.get('marca')
-    proveedor_id = request.GET.get('proveedor')
-    estatus_id = request.GET.get('estatus')
-    destacado = request.GET.get('destacado')
-    en_oferta = request.GET.get('en_oferta')
-    busqueda = request.GET.get('q')
-    orden = request.GET.get('orden', '-fecha_creacion')  # Por defecto más recientes
-    
-    # Filtrar productos
-    productos = Producto.objects.filter(
-        activo=True, 
-        disponible=True
-    ).select_related(
-        'categoria', 
-        'subcategoria', 
-        'marca', 
-        'proveedor', 
-        'estatus'
-    )
+    # Filtrar tarjetas de productos (modelo de lectura desnormalizado)
+    params = parametros_filtro(request.GET)
+    orden = params.get('orden')
     
-    if categoria_slug:
-        productos = productos.filter(categoria__slug=categoria_slug)
-    
-    if subcategoria_slug:
-        productos = productos.filter(subcategoria__slug=subcategoria_slug)
-    
-    if marca_id:
-        productos = productos.filter(marca_id=marca_id)
-    
-    if proveedor_id:
-        productos = productos.filter(proveedor_id=proveedor_id)
-    
-    if estatus_id:
-        productos = productos.filter(estatus_id=estatus_id)
-    
-    if destacado == 'true':
-        productos = productos.filter(destacado=True)
-    
-    if en_oferta == 'true':
-        productos = productos.filter(en_oferta=True)
-    
-    if busqueda:
-        productos = productos.filter(
-            Q(nombre__icontains=busqueda) | 
-            Q(descripcion__icontains=busqueda) |
-            Q(descripcion_corta__icontains=busqueda) |
-            Q(sku__icontains=busqueda)
-        )
-    
-    # Ordenamiento
-    orden_validos = {
-        'precio_asc': 'precio',
-        'precio_desc': '-precio',
-        'nombre_asc': 'nombre',
-        'nombre_desc': '-nombre',
-        'recientes': '-fecha_creacion',
-        'antiguos': 'fecha_creacion',
-    }
-    if orden in orden_validos:
-        productos = productos.order_by(orden_validos[orden])
-    else:
-        productos = productos.order_by('-destacado', '-en_oferta', '-fecha_creacion')
+    # Filtros, orden y paginación en memoria cuando el snapshot lo permite
+    snapshot = obtener_snapshot()
+    ids = snapshot.ids_ordenados(params, orden) if snapshot is not None else None
+    if ids is not None:
+        respuesta = _productos_json_snapshot(request, ids, orden)
+        if respuesta is not None:
+            return respuesta
+    
+    productos = filtrar_cards(params)
+    
+    # Modo cursor (keyset): sin COUNT(*) ni OFFSET, coste constante por página
+    if 'cursor' in request.GET:
+        cursor = request.GET.get('cursor') or None
+        try:
+            page_items, next_cursor = pagina_por_cursor(productos, orden, cursor)
+        except CursorInvalido as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        data = {
+            'productos': [serializar_card(card) for card in page_items],
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None,
+        }
+        # Total opcional, solo en la primera página para no recontar en cada scroll
+        if request.GET.get('con_total') == 'true' and not cursor:
+            data['total'] = productos.count()
+        return JsonResponse(data)
+    
+    # Ordenamiento (con desempate por id para que sea estable)
+    productos = ordenar(productos, orden)
     
     # Paginación
-    paginator = Paginator(productos, 12)
+    paginator = Paginator(productos, PRODUCTOS_POR_PAGINA)
     page_number = request.GET.get('page', 1)
     page_obj = paginator.get_page(page_number)
     
     # Serializar productos
-    productos_data = []
-    for producto in page_obj:
-        # Obtener imagen principal usando el método del modelo
-        imagen_principal = None
-        main_image = producto.get_main_image()
-        if main_image:
-            imagen_principal = main_image.url
-        elif producto.imagen:
-            imagen_principal = producto.imagen.url
-        
-        # Calcular rating promedio
-        rating_promedio = producto.valoraciones.aggregate(Avg('puntuacion'))['puntuacion__avg'] or 0
-        
-        # Obtener badges de estado
-        badges = producto.get_status_badges()
-        
-        productos_data.append({
-            'id': producto.id,
-            'nombre': producto.nombre,
-            'slug': producto.slug,
-            'descripcion_corta': producto.descripcion_corta,
-            'precio': str(producto.precio) if producto.precio else None,
-            'precio_oferta': str(producto.precio_oferta) if producto.precio_oferta else None,
-            'tiene_descuento': producto.tiene_descuento,
-            'porcentaje_descuento': producto.porcentaje_descuento,
-            'stock': producto.stock,
-            'en_stock': producto.en_stock,
-            'imagen_principal': imagen_principal,
-            'rating': round(rating_promedio, 1),
-            'total_valoraciones': producto.valoraciones.count(),
-            'categoria': producto.categoria.nombre if producto.categoria else None,
-            'categoria_slug': producto.categoria.slug if producto.categoria else None,
-            'subcategoria': producto.subcategoria.nombre if producto.subcategoria else None,
-            'subcategoria_slug': producto.subcategoria.slug if producto.subcategoria else None,
-            'marca': producto.marca.nombre if producto.marca else None,
-            'proveedor': producto.proveedor.nombre if producto.proveedor else None,
-            'estatus': producto.estatus.nombre if producto.estatus else None,
-            'origen': producto.origen,
-            'destacado': producto.destacado,
-            'en_oferta': producto.en_oferta,
-            'badges': badges,
-            'url': producto.get_absolute_url(),
-        })
+    productos_data = [serializar_card(card) for card in page_obj]
     
     return JsonResponse({
         'productos': productos_data,
@@ -265,6 +417,56 @@ def get_productos_json(request):
     })
 
 
+def _productos_json_snapshot(request, ids, orden):
+    """
+    Respuesta de get_productos_json a partir de los ids ya filtrados y
+    ordenados por el snapshot. Solo consulta la base de datos para cargar
+    las tarjetas de la página. Retorna None si hay que recurrir a SQL.
+    """
+    if 'cursor' in request.GET:
+        cursor = request.GET.get('cursor') or None
+        inicio = 0
+        if cursor:
+            try:
+                inicio = posicion_cursor(ids, cursor, orden)
+            except CursorInvalido as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            if inicio is None:
+                # El producto del cursor ya no está en el listado
+                return None
+        
+        page_items = cargar_tarjetas(ids[inicio:inicio + PRODUCTOS_POR_PAGINA])
+        has_next = inicio + PRODUCTOS_POR_PAGINA < len(ids) and bool(page_items)
+        next_cursor = codificar_cursor(page_items[-1], orden) if has_next else None
+        data = {
+            'productos': [serializar_card(card) for card in page_items],
+            'next_cursor': next_cursor,
+            'has_next': has_next,
+        }
+        if request.GET.get('con_total') == 'true' and not cursor:
+            data['total'] = len(ids)
+        return JsonResponse(data)
+    
+    paginator = Paginator(ids, PRODUCTOS_POR_PAGINA)
+    page_obj = paginator.get_page(request.GET.get('page', 1))
+    
+    return JsonResponse({
+        'productos': [serializar_card(card) for card in cargar_tarjetas(page_obj.object_list)],
+        'total': paginator.count,
+        'page': page_obj.number,
+        'num_pages': paginator.num_pages,
+        'has_next': page_obj.has_next(),
+        'has_previous': page_obj.has_previous(),
+    })
+
+
+@admin_required
+def snapshot_catalogo_debug(request):
+    """Diagnóstico del snapshot en memoria del catálogo en este worker"""
+    return JsonResponse(estado_snapshot())
+
+
+@condition(etag_func=_etag_detalle, last_modified_func=_modificacion_detalle)
 def detalle(request, slug):
     """Vista para mostrar el detalle de un producto"""
     # Si es petición AJAX, devolver JSON
@@ -274,31 +476,26 @@ def detalle(request, slug):
     # Obtener el producto
     producto = get_object_or_404(Producto, slug=slug, activo=True)
     
-    # Productos relacionados (solo misma categoría)
-    productos_relacionados = Producto.objects.filter(
-        activo=True,
-        disponible=True,
-        categoria=producto.categoria
-    ).exclude(id=producto.id).order_by('-destacado', '-fecha_creacion')[:8]
+    # Productos relacionados precalculados (tarjetas)
+    productos_relacionados = relacionados_de(producto.id)
     
     context = {
         'producto': producto,
         'productos_relacionados': productos_relacionados,
+        'productos_similares': similares_de(producto.id),
     }
     
     return render(request, 'detalle.html', context)
 
 
+@condition(etag_func=_etag_detalle_json, last_modified_func=_modificacion_detalle_json)
+@respuesta_cacheada('api_detalle')
 def get_producto_detalle_json(request, slug):
     """API para obtener detalle de producto en formato JSON"""
     producto = get_object_or_404(Producto, slug=slug, activo=True)
     
-    # Productos relacionados (solo misma categoría)
-    productos_relacionados = Producto.objects.filter(
-        activo=True,
-        disponible=True,
-        categoria=producto.categoria
-    ).exclude(id=producto.id).order_by('-destacado', '-fecha_creacion')[:8]
+    # Productos relacionados precalculados (tarjetas)
+    productos_relacionados = relacionados_de(producto.id)
     
     # Serializar imágenes desde ProductImage (galería)
     imagenes = []
@@ -340,7 +537,7 @@ def get_producto_detalle_json(request, slug):
     
     # Serializar valoraciones
     valoraciones = []
-    for val in producto.valoraciones.all():
+    for val in producto.valoraciones.select_related('usuario'):
         valoraciones.append({
             'usuario': val.usuario.username if val.usuario else 'Anónimo',
             'puntuacion': val.puntuacion,
@@ -350,44 +547,14 @@ def get_producto_detalle_json(request, slug):
             'verificado': val.verificado
         })
     
-    # Calcular estadísticas de valoraciones
-    rating_promedio = producto.valoraciones.aggregate(Avg('puntuacion'))['puntuacion__avg'] or 0
-    distribucion_rating = {
-        '5': producto.valoraciones.filter(puntuacion=5).count(),
-        '4': producto.valoraciones.filter(puntuacion=4).count(),
-        '3': producto.valoraciones.filter(puntuacion=3).count(),
-        '2': producto.valoraciones.filter(puntuacion=2).count(),
-        '1': producto.valoraciones.filter(puntuacion=1).count(),
-    }
+    # Estadísticas de valoraciones desde el resumen incremental (una fila)
+    resumen = ResumenValoraciones.objects.filter(producto=producto).first()
+    if resumen is None:
+        resumen = ResumenValoraciones(producto=producto)
     
-    # Serializar productos relacionados
-    relacionados_data = []
-    for prod in productos_relacionados:
-        # Obtener imagen principal
-        imagen_principal = None
-        main_image = prod.get_main_image()
-        if main_image:
-            imagen_principal = main_image.url
-        elif prod.imagen:
-            imagen_principal = prod.imagen.url
-        
-        # Rating del producto relacionado
-        rating_rel = prod.valoraciones.aggregate(Avg('puntuacion'))['puntuacion__avg'] or 0
-        
-        relacionados_data.append({
-            'id': prod.id,
-            'nombre': prod.nombre,
-            'slug': prod.slug,
-            'precio': str(prod.precio) if prod.precio else None,
-            'precio_oferta': str(prod.precio_oferta) if prod.precio_oferta else None,
-            'tiene_descuento': prod.tiene_descuento,
-            'porcentaje_descuento': prod.porcentaje_descuento,
-            'imagen_principal': imagen_principal,
-            'rating': round(rating_rel, 1),
-            'destacado': prod.destacado,
-            'en_oferta': prod.en_oferta,
-            'url': prod.get_absolute_url(),
-        })
+    # Serializar productos relacionados y similares (tarjetas)
+    relacionados_data = [serializar_card_resumida(prod) for prod in productos_relacionados]
+    similares_data = [serializar_card_resumida(prod) for prod in similares_de(producto.id)]
     
     # Datos completos del producto
     data = {
@@ -421,10 +588,11 @@ def get_producto_detalle_json(request, slug):
         'imagenes': imagenes,
         'videos': videos,
         'valoraciones': valoraciones,
-        'rating_promedio': round(rating_promedio, 1),
-        'distribucion_rating': distribucion_rating,
-        'total_valoraciones': producto.valoraciones.count(),
+        'rating_promedio': resumen.promedio,
+        'distribucion_rating': resumen.distribucion,
+        'total_valoraciones': resumen.total,
         'productos_relacionados': relacionados_data,
+        'productos_similares': similares_data,
         'badges': producto.get_status_badges(),
         'url': producto.get_absolute_url(),
         'fecha_creacion': producto.fecha_creacion.strftime('%d/%m/%Y'),
@@ -445,10 +613,24 @@ def admin_productos(request):
     
     context = {
         'productos': productos,
+        # Ámbitos de las operaciones masivas
+        **_taxonomias_formulario(),
     }
     return render(request, 'admin_lista_productos.html', context)
 
 
+def _taxonomias_formulario():
+    """Opciones activas de cada taxonomía para el formulario de producto"""
+    registro = registro_taxonomias()
+    return {
+        'categorias': registro.activos('categoria'),
+        'subcategorias': registro.activos('subcategoria'),
+        'marcas': registro.activos('marca'),
+        'proveedores': registro.activos('proveedor'),
+        'estatus_list': registro.activos('estatus'),
+    }
+
+
 @admin_required
 def nuevo_producto(request):
     """Vista para crear un nuevo producto"""
@@ -456,18 +638,8 @@ def nuevo_producto(request):
         return guardar_producto(request)
     
     # GET: Mostrar formulario vacío
-    categorias = Categoria.objects.filter(activo=True).order_by('nombre')
-    subcategorias = Subcategoria.objects.filter(activo=True).select_related('categoria').order_by('nombre')
-    marcas = Marca.objects.filter(activo=True).order_by('nombre')
-    proveedores = Proveedor.objects.filter(activo=True).order_by('nombre')
-    estatus_list = Estatus.objects.filter(activo=True).order_by('nombre')
-    
     context = {
-        'categorias': categorias,
-        'subcategorias': subcategorias,
-        'marcas': marcas,
-        'proveedores': proveedores,
-        'estatus_list': estatus_list,
+        **_taxonomias_formulario(),
     }
     return render(request, 'admin_form_producto.html', context)
 
@@ -481,23 +653,27 @@ def editar_producto(request, producto_id):
         return guardar_producto(request, producto_id)
     
     # GET: Mostrar formulario con datos del producto
-    categorias = Categoria.objects.filter(activo=True).order_by('nombre')
-    subcategorias = Subcategoria.objects.filter(activo=True).select_related('categoria').order_by('nombre')
-    marcas = Marca.objects.filter(activo=True).order_by('nombre')
-    proveedores = Proveedor.objects.filter(activo=True).order_by('nombre')
-    estatus_list = Estatus.objects.filter(activo=True).order_by('nombre')
-    
     context = {
         'producto': producto,
-        'categorias': categorias,
-        'subcategorias': subcategorias,
-        'marcas': marcas,
-        'proveedores': proveedores,
-        'estatus_list': estatus_list,
+        # Estado de optimización de cada imagen (se procesan en segundo plano)
+        'imagenes': con_estado(producto.imagenes_galeria.all()),
+        'estado_imagen': estado_imagen_principal(producto.id),
+        **_taxonomias_formulario(),
     }
     return render(request, 'admin_form_producto.html', context)
 
 
+def _taxonomia_enviada(request, registro, faceta):
+    """Taxonomía seleccionada en el formulario (None si el campo viene vacío)"""
+    valor = request.POST.get(faceta)
+    if not valor:
+        return None
+    objeto = registro.obtener(faceta, valor)
+    if objeto is None:
+        raise Http404(f'{FACETAS_TAXONOMIA[faceta]._meta.verbose_name} no encontrada')
+    return objeto
+
+
 @admin_required
 def guardar_producto(request, producto_id=None):
     """Vista para guardar (crear o actualizar) un producto"""
@@ -522,36 +698,13 @@ def guardar_producto(request, producto_id=None):
         producto.dimensiones = request.POST.get('dimensiones', '')
         producto.garantia = request.POST.get('garantia', '')
         
-        # Asignar relaciones (ForeignKey)
-        categoria_id = request.POST.get('categoria')
-        if categoria_id:
-            producto.categoria = Categoria.objects.get(id=categoria_id)
-        else:
-            producto.categoria = None
-            
-        subcategoria_id = request.POST.get('subcategoria')
-        if subcategoria_id:
-            producto.subcategoria = Subcategoria.objects.get(id=subcategoria_id)
-        else:
-            producto.subcategoria = None
-            
-        marca_id = request.POST.get('marca')
-        if marca_id:
-            producto.marca = Marca.objects.get(id=marca_id)
-        else:
-            producto.marca = None
-            
-        proveedor_id = request.POST.get('proveedor')
-        if proveedor_id:
-            producto.proveedor = Proveedor.objects.get(id=proveedor_id)
-        else:
-            producto.proveedor = None
-            
-        estatus_id = request.POST.get('estatus')
-        if estatus_id:
-            producto.estatus = Estatus.objects.get(id=estatus_id)
-        else:
-            producto.estatus = None
+        # Asignar relaciones (ForeignKey) desde el registro de taxonomías
+        registro = registro_taxonomias()
+        producto.categoria = _taxonomia_enviada(request, registro, 'categoria')
+        producto.subcategoria = _taxonomia_enviada(request, registro, 'subcategoria')
+        producto.marca = _taxonomia_enviada(request, registro, 'marca')
+        producto.proveedor = _taxonomia_enviada(request, registro, 'proveedor')
+        producto.estatus = _taxonomia_enviada(request, registro, 'estatus')
         
         # Asignar campos numéricos
         precio = request.POST.get('precio')
@@ -561,7 +714,10 @@ def guardar_producto(request, producto_id=None):
         producto.precio_oferta = float(precio_oferta) if precio_oferta else None
         
         stock = request.POST.get('stock')
-        producto.stock = int(stock) if stock else 0
+        # Se guarda la diferencia con el stock que mostraba el formulario:
+        # los movimientos registrados mientras se editaba no se pierden
+        stock_inicial = request.POST.get('stock_inicial')
+        producto.editar_stock(int(stock) if stock else 0, visto=int(stock_inicial) if stock_inicial else None)
         
         peso = request.POST.get('peso')
         producto.peso = float(peso) if peso else None
@@ -586,7 +742,11 @@ def guardar_producto(request, producto_id=None):
         if 'ficha_tecnica' in request.FILES:
             producto.ficha_tecnica = request.FILES['ficha_tecnica']
         
-        producto.save()
+        try:
+            producto.save()
+        except StockInsuficiente as e:
+            messages.error(request, f'No se pudo guardar el producto: {e}')
+            return redirect('productos:editar_producto', producto_id=producto.id)
         
         # Manejar eliminación de imágenes de galería
         remove_gallery_images = request.POST.get('remove_gallery_images', '')
@@ -630,20 +790,19 @@ def guardar_producto(request, producto_id=None):
 def toggle_producto_status(request, producto_id):
     """Vista AJAX para cambiar el estado activo/inactivo de un producto"""
     try:
-        producto = get_object_or_404(Producto, id=producto_id)
+        producto = get_object_or_404(Producto.objects.only('id', 'activo'), id=producto_id)
         
         # Leer el estado desde el JSON body
         data = json.loads(request.body)
-        nuevo_estado = data.get('activo', not producto.activo)
+        nuevo_estado = bool(data.get('activo', not producto.activo))
         
-        # Actualizar el estado
-        producto.activo = nuevo_estado
-        producto.save()
+        # Un solo UPDATE, sin pasar por save() (ver operaciones.py)
+        aplicar_operacion({'operacion': 'estado', 'campo': 'activo', 'valor': nuevo_estado, 'ids': [producto.id]})
         
         return JsonResponse({
             'success': True,
-            'activo': producto.activo,
-            'message': f'Producto {"activado" if producto.activo else "desactivado"} exitosamente'
+            'activo': nuevo_estado,
+            'message': f'Producto {"activado" if nuevo_estado else "desactivado"} exitosamente'
         })
     except Exception as e:
         return JsonResponse({
@@ -652,6 +811,31 @@ def toggle_producto_status(request, producto_id):
         }, status=400)
 
 
+@admin_required
+@require_POST
+def operacion_masiva_productos(request):
+    """
+    Vista AJAX para cambios masivos de estado, stock, precios y ofertas.
+    Cuerpo JSON: {"operacion": "estado"|"stock"|"precio"|"oferta", "ids": [...]
+    o "filtros": {"categoria", "marca", "proveedor"}, y los parámetros de la
+    operación}. Ver productos/operaciones.py.
+    """
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            raise OperacionInvalida('Se esperaba un objeto JSON')
+        actualizados, lotes = aplicar_operacion(data)
+    except ValueError as e:  # JSON mal formado u OperacionInvalida
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'actualizados': actualizados,
+        'lotes': lotes,
+        'message': f'{actualizados} producto(s) actualizado(s)'
+    })
+
+
 @admin_required
 def eliminar_producto(request, producto_id):
     """Vista para eliminar un producto"""
@@ -957,6 +1141,43 @@ def toggle_subcategoria_status(request, subcategoria_id):
         }, status=400)
 
 
+def get_sugerencias_json(request):
+    """Autocompletado por prefijo servido desde el índice en memoria del worker"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limite = min(int(request.GET.get('limite', 8)), 10)
+    except ValueError:
+        limite = 8
+    
+    return JsonResponse({
+        'query': query,
+        'sugerencias': sugerir(query, limite) if query else [],
+    })
+
+
+@exportacion_autorizada
+def exportar_catalogo(request):
+    """
+    Exportación completa del catálogo en streaming (JSON Lines o CSV) para
+    superusuarios y socios con token. Acepta los filtros del listado,
+    `formato=jsonl|csv` e `incluir=descripcion,garantia,...` para las
+    columnas opcionales. Las exportaciones masivas periódicas se hacen con
+    `manage.py exportar_catalogo`.
+    """
+    formato = request.GET.get('formato', 'jsonl')
+    incluir = [c for c in request.GET.get('incluir', '').split(',') if c]
+    try:
+        contenido = exportar(formato, parametros_filtro(request.GET), incluir)
+    except ExportacionInvalida as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    response = StreamingHttpResponse(contenido, content_type=FORMATOS[formato])
+    fecha = timezone.now().strftime('%Y%m%d')
+    response['Content-Disposition'] = f'attachment; filename="catalogo-{fecha}.{formato}"'
+    return response
+
+
+@respuesta_cacheada('api_buscar')
 def buscar_productos(request):
     """Vista para búsqueda de productos con AJAX"""
     query = request.GET.get('q', '').strip()
@@ -968,35 +1189,18 @@ def buscar_productos(request):
             'productos': []
         })
     
-    # Buscar en múltiples campos
-    productos = Producto.objects.filter(
-        Q(nombre__icontains=query) |
-        Q(descripcion_corta__icontains=query) |
-        Q(descripcion__icontains=query) |
-        Q(sku__icontains=query) |
-        Q(categoria__nombre__icontains=query) |
-        Q(subcategoria__nombre__icontains=query) |
-        Q(marca__nombre__icontains=query),
-        activo=True,
-        disponible=True
-    ).select_related(
-        'categoria', 
-        'subcategoria', 
-        'marca'
-    ).prefetch_related('imagenes_galeria')[:20]
+    # Índice FTS5 ordenado por relevancia; sin FTS, prefijo indexado del nombre normalizado
+    ids = buscar_ids(query, limite=20)
+    if ids is not None:
+        productos = cargar_tarjetas(ids)
+    else:
+        productos = ProductoCard.objects.filter(condicion_nombre(query), disponible=True)[:20]
     
     # Serializar resultados
     resultados = []
     for producto in productos:
-        # Obtener imagen principal
-        imagen_url = None
-        if producto.imagen:
-            imagen_url = producto.imagen.url
-        elif producto.imagenes_galeria.exists():
-            imagen_url = producto.imagenes_galeria.first().imagen.url
-        
         resultados.append({
-            'id': producto.id,
+            'id': producto.producto_id,
             'nombre': producto.nombre,
             'slug': producto.slug,
             'descripcion_corta': producto.descripcion_corta or '',
@@ -1004,9 +1208,9 @@ def buscar_productos(request):
             'precio_final': str(producto.precio_final),
             'precio_oferta': str(producto.precio_oferta) if producto.tiene_descuento else None,
             'descuento': producto.porcentaje_descuento if producto.en_oferta else None,
-            'imagen': imagen_url,
-            'categoria': producto.categoria.nombre if producto.categoria else '',
-            'marca': producto.marca.nombre if producto.marca else '',
+            'imagen': producto.imagen_url or None,
+            'categoria': producto.categoria_nombre,
+            'marca': producto.marca_nombre,
             'url': f'/productos/{producto.slug}/',
             'stock': producto.stock,
             'destacado': producto.destacado,